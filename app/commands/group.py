@@ -3,17 +3,26 @@ group contains all the commands for reading in the .csv data files and generatin
 Also includes reading in the configuration file.
 '''
 from pathlib import Path
-from concurrent.futures import as_completed, wait, ProcessPoolExecutor, Future
-from multiprocessing import synchronize, Event, current_process
+from dataclasses import replace
+from concurrent.futures import wait, ProcessPoolExecutor, Future, FIRST_COMPLETED
+from multiprocessing import Event, current_process
 from multiprocessing.managers import BaseManager
+import math
+import random
 import signal
 import sys
+import time
+from typing import Optional
 import click
 from app import config, core, models
 from app.data import load, reporter
-from app.group import scoring
-from app.grouping.grouper_1 import Grouper1
-from app.grouping import grouper_2, printer
+from app.grouping.grouper_1 import Grouper1, is_better_solution
+from app.grouping import grouper_2, grouper_3, grouper_4, grouper_5, printer
+
+# with a time limit, the time left for writing the report: this fraction of the time limit, or this many seconds per
+# student if that is more
+REPORT_TIME_FRACTION: float = 0.1
+REPORT_SECONDS_PER_STUDENT: float = 0.01
 
 
 class GroupingManager(BaseManager):
@@ -29,63 +38,79 @@ class GroupingManager(BaseManager):
 @click.option('-r', '--reportfile', show_default=False, default=None,
               help="report filename, relies on --report flag being enabled [default: <surveyfile>_report.csv]")
 @click.option('-a', '--allstudentsfile', help="list of all student ids in class. Ignored if not included")
-def group(surveyfile: str, configfile: str, reportfile: str, allstudentsfile: str):
+@click.option('--cachedir', default=None, type=click.Path(file_okay=False),
+              help="directory to cache the loaded survey data in, so that unchanged surveys are not parsed again. Not cached if not included")
+@click.option('-t', '--time-limit', 'time_limit', default=None, type=click.FloatRange(min=0, min_open=True),
+              help="the most seconds the command should take (overrides the config's time_limit). No limit if not included")
+@click.option('--seed', default=None, type=int,
+              help="seed for the grouping algorithms' random choices, so that the same survey and config are grouped the same way. Random if not included")
+# pylint: disable-next=too-many-arguments,too-many-locals
+def group(surveyfile: str, configfile: str, reportfile: str, allstudentsfile: str, cachedir: Optional[str] = None,
+          time_limit: Optional[float] = None, seed: Optional[int] = None):
     '''Group Users - forms groups for the users from the survey.
 
     SURVEYFILE is path to the raw survey output. [default=dataset.csv]
     '''
+    start: float = time.time()
     try:
         ########## Determine Output Filenames ##########
         report_filename: str = __report_filename(surveyfile, reportfile)
 
         ########## Load the config data ##########
         config_data: models.Configuration = config.read_json(configfile)
-
-        ########## Load the survey data ##########
-        survey_data: models.SurveyData = load.read_survey(config_data['field_mappings'], surveyfile)
-
-        ########## Load the class roster data, if applicable ##########
-        if allstudentsfile:
-            click.echo(
-                f'checking roster for missing students in {allstudentsfile}')
-            survey_data.records = load.match_survey_to_roster(survey_data.records,
-                                                              load.read_roster(allstudentsfile), config_data['field_mappings']['availability_field_names'])
-        ########## Grouping ##########
-
-        # Perform pre-grouping error checking
-        if core.pre_group_error_checking(config_data["target_group_size"], config_data["target_plus_one_allowed"],
-                                         config_data["target_minus_one_allowed"], survey_data.records):
-            return  # error found -- don't continue
-
-        # Run grouping algorithms
-        click.echo(f'grouping students from {surveyfile}')
-
-        ########################################################################################
-        # NOTE: We're no longer doing this (getting a "true" min and max group size). The sponsor
-        #  has decided that she would prefer it if the algorithms adhere to the target size to
-        #  the extent possible, which means there will only be one "proper" number of groups.
-
-        # Determine min and max possible number of groups
-        # min_max_num_groups: list[int] = core.get_min_max_num_groups(
-        #    survey_data.records,
-        #    config_data["target_group_size"],
-        #    config_data["target_plus_one_allowed"],
-        #    config_data["target_minus_one_allowed"])
-        ########################################################################################
-        num_groups: int = core.get_num_groups(survey_data.records,
-                                              config_data["target_group_size"],
-                                              config_data["target_plus_one_allowed"],
-                                              config_data["target_minus_one_allowed"])
-        min_max_num_groups: list[int] = [num_groups, num_groups]
-
-        ########## Run both grouping algorithms in parallel via multiprocessing ##########
-        best_solutions: list[list[models.GroupRecord]] = __run_grouping_algs(
-            survey_data, config_data, min_max_num_groups)
-
-        ########## Output solutions report if configured ##########
-        click.echo(f'Writing report to: {report_filename}')
-        reporter.write_report(best_solutions, survey_data,
-                              config_data, report_filename)
+        if time_limit is None:
+            time_limit = config_data.get("time_limit")
+
+        ########## Load the survey data (its raw rows are closed once the report is written) ##########
+        with load.read_survey(config_data['field_mappings'], surveyfile, cachedir) as survey_data:
+            if survey_data.duplicates:
+                click.echo(load.duplicates_summary(survey_data.duplicates))
+
+            ########## Load the class roster data, if applicable ##########
+            if allstudentsfile:
+                click.echo(
+                    f'checking roster for missing students in {allstudentsfile}')
+                reconciliation: models.RosterReconciliation = load.reconcile_roster(
+                    survey_data.records, load.read_roster(allstudentsfile), config_data['field_mappings']['availability_field_names'])
+                click.echo(load.roster_summary(reconciliation))
+                survey_data.records = reconciliation.kept + reconciliation.added
+            ########## Grouping ##########
+
+            # Perform pre-grouping error checking
+            if core.pre_group_error_checking(config_data["target_group_size"], config_data["target_plus_one_allowed"],
+                                             config_data["target_minus_one_allowed"], survey_data.records):
+                return  # error found -- don't continue
+
+            # Run grouping algorithms
+            click.echo(f'grouping students from {surveyfile}')
+
+            ########################################################################################
+            # NOTE: We're no longer doing this (getting a "true" min and max group size). The sponsor
+            #  has decided that she would prefer it if the algorithms adhere to the target size to
+            #  the extent possible, which means there will only be one "proper" number of groups.
+
+            # Determine min and max possible number of groups
+            # min_max_num_groups: list[int] = core.get_min_max_num_groups(
+            #    survey_data.records,
+            #    config_data["target_group_size"],
+            #    config_data["target_plus_one_allowed"],
+            #    config_data["target_minus_one_allowed"])
+            ########################################################################################
+            num_groups: int = core.get_num_groups(survey_data.records,
+                                                  config_data["target_group_size"],
+                                                  config_data["target_plus_one_allowed"],
+                                                  config_data["target_minus_one_allowed"])
+            min_max_num_groups: list[int] = [num_groups, num_groups]
+
+            ########## Run both grouping algorithms in parallel via multiprocessing ##########
+            best_solutions: list[list[models.GroupRecord]] = __run_grouping_algs(
+                survey_data, config_data, min_max_num_groups,
+                __grouping_deadline(start, time_limit, len(survey_data.records)), seed)
+
+            ########## Output solutions report if configured ##########
+            click.echo(f'Writing report to: {report_filename}')
+            reporter.write_report(best_solutions, survey_data,
+                                  config_data, report_filename)
 
     except ValueError as value_error:
         print(
@@ -97,7 +122,25 @@ def group(surveyfile: str, configfile: str, reportfile: str, allstudentsfile: st
         sys.exit(1)
 
 
-def __run_grouping_algs(survey_data: models.SurveyData, config_data: models.Configuration, min_max_num_groups: list[int]) -> list[list[models.GroupRecord]]:
+def __grouping_deadline(start: float, time_limit: Optional[float], num_students: int) -> Optional[float]:
+    '''
+    returns the deadline (a time.time() value) of the grouping, so that the report can still be written within
+     the time limit (None if there is no time limit)
+    '''
+    if time_limit is None:
+        return None
+    return start + time_limit - max(time_limit * REPORT_TIME_FRACTION, num_students * REPORT_SECONDS_PER_STUDENT)
+
+
+def __run_grouping_algs(survey_data: models.SurveyData, config_data: models.Configuration, min_max_num_groups: list[int],
+                        deadline: Optional[float] = None, seed: Optional[int] = None) -> list[list[models.GroupRecord]]:
+    '''
+    Runs the grouping algorithms, returning the best solution of each. If there is a deadline (a time.time() value),
+     the algorithms return their best solution so far once it has passed. The second algorithm only gets half of the
+     time left, so the third one (which improves the second one's solution) gets the other half.
+    If there is a seed, the algorithms make the same random choices (and find the same solutions) every time, unless
+     they are stopped by the deadline.
+    '''
     GroupingManager.register('GroupingConsolePrinter',
                              printer.GroupingConsolePrinter)
     GroupingManager.register('Event',
@@ -106,7 +149,7 @@ def __run_grouping_algs(survey_data: models.SurveyData, config_data: models.Conf
     #pylint: disable=no-member
     with GroupingManager() as grouping_manager:
         managed_grouping_vars: models.ManagedGroupingVars = models.ManagedGroupingVars(
-            grouping_manager.Event(), grouping_manager.GroupingConsolePrinter())
+            grouping_manager.Event(), grouping_manager.GroupingConsolePrinter(), deadline, seed)
 
         futures: list[Future] = []
 
@@ -137,8 +180,6 @@ def __run_grouping_algs(survey_data: models.SurveyData, config_data: models.Conf
 
             ########## Launch "first" grouping algorithm ##########
             # Run the grouping algorithm for all possible number of groups while keeping only the best solution found
-            best_solution_grouper_1: Grouper1 = Grouper1(
-                survey_data.records, config_data, 0, managed_grouping_vars.grouping_console_printer)
             futures.append(
                 executor.submit(__run_grouping_alg_1, survey_data.records,
                                 config_data, min_max_num_groups[0],
@@ -147,25 +188,38 @@ def __run_grouping_algs(survey_data: models.SurveyData, config_data: models.Conf
 
             ########## Launch "second" grouping algorithm ##########
             # Run the grouping algorithm for all possible number of groups while keeping only the best solution found
-            best_solution_grouper_2: list[models.GroupRecord] = []
-            futures.append(
-                executor.submit(__run_grouping_alg_2, survey_data.records,
-                                config_data, min_max_num_groups[0],
-                                min_max_num_groups[1], managed_grouping_vars))
-
-            _, not_done = wait(futures, timeout=0)
-
+            # (by half of the time left, if there is a deadline)
+            future_grouper_2: Future = executor.submit(__run_grouping_alg_2, survey_data.records,
+                                                       config_data, min_max_num_groups[0],
+                                                       min_max_num_groups[1],
+                                                       replace(managed_grouping_vars, grouping_deadline=None if deadline is None
+                                                               else (time.time() + deadline) / 2))
+            futures.append(future_grouper_2)
+
+            ########## Launch "third" grouping algorithm ##########
+            # Improve the second algorithm's solution via simulated annealing or tabu search (per the config),
+            # and then via the exact search for a small section, as soon as it is available
+            # (while the first algorithm may still be running)
+            best_solution_grouper_3: list[models.GroupRecord] = []
+            future_grouper_3: Optional[Future] = None
+
+            not_done = set(futures)
             while not_done:
-                _, not_done = wait(not_done, timeout=1)
-
-            for future in as_completed(futures):
-                if isinstance(future.result(), Grouper1):
-                    best_solution_grouper_1 = future.result()
+                _, not_done = wait(not_done, timeout=1, return_when=FIRST_COMPLETED)
+                if future_grouper_3 is None and future_grouper_2.done() and \
+                        not managed_grouping_vars.grouping_cancel_event.is_set():
+                    future_grouper_3 = executor.submit(__run_grouping_alg_3, len(survey_data.records),
+                                                       config_data, future_grouper_2.result(), managed_grouping_vars)
+                    futures.append(future_grouper_3)
+                    not_done.add(future_grouper_3)
 
-                else:
-                    best_solution_grouper_2 = future.result()
+            if future_grouper_3 is not None:
+                best_solution_grouper_3, proven_optimal = future_grouper_3.result()
+                if proven_optimal is not None:
+                    click.echo('solution 3 is optimal (proven by the exact search)' if proven_optimal else
+                               'the exact search stopped before proving that solution 3 is optimal')
 
-        return [best_solution_grouper_1.best_solution_found, best_solution_grouper_2]
+        return [futures[0].result().best_solution_found, future_grouper_2.result(), best_solution_grouper_3]
 
 
 def __run_grouping_alg_1(records: list[models.SurveyRecord], config_data: models.Configuration,
@@ -174,16 +228,18 @@ def __run_grouping_alg_1(records: list[models.SurveyRecord], config_data: models
     best_solution_found: Grouper1 = Grouper1(
         records, config_data, 0, managed_grouping_vars.grouping_console_printer)
 
-    # Use multiprocessing to execute the grouping in parallel when there are multiple options for
-    # the number of groups.
-    no_finished_runs: bool = True
+    # Use multiprocessing to make the grouping passes (steps 1 thru 4, for each option for the number of groups)
+    # in parallel. Each pass gets its own seed, so that the passes make different random choices.
+    seed_generator: random.Random = algorithm_rng(managed_grouping_vars.grouping_seed, "grouper_1")
     with ProcessPoolExecutor() as executor:
         futures: list[Future] = []
         for num_groups in range(min_num_groups, max_num_groups + 1):
-            grouper = Grouper1(records, config_data,
-                               num_groups, managed_grouping_vars.grouping_console_printer)
-            futures.append(
-                executor.submit(grouper.create_groups, managed_grouping_vars.grouping_cancel_event))
+            for grouping_pass in range(max(config_data["grouping_passes"], 1)):
+                grouper = Grouper1(records, config_data,
+                                   num_groups, managed_grouping_vars.grouping_console_printer)
+                futures.append(
+                    executor.submit(grouper.create_pass, grouping_pass, seed_generator.getrandbits(32),
+                                    managed_grouping_vars.grouping_cancel_event, managed_grouping_vars.grouping_deadline))
 
         _, not_done = wait(futures, timeout=0)
 
@@ -194,16 +250,18 @@ def __run_grouping_alg_1(records: list[models.SurveyRecord], config_data: models
                     future.cancel()
                 return best_solution_found
 
-        use_alternative_scoring: bool = config_data['prioritize_preferred_over_availability']
-        for future in as_completed(futures):
+        # Keep the best of the passes' solutions (skipped passes have none)
+        for future in futures:
             grouper = future.result()
-            if (no_finished_runs or
-                (best_solution_found.best_solution_score <= grouper.best_solution_score) or
-                (best_solution_found.best_solution_score == grouper.best_solution_score) and
-                    (scoring.standard_dev_groups(best_solution_found.best_solution_found, best_solution_found.scoring_vars, use_alternative_scoring) >=
-                        scoring.standard_dev_groups(grouper.best_solution_found, grouper.scoring_vars, use_alternative_scoring))):
+            if grouper.best_solution_found and (not best_solution_found.best_solution_found or is_better_solution(
+                    grouper.best_solution_score, grouper.best_solution_std_dev,
+                    best_solution_found.best_solution_score, best_solution_found.best_solution_std_dev)):
                 best_solution_found = grouper
-            no_finished_runs = False
+
+    # Step 6 (backtracking phase 2) on the best solution
+    if best_solution_found.best_solution_found:
+        best_solution_found.finish_groups(managed_grouping_vars.grouping_cancel_event,
+                                          managed_grouping_vars.grouping_deadline)
     return best_solution_found
 
 
@@ -214,10 +272,11 @@ def __run_grouping_alg_2(records: list[models.SurveyRecord], config_data: models
     grouper_2.rank_students(records)
     best_solution_found: list[models.GroupRecord] = []
     best_score: float = 0
+    # each worker gets its own seed
+    seed_generator: random.Random = algorithm_rng(managed_grouping_vars.grouping_seed, "grouper_2")
     with ProcessPoolExecutor() as executor:
-        exec_results = {executor.submit(run_grouper_2, records, config_data, num_groups,
-                                        managed_grouping_vars.grouping_console_printer,
-                                        managed_grouping_vars.grouping_cancel_event):
+        exec_results = {executor.submit(run_grouper_2, records, config_data, num_groups, managed_grouping_vars,
+                                        seed_generator.getrandbits(32)):
                         num_groups for num_groups in range(min_num_groups, max_num_groups + 1)}
 
         _, not_done = wait(exec_results, timeout=0)
@@ -229,7 +288,8 @@ def __run_grouping_alg_2(records: list[models.SurveyRecord], config_data: models
                     future.cancel()
                 return best_solution_found
 
-        for idx, future in enumerate(as_completed(exec_results)):
+        # (in the order submitted, so that the tie-break doesn't depend on which worker finished first)
+        for idx, future in enumerate(exec_results):
             grouper = future.result()
             score = grouper.grade_groups()
             if score > best_score or idx == 0:
@@ -239,18 +299,67 @@ def __run_grouping_alg_2(records: list[models.SurveyRecord], config_data: models
         return best_solution_found
 
 
-def run_grouper_2(records, config_data, num_groups, grouping_console_printer, cancel_event: synchronize.Event):
+def __run_grouping_alg_3(num_students: int, config_data: models.Configuration, solution: list[models.GroupRecord],
+                         managed_grouping_vars: models.ManagedGroupingVars) -> tuple[list[models.GroupRecord], Optional[bool]]:
+    '''
+    Improves the solution via simulated annealing or tabu search (per the config) and then, for a section of at most
+     exact_search_max_students students, via the exact search. Returns the improved solution along with whether the
+     exact search proved it optimal (None if the section is too large for the exact search).
     '''
-    runs grouper 2 with the given number of groups
+    rng: random.Random = algorithm_rng(managed_grouping_vars.grouping_seed, "grouper_3")
+    if config_data.get("refinement_method") == models.RefinementMethodConsts.TABU_SEARCH:
+        managed_grouping_vars.grouping_console_printer.print('running grouper 3 (tabu search)')
+        tabu_grouper = grouper_4.Grouper4(num_students, config_data, managed_grouping_vars.grouping_console_printer, rng)
+        if managed_grouping_vars.grouping_seed is not None:
+            # only the iteration limit applies, so the solution doesn't depend on how fast the iterations are
+            tabu_grouper.time_limit = math.inf
+        solution = tabu_grouper.improve_groups(solution, managed_grouping_vars.grouping_cancel_event,
+                                               managed_grouping_vars.grouping_deadline)
+    else:
+        managed_grouping_vars.grouping_console_printer.print('running grouper 3 (simulated annealing)')
+        grouper = grouper_3.Grouper3(num_students, config_data, managed_grouping_vars.grouping_console_printer, rng)
+        if managed_grouping_vars.grouping_seed is not None:
+            # only the step limit applies, so the solution doesn't depend on how fast the steps are
+            grouper.time_limit = math.inf
+        solution = grouper.improve_groups(solution, managed_grouping_vars.grouping_cancel_event,
+                                          managed_grouping_vars.grouping_deadline)
+
+    if num_students > config_data.get("exact_search_max_students", grouper_5.DEFAULT_MAX_STUDENTS):
+        return solution, None
+    managed_grouping_vars.grouping_console_printer.print('running grouper 3 (exact search)')
+    exact_grouper = grouper_5.Grouper5(num_students, config_data, managed_grouping_vars.grouping_console_printer)
+    if managed_grouping_vars.grouping_seed is not None:
+        # only the node limit applies, so the solution doesn't depend on how fast the nodes are searched
+        exact_grouper.time_limit = math.inf
+    solution = exact_grouper.improve_groups(solution, managed_grouping_vars.grouping_cancel_event,
+                                            managed_grouping_vars.grouping_deadline)
+    return solution, exact_grouper.proven_optimal
+
+
+def run_grouper_2(records, config_data, num_groups, managed_grouping_vars: models.ManagedGroupingVars,
+                  seed: Optional[int] = None):
     '''
-    grouping_console_printer.print(
+    runs grouper 2 with the given number of groups (and seed for its random choices)
+    '''
+    managed_grouping_vars.grouping_console_printer.print(
         'running grouper 2 with ' + str(num_groups) + ' groups')
     grouper2 = grouper_2.Grouper2(
-        records, config_data, num_groups, grouping_console_printer)
-    grouper2.group_students(cancel_event)
+        records, config_data, num_groups, managed_grouping_vars.grouping_console_printer, random.Random(seed))
+    grouper2.group_students(managed_grouping_vars.grouping_cancel_event, managed_grouping_vars.grouping_deadline)
     return grouper2
 
 
+def algorithm_rng(seed: Optional[int], algorithm: str) -> random.Random:
+    '''
+    Returns the random number generator of the algorithm for the seed of the grouping (random if there is no seed).
+    Each algorithm gets a different generator for the same seed, and the same one every time.
+    '''
+    if seed is None:
+        return random.Random()
+    # (string seeds are hashed with sha512, not with the per-process string hashing)
+    return random.Random(f'{seed}:{algorithm}')
+
+
 def __report_filename(surveyfile: str, reportfile: str) -> str:
 
     # Set the default output filename values per the input filename (SURVEYFILE) value (if
@@ -3,9 +3,11 @@ verify contains all the commands for verifying the results
 of a grouping
 '''
 
+from typing import Optional
 import click
 from app import config, models
 from app.data import load, reporter
+from app.file import xlsx
 
 
 @click.command("report")
@@ -14,7 +16,9 @@ from app.data import load, reporter
 @click.option('-c', '--configfile', type=click.Path(exists=True), show_default=True, default="config.json", help="Enter the path to the config file.")
 @click.option('-r', '--reportfile', show_default=True, default="grouping_results_report.xlsx",
               help="Enter the path to the group report output file.")
-def report(groupfile: str, surveyfile: str, reportfile: str, configfile: str):
+@click.option('--cachedir', default=None, type=click.Path(file_okay=False),
+              help="directory to cache the loaded survey data in, so that unchanged surveys are not parsed again. Not cached if not included")
+def report(groupfile: str, surveyfile: str, reportfile: str, configfile: str, cachedir: Optional[str] = None):
     '''Generate report - Creates a report on the results of the groups that were generated. 
     It uses the raw survey file to verify the data.
 
@@ -26,14 +30,16 @@ def report(groupfile: str, surveyfile: str, reportfile: str, configfile: str):
     # load config data and survey data reader
     config_data: models.Configuration = config.read_json(configfile)
 
-    # load the survey data
-    survey_data = load.read_survey(config_data['field_mappings'], surveyfile)
+    # load the survey data (its raw rows are closed once the report is written)
+    with load.read_survey(config_data['field_mappings'], surveyfile, cachedir) as survey_data:
+        if survey_data.duplicates:
+            click.echo(load.duplicates_summary(survey_data.duplicates))
 
-    groups = load.read_groups(groupfile, survey_data.records)
+        groups = load.read_groups(groupfile, survey_data.records)
 
-    click.echo(f'Writing report to: "{reportfile}"')
-    reporter.write_report(
-        [groups], survey_data, config_data, reportfile)
+        click.echo(f'Writing report to: "{reportfile}"')
+        reporter.write_report(
+            [groups], survey_data, config_data, reportfile)
 
 
 @click.command("update-report")
@@ -45,15 +51,18 @@ def update_report(reportfile: str):
     REPORTFILE is the path to the xlsx based report file to read in
     '''
 
-    config_data: models.Configuration = config.read_report_config(reportfile)
+    # the report is opened once and its sheets are streamed, it must be closed before it is rewritten
+    with xlsx.XLSXReader(reportfile) as report_reader:
+        config_data: models.Configuration = config.read_report_config_from_xlsx(report_reader)
 
-    # load the survey data
-    survey_data = load.read_report_survey_data(reportfile,
-                                               config_data['field_mappings'])
+        # load the survey data
+        survey_data = load.read_report_survey_data_from_xlsx(report_reader,
+                                                             config_data['field_mappings'])
 
-    groups: list[list[models.GroupRecord]] = load.read_report_groups(
-        reportfile, survey_data.records)
+        groups: list[list[models.GroupRecord]] = load.read_report_groups_from_xlsx(
+            report_reader, survey_data.records)
 
     click.echo(f'Writing updated report to: "{reportfile}"')
-    reporter.write_report(groups, survey_data,
-                          config_data, reportfile)
+    with survey_data:
+        reporter.write_report(groups, survey_data,
+                              config_data, reportfile)
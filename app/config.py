@@ -1,10 +1,11 @@
 '''config holds the logic to read in a configuration object'''
 import json
 from io import TextIOWrapper, StringIO
+from itertools import zip_longest
 import logging
-from openpyxl import load_workbook
 from app import models
-from app.models import Configuration, NoSurveyGroupMethodConsts
+from app.file import xlsx
+from app.models import Configuration, NoSurveyGroupMethodConsts, RefinementMethodConsts
 
 __logger = logging.getLogger(__name__)
 
@@ -48,33 +49,38 @@ def read_report_config(report_filename: str) -> Configuration:
     '''
     Reads in json configuration data from the 'config' tab of an existing xlsx report file.
     '''
+    with xlsx.XLSXReader(report_filename) as report_reader:
+        return read_report_config_from_xlsx(report_reader)
+
+
+def read_report_config_from_xlsx(report_reader: xlsx.XLSXReader) -> Configuration:
+    '''
+    Reads in json configuration data from the 'config' tab of an (open) xlsx report.
+    '''
     config_sheet_name: str = "config"
 
-    # load the workbook
-    report_workbook = load_workbook(report_filename)
-    if config_sheet_name not in report_workbook.sheetnames:
+    if config_sheet_name not in report_reader.sheetnames:
         raise KeyError(
             "Unable to load the config data from the report file. 'config' tab does not exist.")
-    # get the workbook's config sheet
-    config_sheet = report_workbook['config']
 
     # Initialize empty dictionaries for the necessary config elements
     config_data = {}
     field_mappings = {}
     report_fields = {}
 
-    # iterate through the config sheet by column, since each config entry was stored as a separate column
-    for col in config_sheet.iter_cols():
+    # iterate through the config sheet by column, since each config entry was stored as a separate column.
+    # The sheet is streamed by row, so the (small) sheet is transposed into its columns.
+    for col in zip_longest(*report_reader.iter_rows(config_sheet_name)):
         config_item_value = []
         config_item_key: str = ""
-        for row_num, cell in enumerate(col):
+        for row_num, value in enumerate(col):
             if row_num == 0:
                 # The header of the column (first row) contains the item's key
-                config_item_key = str(cell.value)
-            elif cell.value is None:
+                config_item_key = str(value)
+            elif value is None:
                 continue
             else:
-                config_item_value.append(cell.value)
+                config_item_value.append(value)
 
         if len(config_item_value) == 1:
             # if there is only one value for the config item, we don't want to store it in a list
@@ -125,6 +131,16 @@ def __check_config_validity(config_data: Configuration):
         __logger.error('Invalid configuration selection for "no_survey_group_method".')
         raise ValueError('Invalid configuration selection for "no_survey_group_method".')
 
+    valid_refinement_methods = [RefinementMethodConsts.SIMULATED_ANNEALING, RefinementMethodConsts.TABU_SEARCH]
+    if config_data.get('refinement_method', RefinementMethodConsts.SIMULATED_ANNEALING) not in valid_refinement_methods:
+        __logger.error('Invalid configuration selection for "refinement_method".')
+        raise ValueError('Invalid configuration selection for "refinement_method".')
+
+    time_limit = config_data.get('time_limit')
+    if time_limit is not None and (isinstance(time_limit, bool) or not isinstance(time_limit, (int, float)) or time_limit <= 0):
+        __logger.error('Invalid configuration value for "time_limit", it must be a positive number of seconds.')
+        raise ValueError('Invalid configuration value for "time_limit", it must be a positive number of seconds.')
+
 def validate_field_mappings(fields: models.SurveyFieldMapping):
     '''
     Validates the field mappings specification in the configuration data.
@@ -2,6 +2,8 @@
 Core grouping class for general functionality
 """
 
+import time
+from typing import Optional
 import click
 from app import models
 
@@ -93,6 +95,23 @@ def get_min_max_num_groups(survey_data: list, target_group_size: int, target_plu
     return min_max_num_groups
 
 
+def get_min_max_group_size(target_group_size: int, target_plus_one_allowed: bool, target_minus_one_allowed: bool) -> list[int]:
+    '''
+    Function for determining the smallest and largest allowed group size, based upon the
+        target group size (+1 and/or -1, as applicable).
+    Returns [min, max] values
+    '''
+    return [target_group_size - (1 if target_minus_one_allowed else 0),
+            target_group_size + (1 if target_plus_one_allowed else 0)]
+
+
+def past_deadline(deadline: Optional[float]) -> bool:
+    '''
+    Returns True if the deadline (a time.time() value, None for no deadline) has passed, and False otherwise.
+    '''
+    return deadline is not None and time.time() >= deadline
+
+
 def pre_group_error_checking(target_group_size: int, target_plus_one_allowed: bool,
                              target_minus_one_allowed: bool, surveys_list: list[models.SurveyRecord]) -> bool:
     '''
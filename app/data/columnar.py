@@ -0,0 +1,159 @@
+'''
+This file includes a columnar form of the survey data, where each student is a row (their position in the
+ survey records) and each attribute is a column (an array over the rows), so that groups given as lists of
+ rows can be validated and scored without accessing the attributes of the individual survey records.
+
+The columns are used by the searches that work on row positions (see grouper_5). The groupers that move the
+ survey records themselves between groups (grouper_1 to grouper_4), and the validators they use, work on the
+ records' own student indices, adjacency bitsets and availability masks instead (see validate and
+ group_state). Those give the same counts without walking the records' attributes, so those groupers are not
+ moved onto the columns, which would need a translation between rows and student indices on every move.
+'''
+from array import array
+from typing import Iterable
+from app import models
+from app.group import validate
+
+
+class SurveyColumns:
+    '''
+    The survey records as columns:
+     - student_ids: the id of the student in each row (row_by_id looks up the row of an id)
+     - preferred_offsets/preferred_rows and disliked_offsets/disliked_rows: the rows of each student's
+        preferred/disliked students in compressed sparse row (CSR) form, the rows of the students
+        preferred by row r being preferred_rows[preferred_offsets[r]:preferred_offsets[r + 1]]
+     - availability: the availability bitmask of each row (see validate.availability_mask)
+     - flag columns (1/0 per row) for provided_survey_data, provided_availability, has_matching_availability,
+        provided_pref_students and pref_pairing_possible
+
+    Preferred/disliked students that are not in the records are left out. If an id is repeated, the
+     first record is used.
+    The like/dislike adjacency matrix rows (preferred_bits, disliked_bits) are bitsets over the rows, so
+     the membership of a group is the bitset of its rows (see membership). These are not interchangeable
+     with the bitsets built by validate, which are over the process-wide student indices.
+    '''
+
+    def __init__(self, records: list[models.SurveyRecord]):
+        self.student_ids: tuple[str, ...] = tuple(record.student_id for record in records)
+        self.row_by_id: dict[str, int] = {}
+        for row, student_id in enumerate(self.student_ids):
+            self.row_by_id.setdefault(student_id, row)
+
+        self.preferred_offsets, self.preferred_rows = self.__sparse_rows(
+            record.preferred_students for record in records)
+        self.disliked_offsets, self.disliked_rows = self.__sparse_rows(
+            record.disliked_students for record in records)
+        self.preferred_bits: list[int] = self.__adjacency_bits(self.preferred_offsets, self.preferred_rows)
+        self.disliked_bits: list[int] = self.__adjacency_bits(self.disliked_offsets, self.disliked_rows)
+
+        self.availability: list[int] = [validate.user_availability_mask(record) for record in records]
+
+        self.provided_survey_data = array('b', (record.provided_survey_data for record in records))
+        self.provided_availability = array('b', (record.provided_availability for record in records))
+        self.has_matching_availability = array('b', (record.has_matching_availability for record in records))
+        self.provided_pref_students = array('b', (record.provided_pref_students for record in records))
+        self.pref_pairing_possible = array('b', (record.pref_pairing_possible for record in records))
+
+    def __len__(self) -> int:
+        return len(self.student_ids)
+
+    def __sparse_rows(self, id_lists: Iterable[list[str]]) -> tuple[array, array]:
+        '''
+        builds the CSR (offsets, rows) structure from each row's list of student ids
+        '''
+        offsets = array('l', [0])
+        rows = array('l')
+        for student_ids in id_lists:
+            rows.extend(self.row_by_id[student_id] for student_id in student_ids if student_id in self.row_by_id)
+            offsets.append(len(rows))
+        return offsets, rows
+
+    @staticmethod
+    def __adjacency_bits(offsets: array, rows: array) -> list[int]:
+        '''
+        builds the rows of the adjacency matrix (bit j of row r set if row r lists row j) from the CSR structure
+        '''
+        bits: list[int] = []
+        for start, end in zip(offsets, offsets[1:]):
+            row_bits: int = 0
+            for row in rows[start:end]:
+                row_bits |= 1 << row
+            bits.append(row_bits)
+        return bits
+
+    def preferred(self, row: int) -> array:
+        '''
+        returns the rows of the students preferred by the student in the row
+        '''
+        return self.preferred_rows[self.preferred_offsets[row]:self.preferred_offsets[row + 1]]
+
+    def disliked(self, row: int) -> array:
+        '''
+        returns the rows of the students disliked by the student in the row
+        '''
+        return self.disliked_rows[self.disliked_offsets[row]:self.disliked_offsets[row + 1]]
+
+    def rows(self, members: Iterable[models.SurveyRecord]) -> list[int]:
+        '''
+        returns the rows of the members
+        '''
+        return [self.row_by_id[member.student_id] for member in members]
+
+    @staticmethod
+    def membership(rows: Iterable[int]) -> int:
+        '''
+        returns the membership vector of the rows as a bitset
+        '''
+        bits: int = 0
+        for row in rows:
+            bits |= 1 << row
+        return bits
+
+    def group_stats(self, rows: list[int]) -> models.GroupStats:
+        '''
+        Computes the scoring inputs of a group with the students in the rows (see group_state.compute_group_stats).
+        The stats can be scored like any other (see scoring.score_group_stats), their membership is a bitset of
+         the rows.
+        '''
+        membership: int = self.membership(rows)
+        stats = models.GroupStats(len(rows), membership)
+        if len(rows) > 0:
+            stats.availability_mask = -1
+            for row in rows:
+                stats.availability_mask &= self.availability[row]
+
+        for row in rows:
+            stats.num_disliked_pairs += (self.disliked_bits[row] & membership).bit_count()
+            num_liked: int = (self.preferred_bits[row] & membership).bit_count()
+            stats.num_preferred_pairs += num_liked
+            if not self.pref_pairing_possible[row]:
+                stats.num_students_pref_pair_not_possible += 1
+            elif num_liked == 0:
+                stats.num_students_no_pref_pairs += 1
+
+        return stats
+
+    def total_disliked_pairings(self, groups: list[list[int]]) -> int:
+        '''
+        returns the total number of disliked pairings in the groups (see validate.total_disliked_pairings)
+        '''
+        return sum(self.group_stats(rows).num_disliked_pairs for rows in groups)
+
+    def total_liked_pairings(self, groups: list[list[int]]) -> int:
+        '''
+        returns the total number of liked pairings in the groups (see validate.total_liked_pairings)
+        '''
+        return sum(self.group_stats(rows).num_preferred_pairs for rows in groups)
+
+    def total_students_no_preferred_pair(self, groups: list[list[int]]) -> int:
+        '''
+        returns the total number of students that could have at least one preferred pairing but do not
+         (see validate.total_students_no_preferred_pair)
+        '''
+        return sum(self.group_stats(rows).num_students_no_pref_pairs for rows in groups)
+
+    def total_groups_no_availability(self, groups: list[list[int]]) -> int:
+        '''
+        returns the number of groups without an overlapping time slot (see validate.total_groups_no_availability)
+        '''
+        return sum(1 for rows in groups if self.group_stats(rows).availability_mask == 0)
@@ -2,40 +2,58 @@
 Provides the ability to load data into the program including raw survey data and grouped data
 """
 
-import copy
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 import csv
-from io import TextIOWrapper
-from io import StringIO
+from io import StringIO, TextIOWrapper
+from itertools import pairwise, repeat
 import logging
+import os
 import re
+import sys
 import datetime as dt
-from typing import Union
-from openpyxl import load_workbook
+from typing import Iterable, Iterator, Optional
 from app import models
 from app.group import validate
 from app import config
+from app.data import survey_cache
+from app.file import csv_spool, xlsx
 
 __logger = logging.getLogger(__name__)
 
 
+# survey files of at least this many bytes (roughly 10,000 rows of about 250 bytes) are parsed in parallel
+# (see read_survey_parallel). The file size stands in for the row count, so the file isn't read just to count them.
+PARALLEL_PARSE_MIN_BYTES = 2500000
+
+NON_SPACE_PATTERN = re.compile(r'\S')
+ASURITE_PATTERN = re.compile(r'\S+')
+SPACE_PATTERN = re.compile(r'\s')
+
+
 def parse_asurite(val: str) -> str:
     '''
     parses a student's id from the string.
     Returns the first value when splitting a str on a space character
     '''
-    return re.search(r'\S+', val).group()
+    return ASURITE_PATTERN.search(val).group()
 
 
 def split_on_delimiters(availability: str, delimiters: str):
     '''
     allows handling of as many delimiters as the user wants to define in the config file, used by parse_survey_record()
     '''
+    return delimiters_pattern(delimiters).split(availability)
+
+
+def delimiters_pattern(delimiters: str) -> re.Pattern:
+    '''
+    compiles the pattern that splits availability values on any of the delimiter characters
+    '''
     if len(delimiters) == 0:
         raise ValueError(
             "Configuration file has no availability delimiters defined")
-    delim_chars = f'[{re.escape(delimiters)}]'
-
-    return re.split(delim_chars, availability)
+    return re.compile(f'[{re.escape(delimiters)}]')
 
 
 def total_availability_matches(student: models.SurveyRecord, students: list[models.SurveyRecord]) -> int:
@@ -62,6 +80,53 @@ def total_availability_matches(student: models.SurveyRecord, students: list[mode
     return totals
 
 
+def availability_cells(student: models.SurveyRecord) -> list[tuple[str, str]]:
+    '''
+    returns each (time, day) the student marked as available
+    '''
+    return [(time, avail_day) for time, avail_days in student.availability.items()
+            for avail_day in avail_days if not avail_day == '']
+
+
+class AvailabilityHistogram:
+    '''
+    Counts the number of students available at each (time, day) of the survey, so that the number of times a
+     student matches availability in the dataset (see total_availability_matches) takes time proportional to
+     the student's own availability instead of to the whole dataset.
+    A student's availability must be removed before it is changed, and added back afterwards.
+    '''
+
+    def __init__(self, students: list[models.SurveyRecord]):
+        self.counts: Counter = Counter()
+        # counts per student id, so a student's own availability can be excluded from their matches
+        self.counts_by_id: dict[str, Counter] = {}
+        for student in students:
+            self.add(student)
+
+    def add(self, student: models.SurveyRecord):
+        '''
+        adds the student's availability to the counts
+        '''
+        cells = availability_cells(student)
+        self.counts.update(cells)
+        self.counts_by_id.setdefault(student.student_id, Counter()).update(cells)
+
+    def remove(self, student: models.SurveyRecord):
+        '''
+        removes the student's availability from the counts
+        '''
+        cells = availability_cells(student)
+        self.counts.subtract(cells)
+        self.counts_by_id[student.student_id].subtract(cells)
+
+    def total_matches(self, student: models.SurveyRecord) -> int:
+        '''
+        returns the number of times the student matches availability with the other students
+        '''
+        own_counts: Counter = self.counts_by_id.get(student.student_id, Counter())
+        return sum(self.counts[cell] - own_counts[cell] for cell in set(availability_cells(student)))
+
+
 def wildcard_availability(availability_fields: list) -> dict[str, list[str]]:
     '''
     constructs availability to match all of the time fields provided for any given day
@@ -73,6 +138,15 @@ def wildcard_availability(availability_fields: list) -> dict[str, list[str]]:
     return avail
 
 
+def assign_wildcard_availability(student: models.SurveyRecord, availability_fields: list):
+    '''
+    sets the student's availability (and its bitmask) to match all of the time fields provided for any given day
+    '''
+    student.availability = wildcard_availability(availability_fields)
+    student.availability_mask = validate.availability_mask(
+        student.availability, validate.availability_field_offsets(availability_fields))
+
+
 def has_availability(student: models.SurveyRecord) -> bool:
     '''
     checks if the student marked any days that they were available during the allotted time
@@ -96,12 +170,14 @@ def preprocess_survey_data(students: list[models.SurveyRecord], field_mapping: m
     - checking for students that could "possibly" be paired with one of their preferred students (they provided
         preferred student(s) and at list one of these students didn't list them as "disliked")
     '''
+    histogram = AvailabilityHistogram(students)
     for student in students:
         if not student.provided_availability:
             print(f"student '{student.student_id}' did not provide any availability")
-            student.availability = wildcard_availability(
-                field_mapping["availability_field_names"])
-        if total_availability_matches(student, students) == 0:
+            histogram.remove(student)
+            assign_wildcard_availability(student, field_mapping["availability_field_names"])
+            histogram.add(student)
+        if histogram.total_matches(student) == 0:
             print(f"student '{student.student_id}' did not have matching availability with anyone else")
             student.has_matching_availability = False
         # remove self from list of disliked
@@ -112,70 +188,281 @@ def preprocess_survey_data(students: list[models.SurveyRecord], field_mapping: m
             student.preferred_students.remove(student.student_id)
         # did student provide preferred student selection
         student.provided_pref_students = len(student.preferred_students) > 0
+
+    # the preferred/disliked lists are final at this point, so index them
+    students_by_idx: dict[int, models.SurveyRecord] = index_survey_records(students)
+
+    for student in students:
         # could student "possibly" (reasonably) be paired with one of their preferred selections
         student.pref_pairing_possible = validate.student_pref_pair_possible(
-            students, student)
+            students, student, students_by_idx)
+
+
+def index_survey_records(students: list[models.SurveyRecord]) -> dict[int, models.SurveyRecord]:
+    '''
+    Gives each student a dense integer index and converts their preferred/disliked students into
+    bitsets of indices, so that the validators and scorers can do constant time membership checks.
+    The indices start over for every survey. Returns a lookup of the students by their index.
+    '''
+    validate.reset_student_indices()
+    for student in students:
+        validate.index_student(student)
+
+    return validate.students_by_index(students)
+
+
+class SurveyParsePlan:
+    '''
+    A plan for parsing the rows of a survey file into survey records, compiled once per file from the
+     header row and the field mapping: the column position of each mapped field and the availability
+     delimiter pattern. Rows are then parsed positionally (as lists of values, as read by csv.reader).
+    '''
+
+    def __init__(self, field_mapping: models.SurveyFieldMapping, fieldnames: list, delimiters: str):
+        # if a field name is repeated, the last column is used (as with csv.DictReader)
+        positions: dict = {fieldname: idx for idx, fieldname in enumerate(fieldnames)}
+        self.fieldnames: list = fieldnames
+        self.student_id_pos: Optional[int] = positions.get(field_mapping['student_id_field_name'])
+        self.preferred_pos: list[int] = [positions[field] for field in field_mapping['preferred_students_field_names']]
+        self.disliked_pos: list[int] = [positions[field] for field in field_mapping['disliked_students_field_names']]
+        self.availability_pos: list[tuple[str, int]] = [
+            (field, positions[field]) for field in field_mapping['availability_field_names']]
+        # the availability masks are laid out in the order of the availability fields (see validate.availability_mask)
+        self.availability_offsets: dict[str, int] = validate.availability_field_offsets(
+            field_mapping['availability_field_names'])
+        self.timezone_pos: Optional[int] = self.__optional_position(field_mapping, 'timezone_field_name', positions)
+        self.name_pos: Optional[int] = self.__optional_position(field_mapping, 'student_name_field_name', positions)
+        self.email_pos: Optional[int] = self.__optional_position(field_mapping, 'student_email_field_name', positions)
+        self.login_pos: Optional[int] = self.__optional_position(field_mapping, 'student_login_field_name', positions)
+        self.submission_date_pos: Optional[int] = self.__optional_position(
+            field_mapping, 'submission_timestamp_field_name', positions)
+        self.delimiters: str = delimiters
+        self.delimiters_pattern: Optional[re.Pattern] = None  # compiled on first use
+
+    @staticmethod
+    def __optional_position(field_mapping: models.SurveyFieldMapping, key: str, positions: dict) -> Optional[int]:
+        '''
+        returns the position of an optional field, or None if the field isn't mapped
+        '''
+        if not field_mapping.get(key):
+            return None
+        return positions[field_mapping[key]]
+
+    def parse(self, row: list) -> models.SurveyRecord:
+        '''
+        parses a survey record from a row (list of values) in the dataset
+        '''
+        if len(row) < len(self.fieldnames):
+            row = row + [None] * (len(self.fieldnames) - len(row))  # missing values (as with csv.DictReader)
+
+        student_id = row[self.student_id_pos] if self.student_id_pos is not None else None
+        if student_id is None or len(student_id.strip()) == 0:
+            raise ValueError(f"found empty student id field in row: {dict(zip(self.fieldnames, row))}")
+
+        # ids and availability values are interned, as the same strings are repeated across many records
+        survey = models.SurveyRecord(sys.intern(parse_asurite(student_id)))
+
+        # (deduplicated in the order of the survey's fields, so the order doesn't depend on string hashing)
+        survey.preferred_students = list(dict.fromkeys(sys.intern(parse_asurite(row[pos]).lower())
+                                                       for pos in self.preferred_pos if NON_SPACE_PATTERN.search(row[pos])))
+        survey.disliked_students = list(dict.fromkeys(sys.intern(parse_asurite(row[pos]).lower())
+                                                      for pos in self.disliked_pos if NON_SPACE_PATTERN.search(row[pos])))
+
+        for field, pos in self.availability_pos:
+            avail_str = SPACE_PATTERN.sub('', row[pos].lower())
+            survey.availability[field] = []
+            if avail_str:
+                if self.delimiters_pattern is None:
+                    self.delimiters_pattern = delimiters_pattern(self.delimiters)
+                survey.availability[field] = [sys.intern(value) for value in self.delimiters_pattern.split(avail_str)]
+
+        if self.timezone_pos is not None:
+            survey.timezone = row[self.timezone_pos].strip()
+        if self.name_pos is not None and row[self.name_pos]:
+            survey.student_name = row[self.name_pos].strip()
+        if self.email_pos is not None and row[self.email_pos]:
+            survey.student_email = row[self.email_pos].strip()
+        if self.login_pos is not None and row[self.login_pos]:
+            survey.student_login = row[self.login_pos].strip()
+        if self.submission_date_pos is not None and row[self.submission_date_pos]:
+            survey.submission_date = dt.datetime.strptime(
+                row[self.submission_date_pos][:-4], '%Y/%m/%d %I:%M:%S %p')
+        survey.provided_availability = has_availability(survey)
+        survey.availability_mask = validate.availability_mask(survey.availability, self.availability_offsets)
+
+        return survey
 
 
 def parse_survey_record(field_mapping: models.SurveyFieldMapping, row: dict) -> models.SurveyRecord:
     '''
-    parses a survey record from a row in the dataset
+    parses a survey record from a row (dict of field name to value) in the dataset.
+    To parse many rows of the same file, use a SurveyParsePlan instead.
     '''
+    plan = SurveyParsePlan(field_mapping, list(row.keys()), config.CONFIG_DATA["availability_values_delimiter"])
+    return plan.parse(list(row.values()))
 
-    if row.get(field_mapping['student_id_field_name']) is None or len(row[field_mapping['student_id_field_name']].strip()) == 0:
-        raise ValueError(f"found empty student id field in row: {row}")
 
-    survey = models.SurveyRecord(parse_asurite(row[field_mapping['student_id_field_name']]))
+def read_survey(field_mapping: models.SurveyFieldMapping, data_file_path: str,
+                cache_dir: Optional[str] = None) -> models.SurveyData:
+    '''
+    Loads the data from the survey.
+    If there is a duplicate survey record, it will use (keep) the one with the submission
+     date that is equal to or greater
+    If a cache_dir is provided, the loaded survey data is stored there (see survey_cache), and loading the
+     same file with the same field mapping and delimiters again skips parsing and preprocessing.
+    '''
+    if cache_dir is None:
+        return __read_survey_file(field_mapping, data_file_path)
 
-    for field in field_mapping['preferred_students_field_names']:
-        if re.search(r'\S', row[field]):
-            survey.preferred_students.append(parse_asurite(row[field]).lower())
+    key = survey_cache.cache_key(data_file_path, field_mapping, config.CONFIG_DATA["availability_values_delimiter"])
+    survey_data = survey_cache.read_cached_survey(cache_dir, key, data_file_path)
+    if survey_data is not None:
+        # the student indices are specific to the process, so they are rebuilt (the availability masks follow the
+        #  order of the availability fields, which is part of the key)
+        index_survey_records(survey_data.records)
+        return survey_data
 
-    survey.preferred_students = list(set(survey.preferred_students))
+    survey_data = __read_survey_file(field_mapping, data_file_path)
+    survey_cache.write_cached_survey(cache_dir, key, survey_data)
 
-    for field in field_mapping['disliked_students_field_names']:
-        if re.search(r'\S', row[field]):
-            survey.disliked_students.append(
-                parse_asurite(row[field]).lower())
-    survey.disliked_students = list(set(survey.disliked_students))
+    return survey_data
 
-    for field in field_mapping['availability_field_names']:
-        avail_str = re.sub(r'\s', '', row[field].lower())
-        survey.availability[field] = []
-        if avail_str and re.search(r'\S', avail_str):
-            survey.availability[field] = split_on_delimiters(
-                avail_str, config.CONFIG_DATA["availability_values_delimiter"])
 
-    if field_mapping.get('timezone_field_name'):
-        survey.timezone = row[field_mapping['timezone_field_name']].strip()
-    if (field_mapping.get("student_name_field_name") and row[field_mapping["student_name_field_name"]]):
-        survey.student_name = row[field_mapping["student_name_field_name"]].strip()
-    if (field_mapping.get("student_email_field_name") and row[field_mapping["student_email_field_name"]]):
-        survey.student_email = row[field_mapping["student_email_field_name"]].strip()
-    if (field_mapping.get("student_login_field_name") and row[field_mapping["student_login_field_name"]]):
-        survey.student_login = row[field_mapping["student_login_field_name"]].strip()
-    if (field_mapping.get("submission_timestamp_field_name") and row[field_mapping["submission_timestamp_field_name"]]):
-        survey.submission_date = dt.datetime.strptime(
-            row[field_mapping["submission_timestamp_field_name"]][:-4], '%Y/%m/%d %I:%M:%S %p')
-    survey.provided_availability = has_availability(survey)
+def __read_survey_file(field_mapping: models.SurveyFieldMapping, data_file_path: str) -> models.SurveyData:
+    '''
+    Loads the survey data from the file. Files of at least PARALLEL_PARSE_MIN_BYTES bytes are parsed in
+     parallel (see read_survey_parallel).
+    '''
+    if os.path.getsize(data_file_path) >= PARALLEL_PARSE_MIN_BYTES:
+        survey_data = read_survey_parallel(field_mapping, data_file_path)
+        if survey_data is not None:
+            return survey_data
 
-    return survey
+    # the raw rows are read again from the file when they are needed (for the report), rather than being kept
+    raw_rows = csv_spool.CsvFileRows(data_file_path)
+    duplicates: list[models.DuplicateSubmission] = []
+    with open(data_file_path, 'r', encoding='utf-8-sig') as data_file:
+        records: list[models.SurveyRecord] = read_survey_records(field_mapping, data_file, duplicates)
 
+    return models.SurveyData(records, raw_rows, duplicates)
 
-def read_survey(field_mapping: models.SurveyFieldMapping, data_file_path: str) -> models.SurveyData:
+
+def read_survey_parallel(field_mapping: models.SurveyFieldMapping, data_file_path: str,
+                         max_workers: Optional[int] = None, num_chunks: Optional[int] = None) -> Optional[models.SurveyData]:
     '''
-    Loads the data from the survey.
-    If there is a duplicate survey record, it will use (keep) the one with the submission
-     date that is equal to or greater
+    Loads the survey data like read_survey_from_io, but with the rows parsed in a pool of (max_workers)
+     processes. The file is split into (num_chunks) byte ranges ending on row boundaries (see row_boundaries),
+     which are parsed by the workers (see parse_survey_chunk). The records are then deduplicated and
+     preprocessed in order, so the result is the same as loading the file sequentially.
+    The row boundaries are found by counting quotes, which relies on any field that contains a quote being
+     quoted (as in RFC 4180). If a chunk is not well formed, None is returned and the file should be loaded
+     sequentially instead.
+    '''
+    raw_rows = csv_spool.CsvFileRows(data_file_path)
+    with open(data_file_path, 'rb') as data_file:
+        data: bytes = data_file.read()
+
+    header_end: int = row_end(data, 0)
+    fieldnames: Optional[list[str]] = next(
+        csv.reader(StringIO(data[:header_end].decode('utf-8-sig'), newline=None)), None)
+    check_survey_field_headers(field_mapping, fieldnames)
+
+    if num_chunks is None:
+        num_chunks = 4 * (max_workers or os.cpu_count() or 1)
+    boundaries: list[int] = row_boundaries(data, header_end, num_chunks)
+    chunks = (data[start:end] for start, end in pairwise(boundaries))
+    delimiters: str = config.CONFIG_DATA["availability_values_delimiter"]
+    try:
+        with ProcessPoolExecutor(max_workers) as executor:
+            chunk_results = list(executor.map(
+                parse_survey_chunk, repeat(field_mapping), repeat(fieldnames), repeat(delimiters), chunks))
+    except csv.Error:
+        return None
+
+    return __survey_data_from_chunks(field_mapping, chunk_results, raw_rows)
+
+
+def __survey_data_from_chunks(field_mapping: models.SurveyFieldMapping, chunk_results: list[list[models.SurveyRecord]],
+                              raw_rows: csv_spool.CsvFileRows) -> models.SurveyData:
+    '''
+    combines the parsed chunks of a survey file (in order), then deduplicates and preprocesses the records
     '''
-    raw_rows: list[list[str]] = []
     records: list[models.SurveyRecord] = []
-    with open(data_file_path, 'r', encoding='utf-8-sig') as data_file:
-        raw_rows.extend(read_survey_raw(data_file))
-        data_file.seek(0)
-        records.extend(read_survey_records(field_mapping, data_file))
+    default_submission_date: dt.datetime = models.SurveyRecord('').submission_date
+    for chunk_records in chunk_results:
+        for record in chunk_records:
+            if record.submission_date is None:
+                record.submission_date = default_submission_date
+        records.extend(chunk_records)
+
+    duplicates: list[models.DuplicateSubmission] = []
+    surveys: list[models.SurveyRecord] = dedup_survey_records(records, duplicates)
+    preprocess_survey_data(surveys, field_mapping)
+
+    return models.SurveyData(surveys, raw_rows, duplicates)
 
-    return models.SurveyData(records, raw_rows)
+
+def parse_survey_chunk(field_mapping: models.SurveyFieldMapping, fieldnames: list[str], delimiters: str,
+                       chunk: bytes) -> list[models.SurveyRecord]:
+    '''
+    parses the rows of a chunk of a survey file (see read_survey_parallel), returning the records. Raises a
+     csv.Error if the chunk is not well formed.
+    The default submission date is specific to the process, so records without a submission date are
+     returned with None instead.
+    '''
+    plan = SurveyParsePlan(field_mapping, fieldnames, delimiters)
+    rows = csv.reader(StringIO(chunk.decode('utf-8'), newline=None), strict=True)
+
+    default_submission_date: dt.datetime = models.SurveyRecord('').submission_date
+    records: list[models.SurveyRecord] = []
+    for row in rows:
+        if not row:
+            continue  # skip blank lines
+        record = plan.parse(row)
+        if record.submission_date is default_submission_date:
+            record.submission_date = None
+        records.append(record)
+
+    return records
+
+
+def row_boundaries(data: bytes, start: int, num_chunks: int) -> list[int]:
+    '''
+    returns the offsets that split data[start:] into (at most) num_chunks byte ranges of about the same size,
+     each ending on a row boundary. start must be a row boundary.
+    '''
+    if start >= len(data):
+        return [start]
+
+    boundaries: list[int] = [start]
+    for chunk in range(1, num_chunks):
+        target: int = start + (len(data) - start) * chunk // num_chunks
+        if target < boundaries[-1]:
+            continue
+        # the quotes between the last boundary and the target are part of the row the target is in
+        boundary: int = row_end(data, target, data.count(b'"', boundaries[-1], target))
+        if boundary >= len(data):
+            break
+        boundaries.append(boundary)
+    boundaries.append(len(data))
+
+    return boundaries
+
+
+def row_end(data: bytes, pos: int, quotes: int = 0) -> int:
+    '''
+    returns the offset just after the end of the row that pos is in (or len(data)), given the number of quotes
+     between the start of the row and pos. A newline ends the row when it is outside of a quoted field,
+     which is when the number of quotes before it is even (quotes within a quoted field are doubled).
+    '''
+    while True:
+        newline: int = data.find(b'\n', pos)
+        if newline == -1:
+            return len(data)
+        quotes += data.count(b'"', pos, newline)
+        pos = newline + 1
+        if quotes % 2 == 0:
+            return pos
 
 
 def read_survey_from_io(field_mapping: models.SurveyFieldMapping, text_buffer: TextIOWrapper) -> models.SurveyData:
@@ -183,14 +470,26 @@ def read_survey_from_io(field_mapping: models.SurveyFieldMapping, text_buffer: T
     Loads the survey data from an io buffer version of the data.
     If there is a duplicate survey record, it will use (keep) the one with the submission
      date that is equal to or greater
+    The data is read in a single pass; the raw rows are spooled (see csv_spool.SpooledRows) as the
+     records are parsed.
     '''
-    raw_rows: list[list[str]] = []
-    records: list[models.SurveyRecord] = []
-    raw_rows.extend(read_survey_raw(text_buffer))
-    text_buffer.seek(0)
-    records.extend(read_survey_records(field_mapping, text_buffer))
+    return __spool_survey_rows(field_mapping, csv.reader(text_buffer))
+
 
-    return models.SurveyData(records, raw_rows)
+def __spool_survey_rows(field_mapping: models.SurveyFieldMapping, rows: Iterable[list[str]]) -> models.SurveyData:
+    '''
+    loads the survey data from the rows, spooling the raw rows as they are parsed. The spooled rows are
+     closed if the rows can't be loaded.
+    '''
+    raw_rows = csv_spool.SpooledRows()
+    duplicates: list[models.DuplicateSubmission] = []
+    try:
+        records: list[models.SurveyRecord] = read_survey_rows(field_mapping, rows, duplicates, raw_rows)
+    except BaseException:
+        raw_rows.close()
+        raise
+
+    return models.SurveyData(records, raw_rows, duplicates)
 
 
 def read_survey_raw(data_file: TextIOWrapper) -> list[list[str]]:
@@ -253,38 +552,89 @@ def __field_map_error_msg(field: str):
     return f"Error: header '{field}' does not exist in the survey data file. Please check your field_mapping configuration"
 
 
-def read_survey_records(field_mapping: models.SurveyFieldMapping, data_file: TextIOWrapper) -> list[models.SurveyRecord]:
+def read_survey_records(field_mapping: models.SurveyFieldMapping, data_file: TextIOWrapper,
+                        duplicates: Optional[list[models.DuplicateSubmission]] = None,
+                        raw_rows: Optional[csv_spool.SpooledRows] = None) -> list[models.SurveyRecord]:
     '''
-    reads in a csv file using a csv dictreader and maps the fields back to the survey records
+    reads in a csv file and maps the fields (named by the header row) back to the survey records
+     (see SurveyParsePlan).
+    If there is a duplicate survey record, it will use (keep) the one with the submission
+     date that is equal to or greater. Each duplicate resolved is added to duplicates, if provided.
+    If raw_rows is provided, every row of the file (including the header) is appended to it as it is read.
     '''
-    reader = csv.DictReader(data_file)
-    surveys: list[models.SurveyRecord] = []
+    return read_survey_rows(field_mapping, csv.reader(data_file), duplicates, raw_rows)
 
-    check_survey_field_headers(field_mapping, reader.fieldnames)
 
-    for row in reader:
-        survey = parse_survey_record(field_mapping, row)
-
-        skip_user = False
-        for idx, existing_survey_record in enumerate(surveys):
-            if existing_survey_record.student_id == survey.student_id:
-                if survey.submission_date >= existing_survey_record.submission_date:
-                    print(
-                        f'found duplicate record for id: {existing_survey_record.student_id}. Using record with timestamp: {survey.submission_date}')
-                    surveys[idx] = survey
-                else:
-                    print(
-                        f'skipped adding record with id: {existing_survey_record.student_id} and timestamp: {survey.submission_date}')
-                skip_user = True
-
-        if not skip_user:
-            surveys.append(survey)
+def read_survey_rows(field_mapping: models.SurveyFieldMapping, rows: Iterable[list[str]],
+                     duplicates: Optional[list[models.DuplicateSubmission]] = None,
+                     raw_rows: Optional[csv_spool.SpooledRows] = None) -> list[models.SurveyRecord]:
+    '''
+    maps the fields of the survey rows (named by the first/header row) back to the survey records.
+    See read_survey_records.
+    '''
+    reader = __tee_rows(rows, raw_rows)
+    fieldnames: Optional[list[str]] = next(reader, None)
+
+    check_survey_field_headers(field_mapping, fieldnames)
+    plan = SurveyParsePlan(field_mapping, fieldnames, config.CONFIG_DATA["availability_values_delimiter"])
+
+    surveys: list[models.SurveyRecord] = dedup_survey_records((plan.parse(row) for row in reader if row), duplicates)
 
     preprocess_survey_data(surveys, field_mapping)
 
     return surveys
 
 
+def dedup_survey_records(records: Iterable[models.SurveyRecord],
+                         duplicates: Optional[list[models.DuplicateSubmission]] = None) -> list[models.SurveyRecord]:
+    '''
+    returns the records (in order) with one record per student. If there is a duplicate survey record, it
+     will use (keep) the one with the submission date that is equal to or greater, in the position of the
+     student's first record. Each duplicate resolved is added to duplicates, if provided.
+    '''
+    surveys: list[models.SurveyRecord] = []
+    survey_idx_by_id: dict[str, int] = {}
+
+    for survey in records:
+        idx = survey_idx_by_id.get(survey.student_id)
+        if idx is None:
+            survey_idx_by_id[survey.student_id] = len(surveys)
+            surveys.append(survey)
+            continue
+
+        existing_survey_record = surveys[idx]
+        if survey.submission_date >= existing_survey_record.submission_date:
+            surveys[idx] = survey
+            duplicate = models.DuplicateSubmission(
+                survey.student_id, survey.submission_date, existing_survey_record.submission_date)
+        else:
+            duplicate = models.DuplicateSubmission(
+                survey.student_id, existing_survey_record.submission_date, survey.submission_date)
+        if duplicates is not None:
+            duplicates.append(duplicate)
+
+    return surveys
+
+
+def __tee_rows(reader, raw_rows: Optional[csv_spool.SpooledRows]):
+    '''
+    yields the rows of the reader, appending each to raw_rows (if provided) as it is read
+    '''
+    for row in reader:
+        if raw_rows is not None:
+            raw_rows.append(row)
+        yield row
+
+
+def duplicates_summary(duplicates: list[models.DuplicateSubmission]) -> str:
+    '''
+    returns a one line summary of the duplicate survey submissions that were resolved
+    '''
+    num_students = len({duplicate.student_id for duplicate in duplicates})
+    return (f'found {len(duplicates)} duplicate survey submission(s) from {num_students} student(s). '
+            'Using the latest submission for each student')
+
+
 def read_groups(group_filename: str, survey_data: list[models.SurveyRecord]) -> list[models.GroupRecord]:
     '''
     Reads in grouping data into a list of GroupRecord objects
@@ -293,47 +643,53 @@ def read_groups(group_filename: str, survey_data: list[models.SurveyRecord]) ->
         return read_groups_from_io(survey_data, data_file)
 
 
-def read_groups_from_io(survey_data: list[models.SurveyRecord], text_buffer: TextIOWrapper) -> list[models.GroupRecord]:
+def read_groups_from_io(survey_data: list[models.SurveyRecord], text_buffer: TextIOWrapper,
+                        survey_by_id: Optional[dict[str, models.SurveyRecord]] = None) -> list[models.GroupRecord]:
     '''
     Loads/reads the grouping data into a list of Group Record objects from an io buffer
      version of the data.
+    The groups reference the records of survey_data (they are not copied), so the same records can be shared
+     by several group sets; the group a student is in is given by the GroupRecord.
+    survey_by_id (see records_by_id) can be provided to reuse the index of survey_data across calls.
     '''
+    if survey_by_id is None:
+        survey_by_id = records_by_id(survey_data)
+
     text_buffer.seek(0)
-    groups: dict[str, models.GroupRecord] = {}
-    is_header: bool = False
     reader = csv.DictReader(text_buffer)
 
-    for row in reader:
+    return read_groups_from_rows(((row["group id"], row["student id"]) for row in reader), survey_by_id)
 
-        if is_header:
-            is_header = False
-            continue
 
-        group_id = row["group id"]
+def read_groups_from_rows(rows: Iterable[tuple[str, str]],
+                          survey_by_id: dict[str, models.SurveyRecord]) -> list[models.GroupRecord]:
+    '''
+    Builds the Group Record objects from (group id, student id) rows, looking the students up in
+     survey_by_id (see records_by_id). Students that are not in survey_by_id are skipped.
+    '''
+    groups: dict[str, models.GroupRecord] = {}
 
+    for group_id, student_id in rows:
         if not group_id in groups:
             groups[group_id] = models.GroupRecord(group_id, [])
 
-        user = __get_user_by_id(row["student id"], survey_data)
+        user = survey_by_id.get(student_id)
 
         if not user is None:
-            copied_user = copy.deepcopy(user)
-            copied_user.group_id = group_id
-            groups[group_id].members.append(copied_user)
+            groups[group_id].members.append(user)
 
     return list(groups.values())
 
 
-def __get_user_by_id(student_id: str, survey_data: list[models.SurveyRecord]) -> Union[models.SurveyRecord, None]:
+def records_by_id(survey_data: list[models.SurveyRecord]) -> dict[str, models.SurveyRecord]:
     '''
-    Gets a SurveyRecord based on the student id
+    Indexes the SurveyRecords by student id (if an id is repeated, the first record is used)
     '''
-
+    survey_by_id: dict[str, models.SurveyRecord] = {}
     for user in survey_data:
-        if user.student_id == student_id:
-            return user
+        survey_by_id.setdefault(user.student_id, user)
 
-    return None
+    return survey_by_id
 
 
 def add_missing_students(survey: list[models.SurveyRecord], roster: list[str], avail_field: list[str]) -> list[models.SurveyRecord]:
@@ -341,30 +697,54 @@ def add_missing_students(survey: list[models.SurveyRecord], roster: list[str], a
     This method involves reading the survey data and adding any missing students from the student list
     to the survey data. This will be based on student id.
     '''
-    new_survey_data = survey
-    survey_students = list(map(lambda x: x.student_id, survey))
+    survey.extend(reconcile_roster(survey, roster, avail_field).added)
+
+    return survey
 
-    # At this point, the survey_student list should have every student name from the survey data.
-    # Next, we will check if all the students have answered the survey.
 
-    missing_students = []
-    for student in roster:
-        if survey_students.count(student) == 0:
-            missing_students.append(student)
+def reconcile_roster(survey_data: list[models.SurveyRecord], roster: list[str], avail_field: list[str]) -> models.RosterReconciliation:
+    '''
+    Reconciles the survey records with the roster (by student id):
+    - survey records of students in the roster are kept
+    - students in the roster but not in the survey are added, with a wildcard availability
+    - survey records of students not in the roster are removed
+    '''
+    reconciliation = models.RosterReconciliation()
+    roster_ids: set[str] = set(roster)
+    survey_ids: set[str] = set()
+
+    for student in survey_data:
+        survey_ids.add(student.student_id)
+        if student.student_id in roster_ids:
+            reconciliation.kept.append(student)
+        else:
+            reconciliation.removed.append(student)
 
-    # At this point, all missing students should be in the missing students list.
-    for asurite in missing_students:
+    for student_id in roster:
+        if student_id in survey_ids:
+            continue
+        survey_ids.add(student_id)  # only add each missing student once
         record = models.SurveyRecord(
-            student_id=asurite,
+            student_id=student_id,
         )
         # This code will use the function that adds availiability to all time slots.
-        record.availability = wildcard_availability(avail_field)
+        assign_wildcard_availability(record, avail_field)
         record.provided_survey_data = False
         record.provided_availability = False
         record.has_matching_availability = False
-        new_survey_data.append(record)
+        validate.index_student(record)
+        reconciliation.added.append(record)
 
-    return new_survey_data
+    return reconciliation
+
+
+def roster_summary(reconciliation: models.RosterReconciliation) -> str:
+    '''
+    returns a one line summary of the reconciliation of the survey with the roster
+    '''
+    return (f'{len(reconciliation.kept)} student(s) matched the roster, '
+            f'{len(reconciliation.added)} student(s) on the roster were added without survey data, '
+            f'{len(reconciliation.removed)} student(s) not on the roster were removed')
 
 
 def read_roster(filename: str) -> list[str]:
@@ -386,96 +766,93 @@ def read_report_groups(report_filename: str, survey_data: list[models.SurveyReco
     '''
     Reads the specified groups from the individual tabs of an existing xlsx report file.
     '''
+    with xlsx.XLSXReader(report_filename) as report_reader:
+        return read_report_groups_from_xlsx(report_reader, survey_data)
 
-    group_sets: list[list[models.GroupRecord]] = []
 
-    report_workbook = load_workbook(report_filename)
+def read_report_groups_from_xlsx(report_reader: xlsx.XLSXReader,
+                                 survey_data: list[models.SurveyRecord]) -> list[list[models.GroupRecord]]:
+    '''
+    Reads the specified groups from the individual tabs of an (open) xlsx report.
+    '''
+    group_sets: list[list[models.GroupRecord]] = []
+    survey_by_id: dict[str, models.SurveyRecord] = records_by_id(survey_data)
 
-    for sheet_name in report_workbook.sheetnames:
+    for sheet_name in report_reader.sheetnames:
 
-        # Write the grouping data for each "individual" sheet/tab to an io buffer.
+        # Stream the grouping data of each "individual" sheet/tab into the groups
         if "individual" not in str.lower(sheet_name):
             continue
 
-        text_buffer = StringIO()
-        writer = csv.writer(text_buffer)
-
-        # Variables for header information
-        group_id_str: str = "group id"
-        student_id_str: str = "student id"
-        group_id_col: int = -1
-        student_id_col: int = -1
-        for row_idx, row in enumerate(report_workbook[sheet_name].rows):
-            if row_idx == 0:
-                # first row, write headers and determine group id and student id column numbers
-                writer.writerow([group_id_str, student_id_str])
-                for cell_idx, cell in enumerate(row):
-                    if cell.value is None:
-                        continue
-                    if str.lower(cell.value) == str.lower(group_id_str):
-                        group_id_col = cell_idx
-                    elif str.lower(cell.value) == str.lower(student_id_str):
-                        student_id_col = cell_idx
-            elif group_id_col != -1 and student_id_col != -1:
-                # write group information for each student
-                writer.writerow(
-                    [row[group_id_col].value, row[student_id_col].value])
-
-        # load the group data from the io buffer
-        text_buffer.seek(0)
-        group_sets.append(read_groups_from_io(survey_data, text_buffer))
+        group_sets.append(read_groups_from_rows(
+            __group_sheet_rows(report_reader.iter_rows(sheet_name)), survey_by_id))
 
     return group_sets
 
 
-def read_report_survey_data(report_filename: str, field_mappings: models.SurveyFieldMapping) -> models.SurveyData:
+def __group_sheet_rows(rows: Iterator[tuple]) -> Iterator[tuple[str, str]]:
     '''
-    Loads the survey data from the "survey_data" sheet (tab) of a previously generated xlsx report.
+    yields the (group id, student id) of each student on an "individual" report sheet/tab. The columns
+     are found by the headers of the first row; nothing is yielded if either is missing.
     '''
+    header = next(rows, None)
+    if header is None:
+        return
 
-    # Write the data in the "survey_data" tab/sheet to an io buffer.
+    # Variables for header information
+    group_id_str: str = "group id"
+    student_id_str: str = "student id"
+    group_id_col: int = -1
+    student_id_col: int = -1
+    for cell_idx, value in enumerate(header):
+        if value is None:
+            continue
+        if str(value).lower() == group_id_str:
+            group_id_col = cell_idx
+        elif str(value).lower() == student_id_str:
+            student_id_col = cell_idx
 
-    report_workbook = load_workbook(report_filename)
+    if group_id_col == -1 or student_id_col == -1:
+        return
 
-    survey_data_sheet = report_workbook["survey_data"]
+    for row in rows:
+        yield __cell_str(row[group_id_col]), __cell_str(row[student_id_col])
 
-    text_buffer = StringIO()
-    writer = csv.writer(text_buffer)
-    for row in survey_data_sheet.rows:
-        writer.writerow([cell.value for cell in row])
 
-    # load and return the survey data from the io buffer
-    text_buffer.seek(0)
-    return read_survey_from_io(field_mappings, text_buffer)
+def __cell_str(value) -> str:
+    '''
+    returns the value of an xlsx cell as it would be written to a csv file (an empty cell is an empty string)
+    '''
+    return '' if value is None else str(value)
 
 
-def remove_students_not_in_roster_from_survey(survey_data: list[models.SurveyRecord], roster: list[str]) -> list[models.SurveyRecord]:
+def read_report_survey_data(report_filename: str, field_mappings: models.SurveyFieldMapping) -> models.SurveyData:
     '''
-    Removes students from the survey if they are not in the roster.
+    Loads the survey data from the "survey_data" sheet (tab) of a previously generated xlsx report.
+    '''
+    with xlsx.XLSXReader(report_filename) as report_reader:
+        return read_report_survey_data_from_xlsx(report_reader, field_mappings)
+
+
+def read_report_survey_data_from_xlsx(report_reader: xlsx.XLSXReader,
+                                      field_mappings: models.SurveyFieldMapping) -> models.SurveyData:
+    '''
+    Loads the survey data from the "survey_data" sheet (tab) of an (open) xlsx report. The rows of the
+     sheet are parsed as they are streamed (see read_survey_rows).
     '''
-    current_list: list[models.SurveyRecord]
-    current_list = survey_data
-    roster_list = roster
-    non_roster_ids = []
+    rows = ([__cell_str(value) for value in row] for row in report_reader.iter_rows("survey_data"))
 
-    # This part focuses on finding and listing all the ids not found in the roster.
-    for index, val in enumerate(current_list, start=1):
-        print(index)
-        check = False
-        for index2, val2 in enumerate(roster_list, start=1):
-            if val2 == val.student_id:
-                print(index2)
-                check = True
-                break
+    return __spool_survey_rows(field_mappings, rows)
 
-        if check is False:
-            non_roster_ids.append(val)
 
-    # This part focuses on removing all the ids not found in the roster.
-    for index, val in enumerate(non_roster_ids, start=1):
-        current_list.remove(val)
+def remove_students_not_in_roster_from_survey(survey_data: list[models.SurveyRecord], roster: list[str]) -> list[models.SurveyRecord]:
+    '''
+    Removes students from the survey if they are not in the roster.
+    '''
+    roster_ids: set[str] = set(roster)
+    survey_data[:] = [student for student in survey_data if student.student_id in roster_ids]
 
-    return current_list
+    return survey_data
 
 
 def match_survey_to_roster(survey_data: list[models.SurveyRecord], roster: list[str], avail_field: list[str]) -> list[models.SurveyRecord]:
@@ -483,26 +860,8 @@ def match_survey_to_roster(survey_data: list[models.SurveyRecord], roster: list[
     This function handles removing or adding any students that are not in the roster.
     - If a student is in the roster but not in the survey, they will be added to the survey with a wildcard availability.
     - If a student is in the survey but not in the roster, they will be removed from the survey.
+    See reconcile_roster.
     '''
+    reconciliation = reconcile_roster(survey_data, roster, avail_field)
 
-    matched_survey_records: list[models.SurveyRecord] = []
-
-    # add only students that are in the roster
-    for student_id in survey_data:
-        if any(student_id.student_id == id for id in roster):
-            matched_survey_records.append(student_id)
-
-    # add missing students from the roster
-    for student_id in roster:
-        if not any(student_id == student.student_id for student in survey_data):
-            record = models.SurveyRecord(
-                student_id=student_id,
-            )
-            # This code will use the function that adds availiability to all time slots.
-            record.availability = wildcard_availability(avail_field)
-            record.provided_survey_data = False
-            record.provided_availability = False
-            record.has_matching_availability = False
-            matched_survey_records.append(record)
-
-    return matched_survey_records
+    return reconciliation.kept + reconciliation.added
@@ -41,7 +41,7 @@ def write_report(solutions: list[list[models.GroupRecord]], survey_data: models.
     config_sheet = formatter.format_config_report()
     xlsx_writer.write_sheet('config', config_sheet)
     xlsx_writer.write_sheet(
-        'survey_data', xlsx.convert_to_cells(survey_data.raw_rows))
+        'survey_data', xlsx.stream_cells(survey_data.raw_rows))
 
     xlsx_writer.save()
 
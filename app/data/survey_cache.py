@@ -0,0 +1,76 @@
+'''
+module for caching the loaded (parsed, deduplicated and preprocessed) survey data on disk, so a survey
+ file that is loaded again with the same settings does not need to be parsed and preprocessed again
+'''
+import gzip
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import zlib
+from pathlib import Path
+from typing import Optional
+from app import models
+from app.file import csv_spool
+
+# Changing how the survey is parsed or preprocessed (or the layout of the records) must bump the version,
+# so entries written by an older version are no longer used.
+CACHE_VERSION = 3
+
+
+def cache_key(data_file_path: str, field_mapping: models.SurveyFieldMapping, delimiters: str) -> str:
+    '''
+    returns the key of the survey file's cache entry. The key is a hash of the file's content and the
+     settings it is loaded with, so the entry is not used once either of them change.
+    '''
+    digest = hashlib.sha256()
+    digest.update(f'{CACHE_VERSION}\n'.encode('utf-8'))
+    digest.update(json.dumps(field_mapping, sort_keys=True).encode('utf-8'))
+    digest.update(json.dumps(delimiters).encode('utf-8'))
+    with open(data_file_path, 'rb') as data_file:
+        for chunk in iter(lambda: data_file.read(1024 * 1024), b''):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def read_cached_survey(cache_dir: str, key: str, data_file_path: str) -> Optional[models.SurveyData]:
+    '''
+    returns the survey data stored under the key, or None if there is no (readable) entry for it.
+    The entries are pickled, so only a cache directory that is trusted should be used.
+    The students' indices are only valid within the process that built them, so they must be rebuilt
+     (see load.index_survey_records).
+    Only the records and duplicates are stored, the raw rows are read again from the survey file (which has the
+     content the key was made from).
+    '''
+    try:
+        with gzip.open(__entry_path(cache_dir, key), 'rb') as cache_file:
+            records, duplicates = pickle.load(cache_file)
+    except FileNotFoundError:
+        return None
+    except (OSError, EOFError, ValueError, TypeError, zlib.error, pickle.UnpicklingError):
+        return None  # a damaged entry is a miss, it is overwritten when the survey is stored again
+
+    return models.SurveyData(records, csv_spool.CsvFileRows(data_file_path), duplicates)
+
+
+def write_cached_survey(cache_dir: str, key: str, survey_data: models.SurveyData):
+    '''
+    stores the survey data under the key (replacing any existing entry). The entry is written to a temporary
+     file first, so a partly written entry is never read. The raw rows are not stored.
+    '''
+    Path(cache_dir).mkdir(parents=True, exist_ok=True)
+
+    file_descriptor, temp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+    try:
+        with os.fdopen(file_descriptor, 'wb') as temp_file, gzip.GzipFile(fileobj=temp_file, mode='wb') as cache_file:
+            pickle.dump((survey_data.records, survey_data.duplicates), cache_file, pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, __entry_path(cache_dir, key))
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def __entry_path(cache_dir: str, key: str) -> Path:
+    return Path(cache_dir) / f'survey-{key}.cache'
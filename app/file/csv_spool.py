@@ -0,0 +1,112 @@
+'''
+module for keeping csv rows out of memory: spooled to a temporary file, or read again from the csv file they came from
+'''
+import csv
+from io import SEEK_END
+import os
+from tempfile import SpooledTemporaryFile
+from typing import Iterator
+
+
+class SpooledRows():
+    '''
+    Stores csv rows (lists of str) by writing them to a temporary file as they are appended, rather than
+     holding each row as a list in memory. The file stays in memory as compact csv text until it grows
+     past max_size bytes, after which it is moved to disk.
+    The rows are streamed back from the file when iterated, so it can be used in place of a list of rows
+     anywhere the rows are only counted or iterated.
+    The file should be closed (see close, or use it as a context manager) once the rows are no longer needed.
+    '''
+
+    def __init__(self, max_size: int = 1024 * 1024) -> None:
+        # pylint: disable-next=consider-using-with
+        self.__file = SpooledTemporaryFile(max_size, mode='w+', newline='', encoding='utf-8')
+        self.__writer = csv.writer(self.__file)
+        self.__num_rows: int = 0
+
+    def append(self, row: list[str]):
+        '''
+        adds a row to the end of the file
+        '''
+        self.__file.seek(0, SEEK_END)
+        self.__writer.writerow(row)
+        self.__num_rows += 1
+
+    def extend(self, rows):
+        '''
+        adds each of the rows to the end of the file
+        '''
+        for row in rows:
+            self.append(row)
+
+    def __len__(self) -> int:
+        return self.__num_rows
+
+    def __iter__(self) -> Iterator[list[str]]:
+        return csv.reader(self.__lines())
+
+    def __lines(self) -> Iterator[str]:
+        '''
+        reads the file line by line, keeping track of its own position so that iterating the rows is not
+         affected by other iterations or appends in between
+        '''
+        position: int = 0
+        while True:
+            self.__file.seek(position)
+            line = self.__file.readline()
+            if not line:
+                return
+            position = self.__file.tell()
+            yield line
+
+    def __eq__(self, other) -> bool:
+        try:
+            return len(self) == len(other) and all(row == other_row for row, other_row in zip(self, other))
+        except TypeError:
+            return NotImplemented
+
+    def close(self):
+        '''
+        closes (and removes) the temporary file
+        '''
+        self.__file.close()
+
+    def __enter__(self) -> 'SpooledRows':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class CsvFileRows():
+    '''
+    The rows (lists of str) of a csv file, read again from the file whenever they are iterated rather than
+     being kept in memory. It can be used in place of a list of rows anywhere the rows are only counted or
+     iterated, like SpooledRows.
+    The file must not change while the rows are in use: iterating the rows raises a ValueError if the size or
+     modification time of the file has changed since the rows were created.
+    '''
+
+    def __init__(self, file_path: str, encoding: str = 'utf-8-sig') -> None:
+        self.file_path: str = file_path
+        self.encoding: str = encoding
+        self.__stat: tuple[int, int] = self.__file_stat()
+
+    def __file_stat(self) -> tuple[int, int]:
+        stat = os.stat(self.file_path)
+        return stat.st_size, stat.st_mtime_ns
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __iter__(self) -> Iterator[list[str]]:
+        if self.__file_stat() != self.__stat:
+            raise ValueError(f"the file {self.file_path} has changed since it was loaded")
+        with open(self.file_path, 'r', encoding=self.encoding) as csv_file:
+            yield from csv.reader(csv_file)
+
+    def __eq__(self, other) -> bool:
+        try:
+            return len(self) == len(other) and all(row == other_row for row, other_row in zip(self, other))
+        except TypeError:
+            return NotImplemented
@@ -1,8 +1,9 @@
 '''
-module for writing to xlsx files
+module for reading and writing xlsx files
 '''
 from dataclasses import dataclass
-from typing import Any, Optional
+from typing import Any, Iterable, Iterator, Optional
+from openpyxl import load_workbook
 import xlsxwriter
 
 
@@ -49,9 +50,10 @@ class XLSXWriter():
         '''
         self.sheets[sheet_name] = self.__workbook.add_worksheet(sheet_name)
 
-    def write_sheet(self, sheet: str, table: list[list[Cell]]):
+    def write_sheet(self, sheet: str, table: Iterable[list[Cell]]):
         '''
         writes data to a worksheet. This includes the header and the data. If the sheet doesn't exist, it will create it.
+        The table can be any iterable of rows, so rows can be streamed to the sheet (see stream_cells).
         '''
         if not self.sheets.get(sheet):
             self.new_sheet(sheet)
@@ -70,6 +72,42 @@ class XLSXWriter():
         self.__workbook.close()
 
 
+class XLSXReader():
+    '''
+    class for reading an xlsx file. Wraps the openpyxl package, opening the workbook once in read-only mode so
+     the rows of each sheet are streamed from the file as they are iterated, rather than loading every cell.
+    Can be used as a context manager, which closes the file on exit.
+    '''
+
+    def __init__(self, filename: str) -> None:
+        self.__workbook = load_workbook(filename, read_only=True)
+
+    @property
+    def sheetnames(self) -> list[str]:
+        '''
+        the names of the sheets in the workbook (in order)
+        '''
+        return self.__workbook.sheetnames
+
+    def iter_rows(self, sheet: str) -> Iterator[tuple[Any, ...]]:
+        '''
+        streams the rows of a sheet, each as a tuple of cell values (None for an empty cell)
+        '''
+        return self.__workbook[sheet].iter_rows(values_only=True)
+
+    def close(self):
+        '''
+        closes the file. After this is called, the rows of the workbook can no longer be read
+        '''
+        self.__workbook.close()
+
+    def __enter__(self) -> 'XLSXReader':
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+
 def convert_to_cells(table: list[list[Any]]) -> list[list[Cell]]:
     '''
     converts 2d lists to a table with cells
@@ -82,3 +120,11 @@ def convert_to_cells(table: list[list[Any]]) -> list[list[Cell]]:
         table_cells.append(table_row)
 
     return table_cells
+
+
+def stream_cells(table: Iterable[list[Any]]) -> Iterator[list[Cell]]:
+    '''
+    converts each row of a table to cells as it is read, without building the whole table of cells
+    '''
+    for row in table:
+        yield [Cell(cell) for cell in row]
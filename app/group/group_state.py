@@ -0,0 +1,357 @@
+'''
+This file includes a structure that maintains the scoring inputs of a grouping solution
+ (per group and solution-wide) so that they can be updated as students are moved between
+ groups, instead of being recomputed across the whole solution after every change.
+'''
+from math import sqrt
+from typing import Callable, Iterable, Optional
+from app import models
+from app.group import validate
+
+# Group scores are rounded to 4 decimal places (see scoring.score_groups), so they are tracked as
+#  integer multiples of this to keep the running sums exact.
+SCORE_SCALE: int = 10000
+
+
+def compute_group_stats(members: list[models.SurveyRecord]) -> models.GroupStats:
+    '''
+    Computes the scoring inputs of a group with the given members.
+    This is proportional to the group size.
+    '''
+    membership: int = validate.members_index_bits(members)
+    stats = models.GroupStats(len(members), membership)
+    if len(members) > 0:
+        stats.availability_mask = validate.members_availability_mask(members)
+
+    for member in members:
+        stats.num_disliked_pairs += (validate.disliked_bits(member) & membership).bit_count()
+        num_liked: int = (validate.preferred_bits(member) & membership).bit_count()
+        stats.num_preferred_pairs += num_liked
+        if not member.pref_pairing_possible:
+            stats.num_students_pref_pair_not_possible += 1
+        elif num_liked == 0:
+            stats.num_students_no_pref_pairs += 1
+
+    return stats
+
+
+class GroupView:
+    '''
+    A group (the base members) along with lookups by student index, so that the stats of the group with
+     one more member, or with one member replaced, can be computed with a fixed number of bitset operations,
+     without building the new member list.
+    '''
+
+    def __init__(self, members: list[models.SurveyRecord]):
+        self.members: list[models.SurveyRecord] = members
+        self.stats: models.GroupStats = compute_group_stats(members)
+        # generation of the members' student indices (None without members), see validate.check_index_generation
+        self.index_generation: Optional[int] = validate.index_generation(members[0]) if members else None
+        # bitsets of the members that dislike / prefer the student with the index
+        self.dislikers: dict[int, int] = {}
+        self.likers: dict[int, int] = {}
+        # bitset of the members without a preferred pair (that could have one)
+        self.unpaired: int = 0
+        # bitsets of the members (that could have a preferred pair) whose only preferred pair is the student with the index
+        self.sole_likers: dict[int, int] = {}
+        # bitset of the members that can't have a preferred pair
+        self.pref_pair_not_possible: int = 0
+        # availability mask of the members other than the one at each position (-1 when there are none)
+        self.availability_without: list[int] = self.__availability_without(members)
+
+        for member in members:
+            member_bit: int = 1 << validate.user_index(member)
+            for idx in validate.disliked_indices(member):
+                self.dislikers[idx] = self.dislikers.get(idx, 0) | member_bit
+            for idx in validate.preferred_indices(member):
+                self.likers[idx] = self.likers.get(idx, 0) | member_bit
+            paired: int = validate.preferred_bits(member) & self.stats.membership
+            if not member.pref_pairing_possible:
+                self.pref_pair_not_possible |= member_bit
+            elif paired == 0:
+                self.unpaired |= member_bit
+            elif paired & (paired - 1) == 0:
+                sole_idx: int = paired.bit_length() - 1
+                self.sole_likers[sole_idx] = self.sole_likers.get(sole_idx, 0) | member_bit
+
+    @staticmethod
+    def __availability_without(members: list[models.SurveyRecord]) -> list[int]:
+        '''
+        returns the availability mask of the members other than the one at each position, from the prefix and
+         suffix ANDs of the members' masks
+        '''
+        masks: list[int] = [validate.user_availability_mask(member) for member in members]
+        suffix: list[int] = [-1] * (len(masks) + 1)
+        for pos in range(len(masks) - 1, -1, -1):
+            suffix[pos] = suffix[pos + 1] & masks[pos]
+        prefix: int = -1
+        without: list[int] = []
+        for pos, mask in enumerate(masks):
+            without.append(prefix & suffix[pos + 1])
+            prefix &= mask
+        return without
+
+    def __check_index_generation(self, student: models.SurveyRecord):
+        '''
+        raises a ValueError if the student was indexed in a different generation than the members
+        '''
+        if self.index_generation is not None and validate.index_generation(student) != self.index_generation:
+            validate.check_index_generation((self.members[0], student))
+
+    def stats_with(self, student: models.SurveyRecord) -> models.GroupStats:
+        '''
+        returns the stats the group would have with the student added (the student must not already be a member)
+        '''
+        self.__check_index_generation(student)
+        idx: int = validate.user_index(student)
+        membership: int = self.stats.membership | (1 << idx)
+        num_liked: int = (validate.preferred_bits(student) & membership).bit_count()
+        likers: int = self.likers.get(idx, 0)
+
+        stats = models.GroupStats(self.stats.num_members + 1, membership)
+        stats.availability_mask = validate.user_availability_mask(student)
+        if self.stats.num_members > 0:
+            stats.availability_mask &= self.stats.availability_mask
+        stats.num_disliked_pairs = (self.stats.num_disliked_pairs + self.dislikers.get(idx, 0).bit_count() +
+                                    (validate.disliked_bits(student) & membership).bit_count())
+        stats.num_preferred_pairs = self.stats.num_preferred_pairs + likers.bit_count() + num_liked
+        stats.num_students_no_pref_pairs = self.stats.num_students_no_pref_pairs - (likers & self.unpaired).bit_count()
+        stats.num_students_pref_pair_not_possible = self.stats.num_students_pref_pair_not_possible
+        if not student.pref_pairing_possible:
+            stats.num_students_pref_pair_not_possible += 1
+        elif num_liked == 0:
+            stats.num_students_no_pref_pairs += 1
+
+        return stats
+
+    def stats_swapped(self, pos: int, student: models.SurveyRecord) -> models.GroupStats:
+        '''
+        returns the stats the group would have with the member at pos replaced by the student (the student must
+         not already be a member). Each count is the group's count with the pairs of the member taken out and
+         the pairs of the student put in.
+        '''
+        self.__check_index_generation(student)
+        member: models.SurveyRecord = self.members[pos]
+        member_idx: int = validate.user_index(member)
+        idx: int = validate.user_index(student)
+        remaining: int = self.stats.membership & ~(1 << member_idx)
+        membership: int = remaining | (1 << idx)
+        num_liked: int = (validate.preferred_bits(student) & membership).bit_count()
+
+        stats = models.GroupStats(self.stats.num_members, membership)
+        stats.availability_mask = self.availability_without[pos] & validate.user_availability_mask(student)
+        stats.num_disliked_pairs = (self.stats.num_disliked_pairs -
+                                    (validate.disliked_bits(member) & self.stats.membership).bit_count() -
+                                    self.dislikers.get(member_idx, 0).bit_count() +
+                                    (validate.disliked_bits(student) & membership).bit_count() +
+                                    (self.dislikers.get(idx, 0) & remaining).bit_count())
+        stats.num_preferred_pairs = (self.stats.num_preferred_pairs -
+                                     (validate.preferred_bits(member) & self.stats.membership).bit_count() -
+                                     self.likers.get(member_idx, 0).bit_count() +
+                                     num_liked + (self.likers.get(idx, 0) & remaining).bit_count())
+        # the remaining members without a preferred pair: those that had none or only had the member, unless
+        #  they prefer the student
+        stats.num_students_no_pref_pairs = ((self.unpaired | self.sole_likers.get(member_idx, 0)) &
+                                            ~self.likers.get(idx, 0) & remaining).bit_count()
+        stats.num_students_pref_pair_not_possible = (self.pref_pair_not_possible & remaining).bit_count()
+        if not student.pref_pairing_possible:
+            stats.num_students_pref_pair_not_possible += 1
+        elif num_liked == 0:
+            stats.num_students_no_pref_pairs += 1
+
+        return stats
+
+
+def overlap_count(stats: models.GroupStats) -> int:
+    '''
+    returns the number of timeslot-days that every member of the group is available
+    '''
+    return stats.availability_mask.bit_count()
+
+
+def additional_overlap(stats: models.GroupStats) -> int:
+    '''
+    returns the number of "additional" overlapping timeslot-days (beyond the one required) of the group
+    '''
+    return max(overlap_count(stats) - 1, 0)
+
+
+def fill_group_scoring_vars(stats: models.GroupStats, variables: models.GroupSetData):
+    '''
+    Fills the scoring variables for scoring an individual group with the group's stats
+    '''
+    variables.num_disliked_pairs = stats.num_disliked_pairs
+    variables.num_preferred_pairs = stats.num_preferred_pairs
+    variables.num_groups_no_overlap = 1 if overlap_count(stats) == 0 else 0
+    variables.num_additional_overlap = additional_overlap(stats)
+    variables.num_students_no_pref_pairs = stats.num_students_no_pref_pairs
+    variables.num_additional_pref_pairs = stats.num_preferred_pairs - \
+        (stats.num_members - stats.num_students_no_pref_pairs - stats.num_students_pref_pair_not_possible)
+
+
+class GroupState:
+    '''
+    Maintains the scoring inputs of each group in a solution along with the solution-level totals.
+    Every membership change made through this class updates the two totals by the difference in the
+    changed group(s), which costs time proportional to the group size rather than the solution size.
+
+    Groups are tracked by group id, so the order of the groups list (or of the members within a
+    group) can be changed freely. Changes to group membership made outside of this class must be
+    followed by a call to refresh().
+
+    Optionally (see track_scores()), the individual score of each group is kept as well, along with
+    the running sum and sum of squares of those scores, so the standard deviation of the group scores
+    is available without rescoring every group.
+    '''
+
+    def __init__(self, groups: list[models.GroupRecord]):
+        self.groups: list[models.GroupRecord] = groups
+        self.group_stats: dict[str, models.GroupStats] = {}
+        self.num_students: int = 0
+        self.num_disliked_pairs: int = 0
+        self.num_preferred_pairs: int = 0
+        self.num_groups_no_overlap: int = 0
+        self.num_additional_overlap: int = 0
+        self.num_students_no_pref_pairs: int = 0
+        self.num_students_pref_pair_not_possible: int = 0
+        self.group_scorer: Optional[Callable[[models.GroupStats], float]] = None
+        self.group_scores: dict[str, int] = {}
+        self.score_sum: int = 0
+        self.score_sum_sq: int = 0
+
+        for group in groups:
+            stats = compute_group_stats(group.members)
+            self.group_stats[group.group_id] = stats
+            self.__apply(stats, 1)
+
+    def stats(self, group: models.GroupRecord) -> models.GroupStats:
+        '''
+        returns the current stats of the group
+        '''
+        return self.group_stats[group.group_id]
+
+    def refresh(self, group: models.GroupRecord):
+        '''
+        recomputes the stats of the group after its members have changed, and updates the solution totals
+        '''
+        self.__apply(self.group_stats[group.group_id], -1)
+        stats = compute_group_stats(group.members)
+        self.group_stats[group.group_id] = stats
+        self.__apply(stats, 1)
+        if self.group_scorer is not None:
+            self.__score(group.group_id)
+
+    def track_scores(self, group_scorer: Callable[[models.GroupStats], float]):
+        '''
+        starts keeping the individual score of each group, as computed by group_scorer from the group's stats
+        '''
+        self.group_scorer = group_scorer
+        self.group_scores = {}
+        self.score_sum = 0
+        self.score_sum_sq = 0
+        for group_id in self.group_stats:
+            self.__score(group_id)
+
+    def standard_dev(self) -> float:
+        '''
+        returns the standard deviation of the individual group scores (see track_scores())
+        '''
+        num_groups: int = len(self.group_scores)
+        if num_groups == 0:
+            return 0  # divide by 0 protection
+        return sqrt(num_groups * self.score_sum_sq - self.score_sum ** 2) / (num_groups * SCORE_SCALE)
+
+    def add_student(self, group: models.GroupRecord, student: models.SurveyRecord):
+        '''
+        adds the student to the group
+        '''
+        group.members.append(student)
+        self.refresh(group)
+
+    def remove_student(self, group: models.GroupRecord, student: models.SurveyRecord):
+        '''
+        removes the student from the group
+        '''
+        group.members.remove(student)
+        self.refresh(group)
+
+    def swap_students(self, group_1: models.GroupRecord, idx_1: int, group_2: models.GroupRecord, idx_2: int):
+        '''
+        swaps the student at idx_1 in group_1 with the student at idx_2 in group_2.
+        Swapping the same two positions again reverts the swap.
+        '''
+        group_1.members[idx_1], group_2.members[idx_2] = group_2.members[idx_2], group_1.members[idx_1]
+        self.refresh(group_1)
+        self.refresh(group_2)
+
+    def fill_scoring_vars(self, variables: models.GroupSetData,
+                          replaced_stats: Optional[dict[str, models.GroupStats]] = None):
+        '''
+        Fills the solution-level scoring variables with the current totals.
+        If replaced_stats is provided ({group_id: stats}), the totals are computed as if those groups had
+        the given stats instead of their current ones. The state itself is not changed.
+        '''
+        totals: list[int] = [self.num_students, self.num_disliked_pairs, self.num_preferred_pairs,
+                             self.num_groups_no_overlap, self.num_additional_overlap,
+                             self.num_students_no_pref_pairs, self.num_students_pref_pair_not_possible]
+        for group_id, stats in (replaced_stats or {}).items():
+            for idx, (old, new) in enumerate(zip(solution_contribution(self.group_stats[group_id]), solution_contribution(stats))):
+                totals[idx] += new - old
+
+        fill_solution_scoring_vars(totals, variables)
+
+    def __score(self, group_id: str):
+        '''
+        rescores the group and updates the running sums of the group scores
+        '''
+        old_score: int = self.group_scores.get(group_id, 0)
+        new_score: int = round(self.group_scorer(self.group_stats[group_id]) * SCORE_SCALE)
+        self.group_scores[group_id] = new_score
+        self.score_sum += new_score - old_score
+        self.score_sum_sq += new_score ** 2 - old_score ** 2
+
+    def __apply(self, stats: models.GroupStats, sign: int):
+        '''
+        adds (sign = 1) or removes (sign = -1) the group's stats to/from the solution totals
+        '''
+        (num_members, num_disliked_pairs, num_preferred_pairs, no_overlap, num_additional_overlap,
+         num_students_no_pref_pairs, num_students_pref_pair_not_possible) = solution_contribution(stats)
+        self.num_students += sign * num_members
+        self.num_disliked_pairs += sign * num_disliked_pairs
+        self.num_preferred_pairs += sign * num_preferred_pairs
+        self.num_groups_no_overlap += sign * no_overlap
+        self.num_additional_overlap += sign * num_additional_overlap
+        self.num_students_no_pref_pairs += sign * num_students_no_pref_pairs
+        self.num_students_pref_pair_not_possible += sign * num_students_pref_pair_not_possible
+
+
+def solution_contribution(stats: models.GroupStats) -> tuple[int, int, int, int, int, int, int]:
+    '''
+    returns the group's contribution to each of the solution totals (in the order they are declared in GroupState)
+    '''
+    return (stats.num_members, stats.num_disliked_pairs, stats.num_preferred_pairs,
+            1 if overlap_count(stats) == 0 else 0, additional_overlap(stats),
+            stats.num_students_no_pref_pairs, stats.num_students_pref_pair_not_possible)
+
+
+def solution_totals(group_stats: Iterable[models.GroupStats]) -> list[int]:
+    '''
+    returns the solution totals (in the order they are declared in GroupState) of the groups with the given stats
+    '''
+    totals: list[int] = [0] * 7
+    for stats in group_stats:
+        for idx, value in enumerate(solution_contribution(stats)):
+            totals[idx] += value
+    return totals
+
+
+def fill_solution_scoring_vars(totals: list[int], variables: models.GroupSetData):
+    '''
+    Fills the solution-level scoring variables with the solution totals (see solution_totals)
+    '''
+    variables.num_groups_no_overlap = totals[3]
+    variables.num_disliked_pairs = totals[1]
+    variables.num_preferred_pairs = totals[2]
+    variables.num_additional_overlap = totals[4]
+    variables.num_students_no_pref_pairs = totals[5]
+    variables.num_additional_pref_pairs = totals[2] - (totals[0] - totals[5] - totals[6])
@@ -6,10 +6,14 @@ This file includes functions to score entire group sets as well as
     where all groups having at least one overlapping time slot is
     prioritized above each student having at least one preferred pairing.
 '''
+from copy import copy
+from functools import partial
 from math import sqrt
+from typing import Iterable
 from app import models
 from app.group import validate
 from app.group import scoring_alternative
+from app.group import group_state
 
 
 def score_groups(variables: models.GroupSetData) -> float:
@@ -82,30 +86,126 @@ def score_groups(variables: models.GroupSetData) -> float:
     return round(total_score, 4)
 
 
+def solution_scoring_vars(scoring_id: str, config_data: models.Configuration, num_students: int) -> models.GroupSetData:
+    '''
+    Returns the scoring variables of a grouping solution of the students, with the fixed values (target group
+     size, number of students, etc.) taken from the config. The rest are filled in when the solution is scored.
+    '''
+    return models.GroupSetData(scoring_id,
+                               config_data["target_group_size"],
+                               len((config_data["field_mappings"])["preferred_students_field_names"]),
+                               num_students,
+                               len((config_data["field_mappings"])["availability_field_names"]))
+
+
 def score_individual_group(group: models.GroupRecord, variables: models.GroupSetData, use_alternative_scoring: bool = False) -> float:
     '''
     This function scores an individual group using the overall scoring equation in the score_groups
      function, but with the input values being specific to the group.
 
     '''
-    variables.num_disliked_pairs = validate.total_disliked_pairings([group])
-    variables.num_preferred_pairs = validate.total_liked_pairings([group])
-    variables.num_groups_no_overlap = \
-        validate.total_groups_no_availability([group])
-    variables.num_additional_overlap = max(validate.availability_overlap_count(
-        group) - 1, 0)  # subtract one to get "additional"
+    return score_group_stats(group_state.compute_group_stats(group.members), variables, use_alternative_scoring)
+
+
+def score_group_stats(stats: models.GroupStats, variables: models.GroupSetData, use_alternative_scoring: bool = False) -> float:
+    '''
+    This function scores an individual group from its (precomputed) stats. See score_individual_group.
+    '''
+    group_state.fill_group_scoring_vars(stats, variables)
+    if use_alternative_scoring:
+        return scoring_alternative.score_groups(variables)
+    # "else"
+    return score_groups(variables)
+
 
+def score_group_state(state: group_state.GroupState, variables: models.GroupSetData, use_alternative_scoring: bool = False) -> float:
+    '''
+    This function scores a group set (entire grouping solution) from the totals maintained by
+     the group state. The fixed values (target group size, number of students, etc.) are
+     taken from the variables, the rest are filled in from the state.
+    '''
+    state.fill_scoring_vars(variables)
+    if use_alternative_scoring:
+        return scoring_alternative.score_groups(variables)
+    # "else"
+    return score_groups(variables)
+
+
+def score_solution_stats(group_stats: Iterable[models.GroupStats], variables: models.GroupSetData,
+                         use_alternative_scoring: bool = False) -> float:
+    '''
+    This function scores a group set (entire grouping solution) from the stats of its groups, however they were
+     computed (e.g. from the columnar survey data, see columnar.SurveyColumns.group_stats). The fixed values
+     (target group size, number of students, etc.) are taken from the variables, the rest are filled in.
+    '''
+    group_state.fill_solution_scoring_vars(group_state.solution_totals(group_stats), variables)
+    if use_alternative_scoring:
+        return scoring_alternative.score_groups(variables)
+    # "else"
+    return score_groups(variables)
+
+
+def track_group_scores(state: group_state.GroupState, variables: models.GroupSetData, use_alternative_scoring: bool = False):
+    '''
+    Has the group state keep the individual score of each of its groups (see score_individual_group), so
+     that standard_dev_group_state can be used in place of standard_dev_groups.
+    The fixed values (target group size, number of students, etc.) are taken from the variables. The
+     variables themselves are not changed when the groups are scored.
+    '''
+    group_vars: models.GroupSetData = copy(variables)
+    state.track_scores(partial(score_group_stats, variables=group_vars, use_alternative_scoring=use_alternative_scoring))
+
+
+def standard_dev_group_state(state: group_state.GroupState) -> float:
+    '''
+    This function returns the standard deviation of the individual group scores within the group
+     state (see track_group_scores). Unlike standard_dev_groups, no groups are rescored.
+    '''
+    return state.standard_dev()
+
+
+# pylint: disable-next=too-many-arguments
+def score_swap_delta(state: group_state.GroupState, variables: models.GroupSetData,
+                     group_1: models.GroupRecord, idx_1: int, group_2: models.GroupRecord, idx_2: int,
+                     use_alternative_scoring: bool = False) -> float:
+    '''
+    Returns the score the solution would have if the student at idx_1 in group_1 were swapped with the
+     student at idx_2 in group_2. Only the two affected groups are rescored; every other group's
+     contribution is taken from the group state. Neither the groups nor the state are changed.
+    '''
+    members_1: list[models.SurveyRecord] = group_1.members.copy()
+    members_2: list[models.SurveyRecord] = group_2.members.copy()
+    members_1[idx_1], members_2[idx_2] = members_2[idx_2], members_1[idx_1]
+
+    return score_replaced_groups(state, variables, {group_1.group_id: members_1, group_2.group_id: members_2},
+                                 use_alternative_scoring)
+
+
+# pylint: disable-next=too-many-arguments
+def score_move_delta(state: group_state.GroupState, variables: models.GroupSetData,
+                     from_group: models.GroupRecord, idx: int, to_group: models.GroupRecord,
+                     use_alternative_scoring: bool = False) -> float:
+    '''
+    Returns the score the solution would have if the student at idx in from_group were moved into
+     to_group. Neither the groups nor the state are changed.
+    '''
+    from_members: list[models.SurveyRecord] = from_group.members[:idx] + from_group.members[idx + 1:]
+    to_members: list[models.SurveyRecord] = to_group.members + [from_group.members[idx]]
+
+    return score_replaced_groups(state, variables, {from_group.group_id: from_members, to_group.group_id: to_members},
+                                 use_alternative_scoring)
+
+
+def score_replaced_groups(state: group_state.GroupState, variables: models.GroupSetData,
+                          replaced_members: dict[str, list[models.SurveyRecord]], use_alternative_scoring: bool = False) -> float:
+    '''
+    Returns the score the solution would have if the groups identified in replaced_members
+     ({group_id: members}) had the given members. Neither the groups nor the state are changed.
+    '''
+    replaced_stats: dict[str, models.GroupStats] = {
+        group_id: group_state.compute_group_stats(members) for group_id, members in replaced_members.items()}
+    state.fill_scoring_vars(variables, replaced_stats)
     if use_alternative_scoring:
-        variables.num_students_no_pref_pairs = 0  # ensure it starts at 0
-        num_students_pref_pair_not_possible: int = 0
-        for student in group.members:
-            if student.pref_pairing_possible and len(validate.user_likes_group(student, group)) == 0:
-                variables.num_students_no_pref_pairs += 1
-            elif not student.pref_pairing_possible:
-                num_students_pref_pair_not_possible += 1
-        variables.num_additional_pref_pairs = variables.num_preferred_pairs - \
-            (len(group.members) - variables.num_students_no_pref_pairs -
-             num_students_pref_pair_not_possible)
         return scoring_alternative.score_groups(variables)
     # "else"
     return score_groups(variables)
@@ -4,6 +4,9 @@ validate is used for validating groups
 from math import trunc
 import re
 import itertools
+import secrets
+import sys
+from typing import Iterable, Iterator, Optional
 from app import models
 
 WEEK_DAYS = [
@@ -12,6 +15,228 @@ WEEK_DAYS = [
 ]
 
 
+# bit offset of each weekday within an availability field's block of an availability mask
+__WEEK_DAY_BITS: dict[str, int] = {day: idx for idx, day in enumerate(WEEK_DAYS)}
+
+def availability_field_offsets(field_names: Iterable[str]) -> dict[str, int]:
+    '''
+    returns the bit offset of each availability field within an availability mask: a block of len(WEEK_DAYS)
+    bits per field, in the order of the fields (for a survey, the order of its configured availability fields)
+    '''
+    return {field_name: pos * len(WEEK_DAYS) for pos, field_name in enumerate(dict.fromkeys(field_names))}
+
+
+def availability_mask(availability: dict[str, list[str]], field_offsets: Optional[dict[str, int]] = None) -> int:
+    '''
+    converts an availability dictionary into an integer bitmask with one bit per
+    (availability field, weekday). Values that are not weekdays are ignored.
+    The field offsets (see availability_field_offsets) default to the order of the availability's own fields,
+    which for a loaded survey record is the order of the configured availability fields.
+    '''
+    if field_offsets is None:
+        field_offsets = availability_field_offsets(availability)
+    mask: int = 0
+    for field_name, days in availability.items():
+        offset: int = field_offsets[field_name]
+        for day in days:
+            day_bit = __WEEK_DAY_BITS.get(day.lower())
+            if day_bit is not None:
+                mask |= 1 << (offset + day_bit)
+    return mask
+
+
+def user_availability_mask(user: models.SurveyRecord, field_offsets: Optional[dict[str, int]] = None) -> int:
+    '''
+    returns the availability bitmask of the user, building it on first use (see availability_mask)
+    '''
+    if user.availability_mask is None:
+        user.availability_mask = availability_mask(user.availability, field_offsets)
+    return user.availability_mask
+
+
+def members_availability_mask(members: list[models.SurveyRecord]) -> int:
+    '''
+    returns the AND of the availability bitmasks of the members.
+    An empty list of members returns -1 (every bit set), so it doesn't restrict anything it is combined with.
+    '''
+    mask: int = -1
+    for member in members:
+        mask &= user_availability_mask(member)
+    return mask
+
+
+def group_availability_mask(group: models.GroupRecord) -> int:
+    '''
+    returns the availability bitmask of the group (the time slot-days where every member is available)
+    '''
+    if len(group.members) < 1:
+        return 0
+    return members_availability_mask(group.members)
+
+
+# dense integer index of every student id seen by the process since the last survey was indexed
+# (interned as they are seen)
+__student_indices: dict[str, int] = {}
+
+# generation of the student indices (a random number, so generations of different processes don't match), held
+# in a list so it can be replaced. A new generation is started whenever the indices are reset. Each record keeps
+# the generation it was indexed in, and records of different generations are never compared (see
+# check_index_generation).
+__index_generation: list[int] = [secrets.randbits(63)]
+
+
+def reset_student_indices():
+    '''
+    forgets the indices of the students seen so far and starts a new generation, so that the indices of a newly
+    loaded survey start at 0. Records indexed before can't be used together with the ones indexed after.
+    '''
+    __student_indices.clear()
+    __index_generation[0] = secrets.randbits(63)
+
+
+def student_index(student_id: str) -> int:
+    '''
+    returns the dense integer index of a student id, assigning the next index the first time the id is seen
+    '''
+    idx = __student_indices.get(student_id)
+    if idx is None:
+        idx = len(__student_indices)
+        __student_indices[sys.intern(student_id)] = idx
+    return idx
+
+
+def index_student(user: models.SurveyRecord):
+    '''
+    (re)builds the integer index of the student along with the bitsets of their preferred
+    and disliked students. Must be called again whenever those lists change.
+    '''
+    user.student_idx = student_index(user.student_id)
+    user.index_generation = __index_generation[0]
+    user.preferred_bits = __index_bits(student_index(student_id) for student_id in user.preferred_students)
+    user.disliked_bits = __index_bits(student_index(student_id) for student_id in user.disliked_students)
+
+
+def __index_bits(indices) -> int:
+    bits: int = 0
+    for idx in indices:
+        bits |= 1 << idx
+    return bits
+
+
+def bit_indices(bits: int) -> Iterator[int]:
+    '''
+    yields the indices of the set bits of a bitset, lowest first
+    '''
+    while bits:
+        lowest: int = bits & -bits
+        yield lowest.bit_length() - 1
+        bits ^= lowest
+
+
+def user_index(user: models.SurveyRecord) -> int:
+    '''
+    returns the integer index of the user, indexing them on first use
+    '''
+    if user.student_idx is None:
+        index_student(user)
+    return user.student_idx
+
+
+def preferred_indices(user: models.SurveyRecord) -> Iterator[int]:
+    '''
+    yields the integer indices of the user's preferred students, indexing them on first use
+    '''
+    return bit_indices(preferred_bits(user))
+
+
+def disliked_indices(user: models.SurveyRecord) -> Iterator[int]:
+    '''
+    yields the integer indices of the user's disliked students, indexing them on first use
+    '''
+    return bit_indices(disliked_bits(user))
+
+
+def preferred_bits(user: models.SurveyRecord) -> int:
+    '''
+    returns the user's row of the like adjacency matrix (bit j set if they prefer the student with index j)
+    '''
+    if user.preferred_bits is None:
+        index_student(user)
+    return user.preferred_bits
+
+
+def disliked_bits(user: models.SurveyRecord) -> int:
+    '''
+    returns the user's row of the dislike adjacency matrix (bit j set if they dislike the student with index j)
+    '''
+    if user.disliked_bits is None:
+        index_student(user)
+    return user.disliked_bits
+
+
+def index_generation(user: models.SurveyRecord) -> int:
+    '''
+    returns the generation of the student indices the user was indexed in, indexing them on first use
+    '''
+    if user.index_generation is None:
+        index_student(user)
+    return user.index_generation
+
+
+def check_index_generation(users: Iterable[models.SurveyRecord]):
+    '''
+    raises a ValueError if the users were not all indexed in the same generation of the student indices (e.g.
+    they are from different surveys), as their indices would refer to different students
+    '''
+    generations: set[int] = {index_generation(user) for user in users}
+    if len(generations) > 1:
+        raise ValueError("students indexed for different surveys can't be compared, "
+                         "reload the survey (see load.index_survey_records)")
+
+
+def members_index_bits(members: list[models.SurveyRecord]) -> int:
+    '''
+    returns the membership vector of the members as a bitset of their indices. Raises a ValueError if the
+    members were indexed in different generations (see check_index_generation).
+    '''
+    check_index_generation(members)
+    bits: int = 0
+    for member in members:
+        bits |= 1 << user_index(member)
+    return bits
+
+
+def group_pair_counts(group: models.GroupRecord) -> tuple[int, int]:
+    '''
+    returns the number of (disliked, liked) pairings in the group. Each count is the masked sum of
+    the members' adjacency matrix rows over the group's membership vector.
+    '''
+    membership: int = members_index_bits(group.members)
+    disliked: int = 0
+    liked: int = 0
+    for member in group.members:
+        disliked += (disliked_bits(member) & membership).bit_count()
+        liked += (preferred_bits(member) & membership).bit_count()
+    return disliked, liked
+
+
+def solution_pair_counts(groups: list[models.GroupRecord]) -> list[tuple[int, int]]:
+    '''
+    returns the number of (disliked, liked) pairings of each group in the solution
+    '''
+    return [group_pair_counts(group) for group in groups]
+
+
+def __availability_view(keys, mask: int) -> dict[str, dict[str, bool]]:
+    '''
+    expands an availability bitmask back into the dictionary form for the given availability fields
+    '''
+    available: dict[str, dict[str, bool]] = {}
+    for key, offset in availability_field_offsets(keys).items():
+        available[key] = {day: bool(mask >> (offset + bit) & 1) for day, bit in __WEEK_DAY_BITS.items()}
+    return available
+
+
 def user_availability(user: models.SurveyRecord, group: models.GroupRecord) -> dict[str, dict[str, bool]]:
     '''
     compares a users availability against a group and returns the resulting availability:
@@ -19,38 +244,15 @@ def user_availability(user: models.SurveyRecord, group: models.GroupRecord) -> d
     {'time_slot': {'weekday': 'are_all_users_available(boolean)'}}
     ```
     '''
-    user_available: dict[str, dict[str, bool]] = {}
-
-    # create a map with each time and set to true for every day
-    for key in user.availability.keys():
-        user_available[key] = {}
-        for day in WEEK_DAYS:
-            if user.availability[key].count(day) > 0:
-                user_available[key][day] = True
-            else:
-                user_available[key][day] = False
-
-    # loop through the members and set to False if it isn't met
-    for member in group.members:
-        for key in member.availability.keys():
-            for day in WEEK_DAYS:
-                if member.availability[key].count(day) == 0:
-                    user_available[key][day] = False
-
-    return user_available
+    mask: int = user_availability_mask(user) & members_availability_mask(group.members)
+    return __availability_view(user.availability.keys(), mask)
 
 
 def user_matches_availability_count(user: models.SurveyRecord, group: models.GroupRecord) -> int:
     '''
     returns how many times the user is compatible with the group
     '''
-    availability_count = 0
-    user_available = user_availability(user, group)
-    for vals in user_available.values():
-        for available in vals.values():
-            if available:
-                availability_count += 1
-    return availability_count
+    return (user_availability_mask(user) & members_availability_mask(group.members)).bit_count()
 
 
 def fits_group_availability(user: models.SurveyRecord, group: models.GroupRecord, min_count=1) -> bool:
@@ -69,28 +271,11 @@ def group_availability(group: models.GroupRecord) -> dict[str, dict[str, bool]]:
     ```
     The boolean value will be set to true if everyone that matches the given weekday in the timeslot
     '''
-    group_available: dict[str, dict[str, bool]] = {}
     if len(group.members) < 1:
-        return group_available
+        return {}
 
-    # create a map with each time and set to true for every day
-    for key in group.members[0].availability.keys():
-        group_available[key] = {}
-        for day in WEEK_DAYS:
-            group_available[key][day] = True
-
-    # loop through the members and set to False if it isn't met
-    for member in group.members:
-        for key in member.availability.keys():
-            # convert values to lowercase for comparison
-            lowercase_avail: list[str] = [x.lower()
-                                          for x in member.availability[key]]
-            for day in WEEK_DAYS:
-                if (lowercase_avail).count(day.lower()) == 0:
-                    if not group_available.get(key):
-                        group_available[key] = {}
-                    group_available[key][day] = False
-    return group_available
+    keys = [key for member in group.members for key in member.availability.keys()]
+    return __availability_view(keys, group_availability_mask(group))
 
 
 def group_availability_strings(group: models.GroupRecord) -> list[str]:
@@ -134,13 +319,7 @@ def availability_overlap_count(group: models.GroupRecord) -> int:
     '''
     gets the number of times that the group has overlap on their availability. i.e. how many timeslot-days everyone is available
     '''
-    availability_count = 0
-    group_available = group_availability(group)
-    for vals in group_available.values():
-        for available in vals.values():
-            if available:
-                availability_count += 1
-    return availability_count
+    return group_availability_mask(group).bit_count()
 
 
 def meets_group_availability_requirement(group: models.GroupRecord, min_count=1) -> bool:
@@ -159,30 +338,34 @@ def group_dislike_occurrences(group: models.GroupRecord) -> dict[str, list[str]]
     {'student_id': ['user_list']}
     ```
     '''
+    check_index_generation(group.members)
 
     disliked_occurrences: dict[str, list[str]] = {}
 
     for user in group.members:
         disliked_occurrences[user.student_id] = []
+        user_disliked: int = disliked_bits(user)
         for dislike_user in group.members:
-            if dislike_user.student_id in user.disliked_students:
+            if user_disliked >> user_index(dislike_user) & 1:
                 disliked_occurrences[user.student_id].append(
                     dislike_user.student_id)
 
     return disliked_occurrences
 
 
-def group_dislikes_user(user: str, group: models.GroupRecord) -> dict[str, bool]:
+def group_dislikes_user(user: models.SurveyRecord, group: models.GroupRecord) -> dict[str, bool]:
     '''
-    checks whether the user id will fit for the users in the group. Returns a dictionary for each user in the group:
+    checks whether the user will fit for the users in the group. Returns a dictionary for each user in the group:
     ```
     {"student_id": "dislikes_student? (True/False)"}
     ```
     '''
+    check_index_generation(itertools.chain([user], group.members))
     dislike_occurrences = {}
+    user_idx: int = user_index(user)
 
     for group_user in group.members:
-        dislike_occurrences[group_user.student_id] = user in group_user.disliked_students
+        dislike_occurrences[group_user.student_id] = bool(disliked_bits(group_user) >> user_idx & 1)
 
     return dislike_occurrences
 
@@ -191,10 +374,12 @@ def user_dislikes_group(user: models.SurveyRecord, group: models.GroupRecord) ->
     '''
     returns each member in the group that matched with the user's disliked students
     '''
+    check_index_generation(itertools.chain([user], group.members))
     disliked_users = []
+    user_disliked: int = disliked_bits(user)
 
     for group_user in group.members:
-        if group_user.student_id in user.disliked_students:
+        if user_disliked >> user_index(group_user) & 1:
             disliked_users.append(group_user.student_id)
 
     return disliked_users
@@ -205,7 +390,7 @@ def meets_group_dislike_requirement(user: models.SurveyRecord, group: models.Gro
     checks if the user fits under the maximum dislike count threshold for the group
     '''
 
-    group_dislike = group_dislikes_user(user.student_id, group)
+    group_dislike = group_dislikes_user(user, group)
 
     return len(user_dislikes_group(user, group)) + list(group_dislike.values()).count(True) <= max_dislike_count
 
@@ -220,7 +405,7 @@ def users_disliked_in_group(group: models.GroupRecord) -> list[str]:
         group_dislike_occurrences(group).values()))
 
     # dedup before return
-    return [*set(disliked_users)]
+    return list(dict.fromkeys(disliked_users))
 
 
 def meets_dislike_requirement(group: models.GroupRecord, max_dislike_count=0):
@@ -239,30 +424,34 @@ def group_like_occurrences(group: models.GroupRecord) -> dict[str, list[str]]:
     {'student_id': ['user_list']}
     ```
     '''
+    check_index_generation(group.members)
 
     liked_occurrences: dict[str, list[str]] = {}
 
     for user in group.members:
         liked_occurrences[user.student_id] = []
+        user_preferred: int = preferred_bits(user)
         for like_user in group.members:
-            if like_user.student_id in user.preferred_students:
+            if user_preferred >> user_index(like_user) & 1:
                 liked_occurrences[user.student_id].append(
                     like_user.student_id)
 
     return liked_occurrences
 
 
-def group_likes_user(user: str, group: models.GroupRecord) -> dict[str, bool]:
+def group_likes_user(user: models.SurveyRecord, group: models.GroupRecord) -> dict[str, bool]:
     '''
-    checks whether the user id will fit for the users in the group. Returns a dictionary for each user in the group:
+    checks whether the user will fit for the users in the group. Returns a dictionary for each user in the group:
     ```
     {"student_id": "likes_student? (True/False)"}
     ```
     '''
+    check_index_generation(itertools.chain([user], group.members))
     like_occurrences = {}
+    user_idx: int = user_index(user)
 
     for group_user in group.members:
-        like_occurrences[group_user.student_id] = user in group_user.preferred_students
+        like_occurrences[group_user.student_id] = bool(preferred_bits(group_user) >> user_idx & 1)
 
     return like_occurrences
 
@@ -271,10 +460,12 @@ def user_likes_group(user: models.SurveyRecord, group: models.GroupRecord) -> li
     '''
     returns each user in the group that matched with the liked users
     '''
+    check_index_generation(itertools.chain([user], group.members))
     liked_users = []
+    user_preferred: int = preferred_bits(user)
 
     for group_user in group.members:
-        if group_user.student_id in user.preferred_students:
+        if user_preferred >> user_index(group_user) & 1:
             liked_users.append(group_user.student_id)
 
     return liked_users
@@ -285,7 +476,7 @@ def meets_group_like_requirement(user: models.SurveyRecord, group: models.GroupR
     checks if the user fits above the minimum like count threshold for the group
     '''
 
-    group_like = group_likes_user(user.student_id, group)
+    group_like = group_likes_user(user, group)
 
     return len(user_likes_group(user, group)) + list(group_like.values()).count(True) >= min_like_count
 
@@ -366,12 +557,7 @@ def total_disliked_pairings(groups: list[models.GroupRecord]) -> int:
     This method returns the total number of disliked pairings in a set
     of groups.
     '''
-    result: int = 0
-
-    for group in groups:
-        for user in group.members:
-            result += len(user_dislikes_group(user, group))
-    return result
+    return sum(disliked for disliked, _ in solution_pair_counts(groups))
 
 
 def total_students_no_preferred_pair(groups: list[models.GroupRecord]) -> int:
@@ -382,8 +568,9 @@ def total_students_no_preferred_pair(groups: list[models.GroupRecord]) -> int:
     result: int = 0
 
     for group in groups:
+        membership: int = members_index_bits(group.members)
         for student in group.members:
-            if student.pref_pairing_possible and len(user_likes_group(student, group)) == 0:
+            if student.pref_pairing_possible and preferred_bits(student) & membership == 0:
                 result += 1
     return result
 
@@ -406,12 +593,7 @@ def total_liked_pairings(groups: list[models.GroupRecord]) -> int:
     This method returns the total number of liked pairings in a set
     of groups.
     '''
-    result: int = 0
-
-    for group in groups:
-        for user in group.members:
-            result += len(user_likes_group(user, group))
-    return result
+    return sum(liked for _, liked in solution_pair_counts(groups))
 
 
 def verify_all_users_grouped(users: list[models.SurveyRecord], groupings: list[models.GroupRecord]) -> list[models.SurveyRecord]:
@@ -476,7 +658,8 @@ def generate_preferred_list_per_user(groupings: list[models.GroupRecord]) -> dic
     return users
 
 
-def student_pref_pair_possible(students: list[models.SurveyRecord], in_student: models.SurveyRecord) -> bool:
+def student_pref_pair_possible(students: list[models.SurveyRecord], in_student: models.SurveyRecord,
+                               students_by_idx: Optional[dict[int, models.SurveyRecord]] = None) -> bool:
     '''
     This function determines if a student could "possibly" be grouped with one of their preferred
      student selections.
@@ -484,26 +667,41 @@ def student_pref_pair_possible(students: list[models.SurveyRecord], in_student:
     This requires that:
      - The student selected one or more preferred students (listing themself doesn't count) 
      - One or more of their preferred students did NOT list them as "disliked"
+
+    students_by_idx can be provided (see students_by_index) to avoid re-indexing the students on every call.
     '''
 
     # Return False if the student didn't provide any preferred student selections
     if not in_student.provided_pref_students:
         return False
 
+    if students_by_idx is None:
+        students_by_idx = students_by_index(students)
+
     # For each student in the input student's "preferred" list, if the
     #  student did not list the input student as disliked, then return True
-    for student_id in in_student.preferred_students:
-        if student_id == in_student.student_id:
+    in_student_idx: int = user_index(in_student)
+    for student_idx in preferred_indices(in_student):
+        if student_idx == in_student_idx:
             # listing themself doesn't count
             continue
-        for student in students:
-            if student_id == student.student_id:
-                if in_student.student_id not in student.disliked_students:
-                    return True
+        student = students_by_idx.get(student_idx)
+        if student is None:
+            continue
+        check_index_generation((in_student, student))
+        if not disliked_bits(student) >> in_student_idx & 1:
+            return True
 
     return False
 
 
+def students_by_index(students: list[models.SurveyRecord]) -> dict[int, models.SurveyRecord]:
+    '''
+    Returns a lookup of the students by their integer index
+    '''
+    return {user_index(student): student for student in students}
+
+
 def __contains_id(student_id: str, members: list[models.SurveyRecord]) -> bool:
     '''
     Specifically looks for a student in a list of survey records based on student id.
@@ -522,12 +720,19 @@ def stud_prev_overlap_idx(group: models.GroupRecord) -> int:
         within a group, and returns that student's index within the group list.
     If no such student is found, then -1 is returned.
     '''
-    for idx, _ in enumerate(group.members):
-        test_group: models.GroupRecord = models.GroupRecord(
-            group.group_id, group.members.copy())
-        test_group.members.pop(idx)
-        if meets_group_availability_requirement(test_group):
+    masks: list[int] = [user_availability_mask(member) for member in group.members]
+
+    # suffix_masks[idx] is the availability of every member from idx to the end of the group
+    suffix_masks: list[int] = [-1] * (len(masks) + 1)
+    for idx in range(len(masks) - 1, -1, -1):
+        suffix_masks[idx] = suffix_masks[idx + 1] & masks[idx]
+
+    prefix_mask: int = -1
+    for idx, mask in enumerate(masks):
+        # availability of the group without this student (an empty group has no overlap)
+        if len(masks) > 1 and (prefix_mask & suffix_masks[idx + 1]) != 0:
             return idx
+        prefix_mask &= mask
     return -1  # No single student preventing overlap found
 
 
@@ -552,8 +757,9 @@ def calc_alternative_scoring_vars(grouping):
     num_students_pref_pair_not_possible: int = 0
     grouping.scoring_vars.num_students_no_pref_pairs = 0  # reset before computing
     for group in grouping.groups:
+        membership: int = members_index_bits(group.members)
         for student in group.members:
-            if student.pref_pairing_possible and len(user_likes_group(student, group)) == 0:
+            if student.pref_pairing_possible and preferred_bits(student) & membership == 0:
                 grouping.scoring_vars.num_students_no_pref_pairs += 1
             elif not student.pref_pairing_possible:
                 num_students_pref_pair_not_possible += 1
@@ -7,9 +7,9 @@ from copy import deepcopy
 from multiprocessing.synchronize import Event
 import random as rnd
 from typing import Optional
-from app import models
+from app import core, models
 from app.group import validate
-from app.group import scoring, scoring_alternative
+from app.group import scoring, group_state
 from app.grouping import printer
 
 
@@ -22,25 +22,32 @@ class Grouper1:
     cur_sol_score: float
     scoring_vars: models.GroupSetData
     groups: list[models.GroupRecord]
+    state: group_state.GroupState
     best_solution_found: list[models.GroupRecord]
     best_solution_score: float
+    best_solution_std_dev: float
     num_groups: int
     console_printer: printer.GroupingConsolePrinter
 
+    # pylint: disable-next=too-many-arguments
     def __init__(self, survey_data: list[models.SurveyRecord], config_data: models.Configuration,
-                 num_groups: int, console_printer: printer.GroupingConsolePrinter):
+                 num_groups: int, console_printer: printer.GroupingConsolePrinter, rng: Optional[rnd.Random] = None):
         self.survey_data: list[models.SurveyRecord] = survey_data
         self.config_data: models.Configuration = config_data
         self.cur_sol_score: float
         self.scoring_vars: models.GroupSetData
         self.groups: list[models.GroupRecord] = []
+        self.state: group_state.GroupState
         self.best_solution_found: list[models.GroupRecord] = []
         self.best_solution_score: float
+        self.best_solution_std_dev: float = 0
         self.num_groups: int = num_groups
         self.use_alternative_scoring: bool = config_data["prioritize_preferred_over_availability"]
         self.console_printer: printer.GroupingConsolePrinter = console_printer
+        self.deadline: Optional[float] = None
+        self.rng: rnd.Random = rng if rng is not None else rnd.Random()
 
-    def create_groups(self, cancel_event: Optional[Event] = None) -> object:
+    def create_groups(self, cancel_event: Optional[Event] = None, deadline: Optional[float] = None) -> object:
         '''
         Method for grouping students via a constructive, heuristic approach with local
             backtracking, as follows:
@@ -74,6 +81,10 @@ class Grouper1:
                 “optimal” solution (from previous Step 1-4 runs, if applicable) and save whichever
                 has a higher score.
             Step 5: Repeat Steps 1-4 "grouping_passes" number of times (specified in the config)
+                NOTE: If there is a deadline (a time.time() value), fewer passes are made once it has passed,
+                    but always at least one. The backtracking phases also stop early at the deadline.
+                NOTE: The passes are independent of each other, so they can also be made in separate
+                    processes instead (see create_pass and finish_groups).
             Step 6: Perform Local Backtracking, Phase 2
                 An attempt to increase the number of preferred pairings and "additional" overlapping
                     availability is made by swapping students between groups.
@@ -81,15 +92,47 @@ class Grouper1:
                     are found to improve or at least not decrease the solution's score.
         '''
 
+        self.deadline = deadline
+
         # "Step 5": Repeat Steps 1-4 "grouping_passes" number of times (specified in the config)
         for grouping_pass in range(max(self.config_data["grouping_passes"], 1)):
             if cancel_event and cancel_event.is_set():
                 return self
+            if grouping_pass > 0 and core.past_deadline(self.deadline):
+                break
             self.groups = []
 
             # Steps 1 thru 4
             self.__start_grouping(grouping_pass, self.num_groups, cancel_event)
 
+        return self.finish_groups(cancel_event, deadline)
+
+    def create_pass(self, grouping_pass: int, seed: Optional[int] = None, cancel_event: Optional[Event] = None,
+                    deadline: Optional[float] = None) -> object:
+        '''
+        Performs a single pass (steps 1 thru 4) of the grouping algorithm, with the random choices made
+            by a random number generator seeded with the seed. The pass' solution is saved as the best
+            solution found (unless this is not the first pass and the deadline has already passed, in
+            which case the pass is skipped and no solution is saved).
+        The passes of a grouping are independent of each other, so they can be made by separate groupers
+            (e.g. in separate processes), the best of their solutions (see is_better_solution) being
+            finished by finish_groups.
+        '''
+        self.deadline = deadline
+        self.rng = rnd.Random(seed)
+        if (cancel_event and cancel_event.is_set()) or (grouping_pass > 0 and core.past_deadline(self.deadline)):
+            return self
+        self.groups = []
+        self.__start_grouping(grouping_pass, self.num_groups, cancel_event)
+        return self
+
+    def finish_groups(self, cancel_event: Optional[Event] = None, deadline: Optional[float] = None) -> object:
+        '''
+        Performs step 6 of the grouping algorithm on the best solution found (by the passes made by this
+            grouper), saving and returning the result.
+        '''
+        self.deadline = deadline
+
         ### Step 6: Perform Local Backtracking, Phase 2 ###
         # Attempt to increase the number of preferred pairings and "additional" overlapping
         #   availability by swapping students between groups.
@@ -131,12 +174,12 @@ class Grouper1:
 
         ### Step 4: Save the Current "Optimal" Solution ###
         # Check if the current solution (groups) score better than the saved best solution
-        if (grouping_pass == 0 or (self.cur_sol_score > self.best_solution_score) or
-            ((self.cur_sol_score == self.best_solution_score)
-                and (scoring.standard_dev_groups(self.groups, self.scoring_vars, self.use_alternative_scoring) <
-                     scoring.standard_dev_groups(self.best_solution_found, self.scoring_vars, self.use_alternative_scoring)))):
+        cur_sol_std_dev: float = scoring.standard_dev_group_state(self.state)
+        if (not self.best_solution_found or
+                is_better_solution(self.cur_sol_score, cur_sol_std_dev, self.best_solution_score, self.best_solution_std_dev)):
             self.best_solution_found = self.groups
             self.best_solution_score = self.cur_sol_score
+            self.best_solution_std_dev = cur_sol_std_dev
 
     def __pre_process_students(self) -> list[models.SurveyRecord]:
         '''
@@ -151,7 +194,7 @@ class Grouper1:
         '''
         # For each student’s disliked users list, remove duplicate entries
         for student in self.survey_data:
-            student.disliked_students = [*set(student.disliked_students)]
+            student.disliked_students = list(dict.fromkeys(student.disliked_students))
 
         # Sort students from most disliked to least (not in place)
         # Also, for subsets of students with the same number of dislikes,
@@ -195,7 +238,7 @@ class Grouper1:
         sorted_data: list[models.SurveyRecord] = []
         for list_x in lists_of_survey_records:
             if len(list_x) > 0:
-                rnd.shuffle(list_x)
+                self.rng.shuffle(list_x)
                 for survey in list_x:
                     sorted_data.append(survey)
 
@@ -258,7 +301,7 @@ class Grouper1:
 
                     # If the student increases the number of disliked pairings in the group, continue
                     #  to the next group.
-                    if (True in validate.group_dislikes_user(student_survey.student_id, group).values() or
+                    if (True in validate.group_dislikes_user(student_survey, group).values() or
                             len(validate.user_dislikes_group(student_survey, group)) > 0):
                         continue
 
@@ -306,40 +349,19 @@ class Grouper1:
                 are found to improve or at least not decrease the solution's score.
         '''
         # Calculate the current solution score
+        self.state = group_state.GroupState(self.groups)
         self.scoring_vars = models.GroupSetData("solution_1",
                                                 self.config_data["target_group_size"],
 
                                                 len((self.config_data["field_mappings"])[
                                                     "preferred_students_field_names"]),
 
-                                                sum(len(group.members)
-                                                    for group in self.groups),
+                                                self.state.num_students,
 
                                                 len((self.config_data["field_mappings"])[
-                                                    "availability_field_names"]),
-
-                                                validate.total_groups_no_availability(
-                                                    self.groups),
-
-                                                validate.total_disliked_pairings(self.groups),
-
-                                                validate.total_liked_pairings(self.groups),
-
-                                                sum(
-                                                    # subtract one to get "additional"
-                                                    max(validate.availability_overlap_count(
-                                                        group) - 1, 0)
-                                                    for group in self.groups),
-
-                                                num_students_no_pref_pairs=0,  # "don't care" unless alternative scoring
-                                                num_additional_pref_pairs=0  # "don't care" unless alternative scoring
-                                                )
-        if self.use_alternative_scoring:
-            validate.calc_alternative_scoring_vars(self)
-            self.cur_sol_score = scoring_alternative.score_groups(
-                self.scoring_vars)
-        else:
-            self.cur_sol_score = scoring.score_groups(self.scoring_vars)
+                                                    "availability_field_names"]))
+        self.cur_sol_score = scoring.score_group_state(self.state, self.scoring_vars, self.use_alternative_scoring)
+        scoring.track_group_scores(self.state, self.scoring_vars, self.use_alternative_scoring)
 
         # Attempt to eliminate disliked pairings by swapping students that are part of such
         # pairings into other groups.
@@ -369,11 +391,11 @@ class Grouper1:
         #   the iteration limit has not been met AND
         #   progress is being made (student_swapped and improvement):
         # Continue to attempt to find improvement swaps.
-        while ((validate.total_disliked_pairings(self.groups) > 0) and
+        while ((self.state.num_disliked_pairs > 0) and
                 (loop_count < max((self.config_data["grouping_passes"]*10), 100)) and
                 (student_swapped and no_improvement_count < 10)):
 
-            if cancel_event and cancel_event.is_set():
+            if (cancel_event and cancel_event.is_set()) or core.past_deadline(self.deadline):
                 return
 
             loop_count += 1
@@ -395,7 +417,7 @@ class Grouper1:
             group_max_disliked_pairs: models.GroupRecord = self.__group_max_dislikes()
 
             # Shuffle the group to avoid getting stuck swapping the same student over and over
-            rnd.shuffle(group_max_disliked_pairs.members)
+            self.rng.shuffle(group_max_disliked_pairs.members)
 
             # For each student in other groups, if swapping the group_max_disliked_pairs student
             #   with this student would improve (lower) the overall solution score, swap the two
@@ -433,11 +455,11 @@ class Grouper1:
         #   the iteration limit has not been met AND
         #   progress is being made (student_swapped):
         # Continue to attempt to find improvement swaps.
-        while ((validate.total_students_no_preferred_pair(self.groups) > 0) and
+        while ((self.state.num_students_no_pref_pairs > 0) and
                 (loop_count < max((self.config_data["grouping_passes"]*10), 100)) and
                 (student_swapped and no_improvement_count < 10)):
 
-            if cancel_event and cancel_event.is_set():
+            if (cancel_event and cancel_event.is_set()) or core.past_deadline(self.deadline):
                 return
 
             loop_count += 1
@@ -449,7 +471,8 @@ class Grouper1:
             # For each student that could potentially have at least one preferred pairing but does not:
             for group in self.groups:
                 for idx_student, student in enumerate(group.members):
-                    if not student.pref_pairing_possible or len(validate.user_likes_group(student, group)) > 0:
+                    if (not student.pref_pairing_possible or
+                            validate.preferred_bits(student) & self.state.stats(group).membership != 0):
                         continue
 
                     # For each student in other groups, if swapping the students would improve
@@ -482,11 +505,11 @@ class Grouper1:
         #   the iteration limit has not been met AND
         #   progress is being made (student_swapped):
         # Continue to attempt to find improvement swaps.
-        while ((validate.total_groups_no_availability(self.groups) > 0) and
+        while ((self.state.num_groups_no_overlap > 0) and
                 (loop_count < max((self.config_data["grouping_passes"]*10), 100)) and
                 (student_swapped and no_improvement_count < 10)):
 
-            if cancel_event and cancel_event.is_set():
+            if (cancel_event and cancel_event.is_set()) or core.past_deadline(self.deadline):
                 return
 
             loop_count += 1
@@ -497,7 +520,7 @@ class Grouper1:
 
             # For each group without an overlapping timeslot:
             for group in self.groups:
-                if validate.meets_group_availability_requirement(group):
+                if group_state.overlap_count(self.state.stats(group)) > 0:
                     continue
 
                 # Deterimine if there is a single student preventing an overlapping
@@ -518,7 +541,7 @@ class Grouper1:
                 # If no improment swap has been found:
                 if not improvement_swap:
                     # choose a random student within the group (stud_rand_overlap):
-                    idx_stud_rand_overlap: int = rnd.randint(
+                    idx_stud_rand_overlap: int = self.rng.randint(
                         0, len(group.members) - 1)
                     # For each student in other groups, if swapping stud_rand_overlap
                     #  with this student would improve (lower) the overall solution score,
@@ -546,6 +569,7 @@ class Grouper1:
                 solution's score.
         '''
         self.groups = self.best_solution_found
+        self.state = group_state.GroupState(self.groups)
         self.cur_sol_score = self.best_solution_score
         loop_count = 0
         student_swapped = True
@@ -555,7 +579,7 @@ class Grouper1:
         # Continue to attempt to find improvement swaps.
         while (loop_count < max((self.config_data["grouping_passes"]*10), 100) and student_swapped):
 
-            if cancel_event and cancel_event.is_set():
+            if (cancel_event and cancel_event.is_set()) or core.past_deadline(self.deadline):
                 return
 
             loop_count += 1
@@ -566,13 +590,13 @@ class Grouper1:
             improvement_swap: bool = False
 
             # Shuffle the groups to avoid continually focusing on the same group
-            rnd.shuffle(self.groups)
+            self.rng.shuffle(self.groups)
 
             # Determine the number of preferred pairings in each group
             pref_pairs_by_group: list[tuple] = []
             for idx, group in enumerate(self.groups):
                 pref_pairs_by_group.append(
-                    (idx, validate.total_liked_pairings([group])))
+                    (idx, self.state.stats(group).num_preferred_pairs))
 
             # Focus on the groups with the least preferred pairs first
             pref_pairs_by_group.sort(key=lambda x: x[1])
@@ -599,16 +623,15 @@ class Grouper1:
             stud_idx_in_group].provided_survey_data
 
         for group in self.groups:
-            if group == student_group:
+            if group is student_group:
                 continue
 
             cur_sol_std_dev: float = 0
             if equiv_swap_ok:
-                cur_sol_std_dev = scoring.standard_dev_groups(
-                    self.groups, self.scoring_vars, self.use_alternative_scoring)
+                cur_sol_std_dev = scoring.standard_dev_group_state(self.state)
 
             # shuffle the group to avoid getting stuck swapping the same student over and over
-            rnd.shuffle(group.members)
+            self.rng.shuffle(group.members)
             for idx, student in enumerate(group.members):
                 # NOTE: If the config selection for "no_survey_group_method" is DISTRIBUTE_EVENLY or
                 #    GROUP_TOGETHER (i.e., not STANDARD_GROUPING), then swapping of students should
@@ -616,42 +639,25 @@ class Grouper1:
                 if student.provided_survey_data != student_provided_survey_data:
                     continue
 
-                # swap the students
-                group.members[idx] = student_group.members[stud_idx_in_group]
-                student_group.members[stud_idx_in_group] = student
-
-                # Get the new score
-                self.scoring_vars.num_groups_no_overlap = validate.total_groups_no_availability(
-                    self.groups)
-                self.scoring_vars.num_disliked_pairs = validate.total_disliked_pairings(
-                    self.groups)
-                self.scoring_vars.num_preferred_pairs = validate.total_liked_pairings(
-                    self.groups)
-
-                new_sol_score: float
-                if self.use_alternative_scoring:
-                    validate.calc_alternative_scoring_vars(self)
-                    new_sol_score = scoring_alternative.score_groups(
-                        self.scoring_vars)
-                else:
-                    new_sol_score = scoring.score_groups(self.scoring_vars)
-
-                if equiv_swap_ok:
-                    if (new_sol_score > self.cur_sol_score or
-                            (new_sol_score == self.cur_sol_score and
-                             (cur_sol_std_dev >= scoring.standard_dev_groups(self.groups, self.scoring_vars, self.use_alternative_scoring)))):
-                        self.cur_sol_score = new_sol_score
-                        break
-                else:
-                    if ((new_sol_score > self.cur_sol_score) or
-                            (new_sol_score == self.cur_sol_score and
-                             (cur_sol_std_dev > scoring.standard_dev_groups(self.groups, self.scoring_vars, self.use_alternative_scoring)))):
-                        self.cur_sol_score = new_sol_score
+                # Get the score the solution would have with the students swapped
+                new_sol_score: float = scoring.score_swap_delta(
+                    self.state, self.scoring_vars, group, idx, student_group, stud_idx_in_group,
+                    self.use_alternative_scoring)
+
+                if new_sol_score > self.cur_sol_score:
+                    self.state.swap_students(group, idx, student_group, stud_idx_in_group)
+                    self.cur_sol_score = new_sol_score
+                    break
+
+                # An equivalent score is only accepted if the swap doesn't increase the standard
+                #   deviation of the group scores
+                if equiv_swap_ok and new_sol_score == self.cur_sol_score:
+                    self.state.swap_students(group, idx, student_group, stud_idx_in_group)
+                    if cur_sol_std_dev >= scoring.standard_dev_group_state(self.state):
                         break
 
-                # If we're here, the new solution was NOT better, so swap the students back
-                student_group.members[stud_idx_in_group] = group.members[idx]
-                group.members[idx] = student
+                    # If we're here, the new solution was NOT better, so swap the students back
+                    self.state.swap_students(group, idx, student_group, stud_idx_in_group)
             else:
                 continue  # executed if the inner loop didn't break
             return True  # executed if the inner loop DID break. Successful swap
@@ -716,8 +722,6 @@ class Grouper1:
             parings the least amount possible.
         Returns the index of the group identified.
         '''
-        cur_total_dislikes: int = validate.total_disliked_pairings(
-            self.groups)
         min_dislikes_increase: int = 0
         stored_group_idx: int = -1
 
@@ -727,18 +731,12 @@ class Grouper1:
             if self.__is_group_full(group, non_stand_mod, num_non_targ_groups, count_groups_max_size):
                 continue
 
-            group.members.append(student_survey)
-            if stored_group_idx == -1:
-                min_dislikes_increase = validate.total_disliked_pairings(
-                    self.groups) - cur_total_dislikes
+            # disliked pairings added by the student: those they dislike plus those that dislike them
+            dislikes_increase: int = (len(validate.user_dislikes_group(student_survey, group)) +
+                                      list(validate.group_dislikes_user(student_survey, group).values()).count(True))
+            if stored_group_idx == -1 or dislikes_increase < min_dislikes_increase:
+                min_dislikes_increase = dislikes_increase
                 stored_group_idx = idx
-            else:
-                dislikes_increase: int = validate.total_disliked_pairings(
-                    self.groups) - cur_total_dislikes
-                if dislikes_increase < min_dislikes_increase:
-                    min_dislikes_increase = dislikes_increase
-                    stored_group_idx = idx
-            group.members.pop()
         return stored_group_idx
 
     def __group_at_max_size(self, group: models.GroupRecord, non_stand_mod: int) -> bool:
@@ -759,10 +757,17 @@ class Grouper1:
         max_dislike_pairs: int = 0
         group_max_disliked_pairs: models.GroupRecord = self.groups[0]
         for group in self.groups:
-            disliked_pairs: int = validate.total_disliked_pairings([
-                group])
+            disliked_pairs: int = self.state.stats(group).num_disliked_pairs
             if ((disliked_pairs > max_dislike_pairs) or
-                    (disliked_pairs == max_dislike_pairs and bool(rnd.randint(0, 1)))):
+                    (disliked_pairs == max_dislike_pairs and bool(self.rng.randint(0, 1)))):
                 max_dislike_pairs = disliked_pairs
                 group_max_disliked_pairs = group
         return group_max_disliked_pairs
+
+
+def is_better_solution(score: float, std_dev: float, best_score: float, best_std_dev: float) -> bool:
+    '''
+    Returns whether a solution is better than the best solution: it has a higher score or, with the same
+        score, its groups' scores have a lower standard deviation.
+    '''
+    return score > best_score or (score == best_score and std_dev < best_std_dev)
@@ -2,12 +2,13 @@
 module for an additional grouping algorithm implementation
 """
 import copy
+import itertools
 from multiprocessing.synchronize import Event
-from random import randint
+import random
 from typing import Optional
-from app import models
+from app import core, models
 from app.data import load
-from app.group import validate, scoring, scoring_alternative
+from app.group import validate, scoring, group_state
 from app.grouping import printer
 
 
@@ -16,7 +17,9 @@ class Grouper2:
     class with operations that perform an algorithm to group students
     '''
 
-    def __init__(self, students, config, group_count: int, console_printer: printer.GroupingConsolePrinter) -> None:
+    # pylint: disable-next=too-many-arguments
+    def __init__(self, students, config, group_count: int, console_printer: printer.GroupingConsolePrinter,
+                 rng: Optional[random.Random] = None) -> None:
         self.students: list[models.SurveyRecord] = copy.deepcopy(students)
         self.bad_students: list[models.SurveyRecord] = []
         self.groups: list[models.GroupRecord] = []
@@ -31,12 +34,27 @@ class Grouper2:
             self.groups.append(models.GroupRecord(f"group_{idx+1}"))
         self.use_alternative_scoring: bool = config["prioritize_preferred_over_availability"]
         self.console_printer: printer.GroupingConsolePrinter = console_printer
+        self.rng: random.Random = rng if rng is not None else random.Random()
         self.scoring_vars: models.GroupSetData
-
-    def group_students(self, cancel_event: Optional[Event] = None) -> list[models.GroupRecord]:
+        # scratch variables for scoring individual groups
+        self.group_scoring_vars = models.GroupSetData("group",
+                                                      self.target_group_size,
+                                                      len((config["field_mappings"])[
+                                                          "preferred_students_field_names"]),
+                                                      self.num_students,
+                                                      len((config["field_mappings"])[
+                                                          "availability_field_names"]))
+        self.state: Optional[group_state.GroupState] = None
+        self.deadline: Optional[float] = None
+
+    def group_students(self, cancel_event: Optional[Event] = None, deadline: Optional[float] = None) -> list[models.GroupRecord]:
         """
         initiates the grouping process
+
+        If there is a deadline (a time.time() value), the optimization stops early once it has passed. The
+         students are always all grouped (and the groups balanced) first, so a complete solution is returned.
         """
+        self.deadline = deadline
         self.prepare_students_for_grouping()
         while len(self.students) > 0:
             if cancel_event and cancel_event.is_set():
@@ -187,21 +205,25 @@ class Grouper2:
         '''
         prev_score = 0
         dup_score_count = 0
+        self.state = group_state.GroupState(self.groups)
         # loop through the specified # of grouping passes
         for group_pass in range(self.grouping_passes):
-            if cancel_event and cancel_event.is_set():
+            if (cancel_event and cancel_event.is_set()) or core.past_deadline(self.deadline):
                 return
             # track previous scores
-            if prev_score == self.grade_groups():
+            score = self.grade_groups(self.state)
+            if prev_score == score:
                 dup_score_count += 1
             else:
                 dup_score_count = 0
 
             if dup_score_count >= 5:
                 break
-            prev_score = self.grade_groups()
+            prev_score = score
             self.console_printer.print(f'optimization pass #{group_pass+1}')
             for group in self.groups:
+                if core.past_deadline(self.deadline):
+                    return
                 for mem in group.members:
                     if mem.lock_in_group:
                         continue
@@ -211,49 +233,27 @@ class Grouper2:
                     for other_group in self.groups:
                         if other_group.group_id == scenario.group_1.group_id:
                             other_group.members = scenario.group_1.members
+                            self.state.refresh(other_group)
                         elif other_group.group_id == scenario.group_2.group_id:
                             other_group.members = scenario.group_2.members
+                            self.state.refresh(other_group)
                     break
 
-    def grade_groups(self):
-        '''
-        computes the score of the overall grouping
-        '''
-        num_pairings_disliked: int = validate.total_disliked_pairings(
-            self.groups)
-        num_groups_no_avail: int = validate.total_groups_no_availability(
-            self.groups)
-        num_pairings_liked: int = validate.total_liked_pairings(self.groups)
-        num_additional_overlap: int = sum(
-            # subtract one to get "additional"
-            max(validate.availability_overlap_count(group) - 1, 0) for group in self.groups)
-
-        if self.use_alternative_scoring:
-            self.scoring_vars = models.GroupSetData("solution_2",
-                                                    self.target_group_size,
-                                                    len((self.config["field_mappings"])[
-                                                        "preferred_students_field_names"]),
-                                                    self.num_students,
-                                                    len((self.config["field_mappings"])[
-                                                        "availability_field_names"]),
-                                                    num_groups_no_avail,
-                                                    num_pairings_disliked,
-                                                    num_pairings_liked,
-                                                    num_additional_overlap)
-            validate.calc_alternative_scoring_vars(self)
-            return scoring_alternative.score_groups(self.scoring_vars)
-        scoring_vars = models.GroupSetData("solution_2",
-                                           self.target_group_size,
-                                           len((self.config["field_mappings"])[
-                                               "preferred_students_field_names"]),
-                                           self.num_students,
-                                           len((self.config["field_mappings"])[
-                                               "availability_field_names"]),
-                                           num_groups_no_avail,
-                                           num_pairings_disliked,
-                                           num_pairings_liked,
-                                           num_additional_overlap)
-        return scoring.score_groups(scoring_vars)
+    def grade_groups(self, state: Optional[group_state.GroupState] = None):
+        '''
+        computes the score of the overall grouping. If the group state is not provided, it is built from the current groups.
+        '''
+        if state is None:
+            state = group_state.GroupState(self.groups)
+
+        self.scoring_vars = models.GroupSetData("solution_2",
+                                                self.target_group_size,
+                                                len((self.config["field_mappings"])[
+                                                    "preferred_students_field_names"]),
+                                                self.num_students,
+                                                len((self.config["field_mappings"])[
+                                                    "availability_field_names"]))
+        return scoring.score_group_state(state, self.scoring_vars, self.use_alternative_scoring)
 
     def add_student_to_group(self, student: models.SurveyRecord):
         """
@@ -281,7 +281,7 @@ class Grouper2:
                 if scenario.score == target_scenario.score:
                     matched_scenarios.append(scenario)
 
-            randidx = randint(0, len(matched_scenarios)-1)
+            randidx = self.rng.randint(0, len(matched_scenarios)-1)
             chosen_scenario = matched_scenarios[randidx]
             for group in self.groups:
                 if group.group_id == chosen_scenario.group.group_id:
@@ -316,56 +316,87 @@ class Grouper2:
 
     def run_swap_scenarios(self, group: models.GroupRecord, student: models.SurveyRecord) -> Optional[models.SwapScenario]:
         '''
-        gives a list of scenarios if the student were to be swapped for another group.
-
+        gives the best scenario if the student were to be swapped for another group.
+        Each swap is rated (see rate_swaps) without building the scenario; only the best one is built, and
+         only if more than one swap rated at least as well as the current groups.
         '''
 
         if student.lock_in_group:
             return None
 
-        scenarios: list[models.SwapScenario] = []
-        # loop through the groups and create a copy of each to run scenarios
+        best_group: Optional[models.GroupRecord] = None
+        best_swap: tuple[int, float] = (0, 0)
+        num_swaps: int = 0
+        group_view, group_score = self.__group_without(group, student)
+        # loop through the other groups and rate swapping the student with each of their members
         for other_group in self.groups:
             if group.group_id == other_group.group_id:
                 continue
-            copy_group = copy.deepcopy(group)
-            scenarios.extend(self.swap_members_and_rate(
-                student, copy_group, other_group))
-        scenarios.sort(reverse=True)
+            for swap in self.rate_swaps(student, group_view, group_score, other_group):
+                num_swaps += 1
+                if best_group is None or swap[1] > best_swap[1]:
+                    best_group = other_group
+                    best_swap = swap
 
-        if len(scenarios) > 1:
-            return scenarios[0]
+        if num_swaps > 1:
+            return self.__swap_scenario(student, group, best_group, best_swap)
 
         return None
 
     def swap_members_and_rate(self, student: models.SurveyRecord, group: models.GroupRecord, other_group: models.GroupRecord):
         '''
-        removes the student from the group and checks adding them to the other group with certain members removed
+        removes the student from the group and checks adding them to the other group with certain members removed.
+        Neither group is changed; each scenario holds new member lists for the two groups.
         '''
 
         if student.lock_in_group:
             return []
 
-        scenarios: list[models.SwapScenario] = []
-        for member in other_group.members:
+        group_view, group_score = self.__group_without(group, student)
+        return [self.__swap_scenario(student, group, other_group, swap)
+                for swap in self.rate_swaps(student, group_view, group_score, other_group)]
+
+    def rate_swaps(self, student: models.SurveyRecord, group_view: group_state.GroupView, group_score: float,
+                   other_group: models.GroupRecord):
+        '''
+        yields (member index, total score) for each swap of the student with a member of the other group for which
+         the total score of the two groups is at least their current total score.
+        group_view is the student's group without the student and group_score is the current score of that group.
+        The stats of both groups after each swap are computed from the groups' bitsets (see group_state.GroupView),
+         without building their member lists.
+        '''
+        other_view = group_state.GroupView(other_group.members)
+        cur_score = group_score + self.rank_stats(other_view.stats)
+        for idx, member in enumerate(other_group.members):
             if member.lock_in_group:
                 continue
-            oth_group_copy = copy.deepcopy(other_group)
-            oth_group_copy.members.remove(member)
-            oth_group_copy.members.append(student)
-            group_copy = copy.deepcopy(group)
-            group_copy.members.remove(student)
-            group_copy.members.append(member)
-            score_1 = self.rank_group(group_copy)
-            score_2 = self.rank_group(oth_group_copy)
+            score_1 = self.rank_stats(group_view.stats_with(member))
+            score_2 = self.rank_stats(other_view.stats_swapped(idx, student))
             total_score = score_1 + score_2
 
-            if total_score >= self.rank_group(group) + self.rank_group(other_group):
-                scenario = models.SwapScenario(
-                    group_copy, oth_group_copy, total_score)
-                scenarios.append(scenario)
+            if total_score >= cur_score:
+                yield idx, total_score
 
-        return scenarios
+    def __group_without(self, group: models.GroupRecord, student: models.SurveyRecord) -> tuple[group_state.GroupView, float]:
+        '''
+        returns a view of the group without the student, along with the current score of the group
+        '''
+        student_idx = group.members.index(student)
+        return (group_state.GroupView(group.members[:student_idx] + group.members[student_idx + 1:]),
+                self.rank_group(group))
+
+    def __swap_scenario(self, student: models.SurveyRecord, group: models.GroupRecord, other_group: models.GroupRecord,
+                        swap: tuple[int, float]) -> models.SwapScenario:
+        '''
+        builds the scenario of the student being swapped with the member at idx in the other group, where swap is
+         the (idx, score) rated by rate_swaps
+        '''
+        idx, score = swap
+        student_idx = group.members.index(student)
+        group_members = group.members[:student_idx] + group.members[student_idx + 1:] + [other_group.members[idx]]
+        oth_group_members = other_group.members[:idx] + other_group.members[idx + 1:] + [student]
+        return models.SwapScenario(models.GroupRecord(group.group_id, group_members),
+                                   models.GroupRecord(other_group.group_id, oth_group_members), score)
 
     def group_scenarios(self, student: models.SurveyRecord, group: models.GroupRecord):
         """
@@ -373,15 +404,15 @@ class Grouper2:
         """
 
         scenarios: list[models.Scenario] = []
-        for mem in group.members:
+        view = group_state.GroupView(group.members)
+        cur_score = self.rank_stats(view.stats)
+        for idx, mem in enumerate(group.members):
             if not mem.lock_in_group:
-                group_new = copy.deepcopy(group)
-                group_new.members.remove(mem)
-                group_new.members.append(student)
-                score = self.rank_group(group_new)
-                if self.rank_group(group) < score and score >= 0:
+                score = self.rank_stats(view.stats_swapped(idx, student))
+                if cur_score < score and score >= 0:
+                    members_new = group.members[:idx] + group.members[idx + 1:] + [student]
                     scenario = models.Scenario(
-                        group_new, score, mem)
+                        models.GroupRecord(group.group_id, members_new), score, mem)
                     scenarios.append(scenario)
 
         return scenarios
@@ -390,14 +421,19 @@ class Grouper2:
         '''
         uses the scoring algorithm to rank the group
         '''
-        scoring_vars = models.GroupSetData(group.group_id,
-                                           self.config["target_group_size"],
-                                           len((self.config["field_mappings"])[
-                                               "preferred_students_field_names"]),
-                                           self.num_students,
-                                           len((self.config["field_mappings"])[
-                                               "availability_field_names"]))
-        return scoring.score_individual_group(group, scoring_vars, self.use_alternative_scoring)
+        return self.rank_members(group.members)
+
+    def rank_members(self, members: list[models.SurveyRecord]) -> float:
+        '''
+        uses the scoring algorithm to rank a group with the given members
+        '''
+        return self.rank_stats(group_state.compute_group_stats(members))
+
+    def rank_stats(self, stats: models.GroupStats) -> float:
+        '''
+        uses the scoring algorithm to rank a group from its stats
+        '''
+        return scoring.score_group_stats(stats, self.group_scoring_vars, self.use_alternative_scoring)
 
 
 def meets_hard_requirement(student: models.SurveyRecord, group: models.GroupRecord, max_group_size: int, use_alternative_scoring: bool):
@@ -408,12 +444,11 @@ def meets_hard_requirement(student: models.SurveyRecord, group: models.GroupReco
     if student.lock_in_group:
         return False
 
-    group_copy = copy.deepcopy(group)
-    meets_preferred = validate.user_likes_group(student, group_copy)
-    group_copy.members.append(student)
-    meets_dislikes = validate.meets_dislike_requirement(group_copy)
-    meets_avail = validate.meets_group_availability_requirement(group_copy)
-    group_size = len(group_copy.members)
+    meets_preferred = validate.preferred_bits(student) & validate.members_index_bits(group.members) != 0
+    stats = group_state.compute_group_stats(group.members + [student])
+    meets_dislikes = stats.num_disliked_pairs == 0
+    meets_avail = group_state.overlap_count(stats) >= 1
+    group_size = stats.num_members
     if use_alternative_scoring and len(student.preferred_students) > 0:
         return meets_dislikes and meets_avail and group_size <= max_group_size and meets_preferred
 
@@ -431,24 +466,28 @@ def total_dislike_incompatible_students(student: models.SurveyRecord, students:
     Returns:
         int: number of total incompatible students
     """
-    disliked_set: set[str] = set(student.disliked_students)
+    validate.check_index_generation(itertools.chain([student], students))
+    disliked: int = validate.disliked_bits(student)
+    student_idx: int = validate.user_index(student)
 
     for other_student in students:
-        if student.student_id == other_student.student_id:
+        other_student_idx: int = validate.user_index(other_student)
+        if student_idx == other_student_idx:
             continue
 
-        if student.student_id in other_student.disliked_students:
-            disliked_set.add(other_student.student_id)
+        if validate.disliked_bits(other_student) >> student_idx & 1:
+            disliked |= 1 << other_student_idx
 
-    return len(disliked_set)
+    return disliked.bit_count()
 
 
 def rank_students(students: list[models.SurveyRecord]):
     '''
     creates a ranking for students based on their availability and # of people they are compatible with
     '''
+    histogram = load.AvailabilityHistogram(students)
     for student in students:
-        student.avail_rank = load.total_availability_matches(student, students)
+        student.avail_rank = histogram.total_matches(student)
         student.okay_with_rank = len(
             students) - total_dislike_incompatible_students(student, students)
 
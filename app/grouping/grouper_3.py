@@ -0,0 +1,172 @@
+'''
+module for a grouping algorithm implementation that improves an existing grouping solution via
+    simulated annealing.
+'''
+import math
+import random
+import time
+from multiprocessing.synchronize import Event
+from typing import Optional
+from app import core, models
+from app.group import scoring, group_state
+from app.grouping import printer
+
+# defaults for the (optional) annealing settings of the configuration
+DEFAULT_TIME_LIMIT: float = 5
+DEFAULT_STEPS_PER_STUDENT: int = 1000
+DEFAULT_INITIAL_TEMPERATURE: float = 0.1
+DEFAULT_FINAL_TEMPERATURE: float = 0.0001
+
+# the deadline (and the cancel event) is checked after this many steps
+CHECK_INTERVAL: int = 100
+
+
+class Grouper3:
+    '''
+    This class is used to improve a grouping solution (e.g. one created by Grouper1 or Grouper2) via
+     simulated annealing.
+    '''
+
+    def __init__(self, num_students: int, config_data: models.Configuration,
+                 console_printer: printer.GroupingConsolePrinter, rng: Optional[random.Random] = None):
+        self.config_data: models.Configuration = config_data
+        self.use_alternative_scoring: bool = config_data["prioritize_preferred_over_availability"]
+        self.console_printer: printer.GroupingConsolePrinter = console_printer
+        self.rng: random.Random = rng if rng is not None else random.Random()
+        self.time_limit: float = config_data.get("annealing_time_limit", DEFAULT_TIME_LIMIT)
+        self.max_steps: int = num_students * config_data.get("annealing_steps_per_student", DEFAULT_STEPS_PER_STUDENT)
+        self.initial_temperature: float = config_data.get(
+            "annealing_initial_temperature", DEFAULT_INITIAL_TEMPERATURE)
+        self.final_temperature: float = config_data.get(
+            "annealing_final_temperature", DEFAULT_FINAL_TEMPERATURE)
+        self.min_group_size, self.max_group_size = core.get_min_max_group_size(config_data["target_group_size"],
+                                                                               config_data["target_plus_one_allowed"],
+                                                                               config_data["target_minus_one_allowed"])
+        self.scoring_vars: models.GroupSetData = scoring.solution_scoring_vars("solution_3", config_data, num_students)
+        self.groups: list[models.GroupRecord] = []
+        self.state: group_state.GroupState
+        self.cur_sol_score: float = 0
+        self.best_solution_found: list[models.GroupRecord] = []
+        self.best_solution_score: float = 0
+        self.num_steps: int = 0
+
+    def improve_groups(self, groups: list[models.GroupRecord], cancel_event: Optional[Event] = None,
+                       deadline: Optional[float] = None) -> list[models.GroupRecord]:
+        '''
+        Improves the grouping solution via simulated annealing, returning the best solution found. The groups
+         passed in are not changed.
+
+        At each step, a random change to the solution is considered:
+            - swapping two students in different groups, or
+            - moving a student to another group, when neither group would leave the allowed group sizes
+                (the target group size, with the +1/-1 allowances from the config)
+        Only the two groups that change are rescored (see scoring.score_swap_delta/score_move_delta).
+        A change that doesn't decrease the solution's score is always made; a change that decreases it by d is
+         made with the probability exp(-d/T), so the search can leave local optima. The temperature T cools
+         exponentially from annealing_initial_temperature to annealing_final_temperature over the time limit
+         (annealing_time_limit seconds) or the step limit (annealing_steps_per_student steps per student),
+         whichever is reached first, after which the best solution found is returned. If there is a deadline
+         (a time.time() value), the time limit is the time left until the deadline instead.
+        Students that are locked into their group are not moved.
+        '''
+        self.groups = [models.GroupRecord(group.group_id, list(group.members)) for group in groups]
+        self.state = group_state.GroupState(self.groups)
+        self.cur_sol_score = scoring.score_group_state(self.state, self.scoring_vars, self.use_alternative_scoring)
+        self.__save_best_solution()
+        self.num_steps = 0
+        if len(self.groups) < 2:
+            return self.best_solution_found
+
+        time_limit: float = self.time_limit if deadline is None else deadline - time.time()
+        start: float = time.monotonic()
+        next_print: float = start
+        temperature: float = self.initial_temperature
+        while True:
+            if self.num_steps % CHECK_INTERVAL == 0:
+                now: float = time.monotonic()
+                progress: float = self.__progress(now - start, time_limit)
+                if progress >= 1 or (cancel_event and cancel_event.is_set()):
+                    break
+                temperature = self.initial_temperature * \
+                    (self.final_temperature / self.initial_temperature) ** progress
+                if now >= next_print:
+                    self.console_printer.print(
+                        f'Annealing step {self.num_steps}, best score {self.best_solution_score}')
+                    next_print = now + 1
+            self.num_steps += 1
+
+            if self.rng.random() < 0.5:
+                self.__attempt_swap(temperature)
+            else:
+                self.__attempt_move(temperature)
+
+        # Clear any final print statement in preparation for it to be overwritten
+        self.console_printer.print("")
+
+        return self.best_solution_found
+
+    def __progress(self, elapsed: float, time_limit: float) -> float:
+        '''
+        returns how far along (0 to 1) the annealing is, by time or by steps (whichever is further)
+        '''
+        if time_limit <= 0 or self.max_steps <= 0:
+            return 1
+        return max(elapsed / time_limit, self.num_steps / self.max_steps)
+
+    def __attempt_swap(self, temperature: float):
+        '''
+        considers swapping two (random) students in different (random) groups
+        '''
+        group_1, group_2 = self.rng.sample(self.groups, 2)
+        if len(group_1.members) == 0 or len(group_2.members) == 0:
+            return
+        idx_1: int = self.rng.randrange(len(group_1.members))
+        idx_2: int = self.rng.randrange(len(group_2.members))
+        if group_1.members[idx_1].lock_in_group or group_2.members[idx_2].lock_in_group:
+            return
+
+        score: float = scoring.score_swap_delta(self.state, self.scoring_vars, group_1, idx_1, group_2, idx_2,
+                                                self.use_alternative_scoring)
+        if self.__accept(score, temperature):
+            self.state.swap_students(group_1, idx_1, group_2, idx_2)
+            self.__update_score(score)
+
+    def __attempt_move(self, temperature: float):
+        '''
+        considers moving a (random) student to another (random) group, within the allowed group sizes
+        '''
+        from_group, to_group = self.rng.sample(self.groups, 2)
+        if len(from_group.members) <= self.min_group_size or len(to_group.members) >= self.max_group_size:
+            return
+        idx: int = self.rng.randrange(len(from_group.members))
+        student: models.SurveyRecord = from_group.members[idx]
+        if student.lock_in_group:
+            return
+
+        score: float = scoring.score_move_delta(self.state, self.scoring_vars, from_group, idx, to_group,
+                                                self.use_alternative_scoring)
+        if self.__accept(score, temperature):
+            from_group.members.pop(idx)
+            self.state.refresh(from_group)
+            self.state.add_student(to_group, student)
+            self.__update_score(score)
+
+    def __accept(self, score: float, temperature: float) -> bool:
+        '''
+        decides whether to make a change that results in the given solution score
+        '''
+        if score >= self.cur_sol_score:
+            return True
+        return self.rng.random() < math.exp((score - self.cur_sol_score) / temperature)
+
+    def __update_score(self, score: float):
+        '''
+        records the score of the solution after a change, saving the solution if it is the best so far
+        '''
+        self.cur_sol_score = score
+        if score > self.best_solution_score:
+            self.__save_best_solution()
+
+    def __save_best_solution(self):
+        self.best_solution_found = [models.GroupRecord(group.group_id, list(group.members)) for group in self.groups]
+        self.best_solution_score = self.cur_sol_score
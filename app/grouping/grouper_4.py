@@ -0,0 +1,201 @@
+'''
+module for a grouping algorithm implementation that improves an existing grouping solution via
+    tabu search.
+'''
+import random
+import time
+from dataclasses import dataclass
+from multiprocessing.synchronize import Event
+from typing import Optional
+from app import core, models
+from app.group import scoring, group_state
+from app.grouping import printer
+
+# defaults for the (optional) tabu search settings of the configuration
+DEFAULT_TIME_LIMIT: float = 5
+DEFAULT_ITERATIONS_PER_STUDENT: int = 20
+DEFAULT_SAMPLE_SIZE: int = 50
+DEFAULT_TENURE: int = 5
+
+# the deadline (and the cancel event) is checked after this many iterations
+CHECK_INTERVAL: int = 10
+
+
+@dataclass
+class Candidate:
+    '''
+    A change to the solution that is considered by the tabu search: a swap of the students at idx_1 in
+     group_1 and idx_2 in group_2 or, if idx_2 is None, a move of the student at idx_1 in group_1 to group_2.
+    '''
+    score: float
+    group_1: models.GroupRecord
+    idx_1: int
+    group_2: models.GroupRecord
+    idx_2: Optional[int]
+
+
+class Grouper4:
+    '''
+    This class is used to improve a grouping solution (e.g. one created by Grouper1 or Grouper2) via
+     tabu search.
+    '''
+
+    def __init__(self, num_students: int, config_data: models.Configuration,
+                 console_printer: printer.GroupingConsolePrinter, rng: Optional[random.Random] = None):
+        self.config_data: models.Configuration = config_data
+        self.use_alternative_scoring: bool = config_data["prioritize_preferred_over_availability"]
+        self.console_printer: printer.GroupingConsolePrinter = console_printer
+        self.rng: random.Random = rng if rng is not None else random.Random()
+        self.time_limit: float = config_data.get("tabu_time_limit", DEFAULT_TIME_LIMIT)
+        self.max_iterations: int = num_students * \
+            config_data.get("tabu_iterations_per_student", DEFAULT_ITERATIONS_PER_STUDENT)
+        self.sample_size: int = config_data.get("tabu_sample_size", DEFAULT_SAMPLE_SIZE)
+        self.tenure: int = config_data.get("tabu_tenure", DEFAULT_TENURE)
+        self.scoring_vars: models.GroupSetData = scoring.solution_scoring_vars("solution_3", config_data, num_students)
+        self.min_group_size, self.max_group_size = core.get_min_max_group_size(config_data["target_group_size"],
+                                                                               config_data["target_plus_one_allowed"],
+                                                                               config_data["target_minus_one_allowed"])
+        self.groups: list[models.GroupRecord] = []
+        self.state: group_state.GroupState
+        self.tabu_until: dict[str, int] = {}
+        self.group_of: dict[str, models.GroupRecord] = {}
+        self.cur_sol_score: float = 0
+        self.best_solution_found: list[models.GroupRecord] = []
+        self.best_solution_score: float = 0
+        self.num_iterations: int = 0
+
+    def improve_groups(self, groups: list[models.GroupRecord], cancel_event: Optional[Event] = None,
+                       deadline: Optional[float] = None) -> list[models.GroupRecord]:
+        '''
+        Improves the grouping solution via tabu search, returning the best solution found. The groups passed
+         in are not changed.
+
+        At each iteration, tabu_sample_size random students are each considered for another group (one that one of
+         their preferred students is in, if there is one), scoring the changes that bring them into it:
+            - swapping the student with each of the group's members, and
+            - moving the student into the group, when neither group would leave the allowed group sizes
+                (the target group size, with the +1/-1 allowances from the config)
+        Only the two groups that change are rescored (see scoring.score_swap_delta/score_move_delta).
+        The best of the changes is made, even if it decreases the solution's score, so the search walks off
+         plateaus and local optima instead of stopping at them. The students it moves are then tabu (not moved
+         again) for the next tabu_tenure iterations, so the search doesn't cycle back to the solutions it just
+         left; a change that moves a tabu student is only made if it results in the best score found so far
+         (the aspiration criterion).
+        The search stops after the time limit (tabu_time_limit seconds) or the iteration limit
+         (tabu_iterations_per_student iterations per student), whichever is reached first. If there is a deadline
+         (a time.time() value), the time limit is the time left until the deadline instead.
+        Students that are locked into their group are not moved.
+        '''
+        self.groups = [models.GroupRecord(group.group_id, list(group.members)) for group in groups]
+        self.state = group_state.GroupState(self.groups)
+        self.cur_sol_score = scoring.score_group_state(self.state, self.scoring_vars, self.use_alternative_scoring)
+        self.__save_best_solution()
+        self.tabu_until = {}
+        self.group_of = {member.student_id: group for group in self.groups for member in group.members}
+        self.num_iterations = 0
+        time_limit: float = self.time_limit if deadline is None else deadline - time.time()
+        if len(self.groups) < 2 or time_limit <= 0:
+            return self.best_solution_found
+
+        end: float = time.monotonic() + time_limit
+        next_print: float = time.monotonic()
+        while self.num_iterations < self.max_iterations:
+            if self.num_iterations % CHECK_INTERVAL == 0:
+                now: float = time.monotonic()
+                if now >= end or (cancel_event and cancel_event.is_set()):
+                    break
+                if now >= next_print:
+                    self.console_printer.print(
+                        f'Tabu search iteration {self.num_iterations}, best score {self.best_solution_score}')
+                    next_print = now + 1
+            self.num_iterations += 1
+
+            candidate: Optional[Candidate] = self.__best_admissible_candidate()
+            if candidate is not None:
+                self.__apply(candidate)
+
+        # Clear any final print statement in preparation for it to be overwritten
+        self.console_printer.print("")
+
+        return self.best_solution_found
+
+    def __best_admissible_candidate(self) -> Optional[Candidate]:
+        '''
+        scores the changes in a sample of neighborhoods, returning the best change that is not tabu (or that results
+         in the best score found so far), or None if there is no such change in the sample
+        '''
+        best: Optional[Candidate] = None
+        for _ in range(self.sample_size):
+            for candidate in self.__random_neighborhood():
+                if best is not None and candidate.score <= best.score:
+                    continue
+                if self.__is_tabu(candidate) and candidate.score <= self.best_solution_score:
+                    continue
+                best = candidate
+        return best
+
+    def __random_neighborhood(self) -> list[Candidate]:
+        '''
+        Scores the changes that bring a random student into another group: moving the student into the group
+         and swapping the student with each of the group's (unlocked) members.
+        The group is that of one of the student's preferred students when there is one in another group (so
+         the changes that can add preferred pairings are the ones that are considered), otherwise it is random.
+        '''
+        group_1: models.GroupRecord = self.rng.choice(self.groups)
+        if len(group_1.members) == 0:
+            return []
+        idx_1: int = self.rng.randrange(len(group_1.members))
+        student: models.SurveyRecord = group_1.members[idx_1]
+        if student.lock_in_group:
+            return []
+        other_groups: list[models.GroupRecord] = [self.group_of[student_id] for student_id in student.preferred_students
+                                                  if student_id in self.group_of and self.group_of[student_id] is not group_1]
+        group_2: models.GroupRecord = self.rng.choice(other_groups) if other_groups else self.rng.choice(self.groups)
+        if group_2 is group_1:
+            return []
+
+        candidates: list[Candidate] = []
+        for idx_2, member in enumerate(group_2.members):
+            if not member.lock_in_group:
+                candidates.append(Candidate(scoring.score_swap_delta(self.state, self.scoring_vars, group_1, idx_1,
+                                                                     group_2, idx_2, self.use_alternative_scoring),
+                                            group_1, idx_1, group_2, idx_2))
+        if len(group_1.members) > self.min_group_size and len(group_2.members) < self.max_group_size:
+            candidates.append(Candidate(scoring.score_move_delta(self.state, self.scoring_vars, group_1, idx_1,
+                                                                 group_2, self.use_alternative_scoring),
+                                        group_1, idx_1, group_2, None))
+        return candidates
+
+    def __is_tabu(self, candidate: Candidate) -> bool:
+        '''
+        returns whether the change moves a student that was moved within the last tabu_tenure iterations
+        '''
+        if self.tabu_until.get(candidate.group_1.members[candidate.idx_1].student_id, 0) >= self.num_iterations:
+            return True
+        return candidate.idx_2 is not None and \
+            self.tabu_until.get(candidate.group_2.members[candidate.idx_2].student_id, 0) >= self.num_iterations
+
+    def __apply(self, candidate: Candidate):
+        '''
+        makes the change, marking the students it moves as tabu
+        '''
+        student: models.SurveyRecord = candidate.group_1.members[candidate.idx_1]
+        self.tabu_until[student.student_id] = self.num_iterations + self.tenure
+        if candidate.idx_2 is None:
+            candidate.group_1.members.pop(candidate.idx_1)
+            self.state.refresh(candidate.group_1)
+            self.state.add_student(candidate.group_2, student)
+        else:
+            other: models.SurveyRecord = candidate.group_2.members[candidate.idx_2]
+            self.tabu_until[other.student_id] = self.num_iterations + self.tenure
+            self.group_of[other.student_id] = candidate.group_1
+            self.state.swap_students(candidate.group_1, candidate.idx_1, candidate.group_2, candidate.idx_2)
+
+        self.group_of[student.student_id] = candidate.group_2
+        self.cur_sol_score = candidate.score
+        if candidate.score > self.best_solution_score:
+            self.__save_best_solution()
+
+    def __save_best_solution(self):
+        self.best_solution_found = [models.GroupRecord(group.group_id, list(group.members)) for group in self.groups]
+        self.best_solution_score = self.cur_sol_score
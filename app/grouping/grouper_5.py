@@ -0,0 +1,377 @@
+'''
+module for a grouping algorithm implementation that finds the best grouping solution of a (small) section via
+    an exact branch-and-bound search, proving that it is the best.
+'''
+import time
+from multiprocessing.synchronize import Event
+from typing import Optional
+from app import core, models
+from app.data import columnar
+from app.group import scoring, scoring_alternative
+from app.grouping import printer
+
+# defaults for the (optional) exact search settings of the configuration
+DEFAULT_MAX_STUDENTS: int = 20
+DEFAULT_TIME_LIMIT: float = 10
+DEFAULT_MAX_NODES: int = 500000
+
+# the deadline (and the cancel event) is checked after this many nodes
+CHECK_INTERVAL: int = 1000
+
+
+class Grouper5:
+    '''
+    This class is used to find the best grouping solution of a section that is small enough to search
+     exhaustively (with pruning), starting from a known solution (e.g. one created by Grouper3 or Grouper4).
+    '''
+
+    def __init__(self, num_students: int, config_data: models.Configuration,
+                 console_printer: printer.GroupingConsolePrinter):
+        self.config_data: models.Configuration = config_data
+        self.use_alternative_scoring: bool = config_data["prioritize_preferred_over_availability"]
+        self.console_printer: printer.GroupingConsolePrinter = console_printer
+        self.time_limit: float = config_data.get("exact_search_time_limit", DEFAULT_TIME_LIMIT)
+        self.max_nodes: int = config_data.get("exact_search_max_nodes", DEFAULT_MAX_NODES)
+        self.scoring_vars: models.GroupSetData = scoring.solution_scoring_vars("solution_3", config_data, num_students)
+        self.min_group_size, self.max_group_size = core.get_min_max_group_size(config_data["target_group_size"],
+                                                                               config_data["target_plus_one_allowed"],
+                                                                               config_data["target_minus_one_allowed"])
+        self.columns: columnar.SurveyColumns
+        # the search's partial solution: the rows in each group and each group's membership bitset and
+        # availability mask (-1 while the group is empty), along with the rows not yet in a group
+        self.group_rows: list[list[int]] = []
+        self.membership: list[int] = []
+        self.availability: list[int] = []
+        self.unassigned: int = 0
+        self.num_disliked_pairs: int = 0
+        # rows in the order they are placed, and the students that dislike each row
+        self.order: list[int] = []
+        self.disliked_by: list[int] = []
+        # free (interchangeable) groups, in the order they are opened
+        self.free_groups: list[int] = []
+        self.num_open: int = 0
+        self.best_rows: list[list[int]] = []
+        self.best_solution_found: list[models.GroupRecord] = []
+        self.best_solution_score: float = 0
+        self.root_bound: float = 0
+        self.num_nodes: int = 0
+        self.proven_optimal: bool = False
+        self.stopped: bool = False
+        self.end: float = 0
+        self.next_print: float = 0
+        self.cancel_event: Optional[Event] = None
+
+    def improve_groups(self, groups: list[models.GroupRecord], cancel_event: Optional[Event] = None,
+                       deadline: Optional[float] = None) -> list[models.GroupRecord]:
+        '''
+        Searches for the best grouping solution with the same number of groups, returning the best solution
+         found (the solution passed in, if there is no better one). The groups passed in are not changed.
+         proven_optimal tells whether the search proved that there is no better solution.
+
+        The students are placed into groups one at a time (the ones with the most likes/dislikes among the
+         students placed before them first), trying each group with room for them. The groups are
+         interchangeable, so a student is only placed into the first of the empty groups, and every grouping
+         solution is searched at most once (rather than once per ordering of its groups).
+        A partial solution is pruned once the best score it could lead to is no better than the best score found
+         so far. That bound scores the partial solution as if (following the priorities of scoring.score_groups
+         and scoring_alternative.score_groups):
+            - no more disliked pairings are made, other than those of students that dislike (or are disliked
+                by) a member of every group they could still be placed into
+            - no group loses overlapping time slots, other than those it must lose to reach the minimum group size
+            - each student gets every preferred pairing that is still possible (with the members of the group they
+                are or could still be placed into, and the students not yet placed), up to the room left in the group
+        The search stops once every solution has been searched or pruned, or once a solution with the bound of
+         the starting (empty) partial solution is found, both of which prove that the best solution was found.
+         Otherwise, it stops after the time limit (exact_search_time_limit seconds) or the node limit
+         (exact_search_max_nodes students placed), whichever is reached first. If there is a deadline (a
+         time.time() value), the time limit is the time left until the deadline instead.
+        Students that are locked into their group are not moved.
+        '''
+        members: list[models.SurveyRecord] = [member for group in groups for member in group.members]
+        self.columns = columnar.SurveyColumns(members)
+        self.best_rows = [self.columns.rows(group.members) for group in groups]
+        self.best_solution_score = self.__score(self.best_rows)
+        self.best_solution_found = [models.GroupRecord(group.group_id, list(group.members)) for group in groups]
+        self.num_nodes = 0
+        self.proven_optimal = False
+        self.stopped = False
+        self.cancel_event = cancel_event
+        time_limit: float = self.time_limit if deadline is None else deadline - time.time()
+        if time_limit <= 0 or not self.__initialize(groups):
+            return self.best_solution_found
+
+        self.end = time.monotonic() + time_limit
+        self.next_print = time.monotonic()
+        self.root_bound = self.__upper_bound(0)
+        if self.best_solution_score < self.root_bound:
+            self.__search(0)
+        self.proven_optimal = not self.stopped or self.best_solution_score >= self.root_bound
+
+        self.best_solution_found = [
+            models.GroupRecord(group.group_id, [members[row] for row in rows])
+            for group, rows in zip(groups, self.best_rows)]
+
+        # Clear any final print statement in preparation for it to be overwritten
+        self.console_printer.print("")
+
+        return self.best_solution_found
+
+    def __initialize(self, groups: list[models.GroupRecord]) -> bool:
+        '''
+        places the locked students into their groups and orders the rest, returning False if there is no solution
+         within the allowed group sizes (the target group size, with the +1/-1 allowances from the config)
+        '''
+        num_students: int = len(self.columns)
+        if not len(groups) * self.min_group_size <= num_students <= len(groups) * self.max_group_size:
+            return False
+
+        self.group_rows = [[] for _ in groups]
+        self.membership = [0] * len(groups)
+        self.availability = [-1] * len(groups)
+        self.unassigned = (1 << num_students) - 1
+        self.num_disliked_pairs = 0
+        self.disliked_by = [0] * num_students
+        for row in range(num_students):
+            for other in self.columns.disliked(row):
+                self.disliked_by[other] |= 1 << row
+
+        for idx, group in enumerate(groups):
+            for row, member in zip(self.columns.rows(group.members), group.members):
+                if member.lock_in_group:
+                    if len(self.group_rows[idx]) == self.max_group_size:
+                        return False
+                    self.__place(row, idx)
+        self.free_groups = [idx for idx, rows in enumerate(self.group_rows) if not rows]
+        self.num_open = 0
+        self.order = self.__placement_order()
+        return True
+
+    def __placement_order(self) -> list[int]:
+        '''
+        returns the unplaced rows in the order they are placed: next is always the row with the most likes/dislikes
+         (in either direction) among the rows placed before it, then with the most likes/dislikes overall
+        '''
+        related: list[int] = [self.columns.disliked_bits[row] | self.disliked_by[row] | self.columns.preferred_bits[row]
+                              for row in range(len(self.columns))]
+        for row in range(len(self.columns)):
+            for other in self.columns.preferred(row):
+                related[other] |= 1 << row
+
+        placed: int = ((1 << len(self.columns)) - 1) & ~self.unassigned
+        remaining: list[int] = [row for row in range(len(self.columns)) if self.unassigned >> row & 1]
+        order: list[int] = []
+        while remaining:
+            row = max(remaining, key=lambda other: ((related[other] & placed).bit_count(), related[other].bit_count(), -other))
+            remaining.remove(row)
+            order.append(row)
+            placed |= 1 << row
+        return order
+
+    def __search(self, depth: int):
+        '''
+        places the row at the depth into each group it can go into, searching the solutions that follow
+        '''
+        row: int = self.order[depth]
+        for idx in self.__candidate_groups(row):
+            self.num_nodes += 1
+            if self.__limit_reached():
+                self.stopped = True
+                return
+            opened: bool = not self.group_rows[idx]
+            self.__place(row, idx)
+            if opened:
+                self.num_open += 1
+            if self.__feasible(depth + 1) and self.__upper_bound(depth + 1) > self.best_solution_score:
+                if depth + 1 == len(self.order):
+                    self.__save_best_solution()
+                else:
+                    self.__search(depth + 1)
+            if opened:
+                self.num_open -= 1
+            self.__remove(row, idx)
+            if self.stopped:
+                return
+
+    def __candidate_groups(self, row: int) -> list[int]:
+        '''
+        returns the groups the row can be placed into (those that already have members and room left, and the
+         first of the empty groups), the ones it would make the fewest disliked and most preferred pairings in first
+        '''
+        candidates: list[int] = [idx for idx, rows in enumerate(self.group_rows)
+                                 if 0 < len(rows) < self.max_group_size]
+        if self.num_open < len(self.free_groups):
+            candidates.append(self.free_groups[self.num_open])
+        preferred: int = self.columns.preferred_bits[row]
+        return sorted(candidates, key=lambda idx: (self.__disliked_pairs_with(row, idx),
+                                                   -(preferred & self.membership[idx]).bit_count()))
+
+    def __limit_reached(self) -> bool:
+        '''
+        returns whether the node limit or (checked every CHECK_INTERVAL nodes) the time limit has been reached, or the
+         search has been cancelled
+        '''
+        if self.num_nodes > self.max_nodes:
+            return True
+        if self.num_nodes % CHECK_INTERVAL != 0:
+            return False
+        if self.cancel_event and self.cancel_event.is_set():
+            return True
+        now: float = time.monotonic()
+        if now >= self.next_print:
+            self.console_printer.print(f'Exact search node {self.num_nodes}, best score {self.best_solution_score}')
+            self.next_print = now + 1
+        return now >= self.end
+
+    def __feasible(self, depth: int) -> bool:
+        '''
+        returns whether the rows left to place (from the depth on) can bring every group up to the minimum group size
+        '''
+        missing: int = sum(max(self.min_group_size - len(rows), 0) for rows in self.group_rows)
+        return missing <= len(self.order) - depth
+
+    def __upper_bound(self, depth: int) -> float:
+        '''
+        returns the best score that the partial solution (with the rows from the depth on left to place) could lead to
+        '''
+        variables: models.GroupSetData = self.scoring_vars
+        variables.num_disliked_pairs = self.num_disliked_pairs
+        variables.num_groups_no_overlap = 0
+        variables.num_preferred_pairs = 0
+        variables.num_additional_overlap = 0
+        variables.num_students_no_pref_pairs = 0
+        num_paired: int = self.__bound_placed(variables)
+        self.__bound_unplaced(depth, variables)
+        self.__bound_overlap(depth, variables)
+        variables.num_additional_pref_pairs = variables.num_preferred_pairs - num_paired
+        if self.use_alternative_scoring:
+            return scoring_alternative.score_groups(variables)
+        # "else"
+        return scoring.score_groups(variables)
+
+    def __bound_placed(self, variables: models.GroupSetData) -> int:
+        '''
+        adds the bounds of the placed rows (and their groups) to the scoring variables, returning the number of placed
+         rows that already have a preferred pairing
+        '''
+        preferred_bits: list[int] = self.columns.preferred_bits
+        num_paired: int = 0
+        for idx, rows in enumerate(self.group_rows):
+            if not rows:
+                continue
+            room: int = self.max_group_size - len(rows)
+            for row in rows:
+                num_liked: int = (preferred_bits[row] & self.membership[idx]).bit_count()
+                num_possible: int = min((preferred_bits[row] & self.unassigned).bit_count(), room)
+                variables.num_preferred_pairs += num_liked + num_possible
+                if self.columns.pref_pairing_possible[row]:
+                    if num_liked > 0:
+                        num_paired += 1
+                    elif num_possible == 0:
+                        variables.num_students_no_pref_pairs += 1
+        return num_paired
+
+    def __bound_unplaced(self, depth: int, variables: models.GroupSetData):
+        '''
+        adds the bounds of the rows left to place (from the depth on) to the scoring variables
+        '''
+        preferred_bits: list[int] = self.columns.preferred_bits
+        open_groups: list[int] = [idx for idx, rows in enumerate(self.group_rows) if len(rows) < self.max_group_size]
+        num_empty_groups: int = sum(1 for rows in self.group_rows if not rows)
+        # a row left to place could still be grouped with the members of one of the groups with room left (or an empty
+        # group), along with as many of the other rows left to place as there is room for
+        open_groups_room: list[tuple[int, int]] = [(self.membership[idx], self.max_group_size - len(self.group_rows[idx]) - 1)
+                                                   for idx in open_groups if self.group_rows[idx]]
+        if num_empty_groups > 0:
+            open_groups_room.append((0, self.max_group_size - 1))
+
+        for row in self.order[depth:]:
+            num_unplaced_preferred: int = (preferred_bits[row] & self.unassigned).bit_count()
+            num_possible: int = max(((preferred_bits[row] & membership).bit_count() + min(num_unplaced_preferred, room)
+                                     for membership, room in open_groups_room), default=0)
+            variables.num_preferred_pairs += num_possible
+            if self.columns.pref_pairing_possible[row] and num_possible == 0:
+                variables.num_students_no_pref_pairs += 1
+            if num_empty_groups == 0 and (self.columns.disliked_bits[row] or self.disliked_by[row]):
+                variables.num_disliked_pairs += min((self.__disliked_pairs_with(row, idx) for idx in open_groups), default=0)
+
+    def __bound_overlap(self, depth: int, variables: models.GroupSetData):
+        '''
+        adds the bounds of the groups' overlapping time slots to the scoring variables: a group can't gain time slots,
+         and a group that is below the minimum group size will lose the ones that none of the rows left to place (from
+         the depth on) have, and an empty group has at most the time slots shared by two of them
+        '''
+        availability: list[int] = [self.columns.availability[row] for row in self.order[depth:]]
+        empty_mask: Optional[int] = None
+        for idx, rows in enumerate(self.group_rows):
+            mask: int = self.availability[idx]
+            if not rows:
+                if empty_mask is None:
+                    empty_mask = self.__best_shared_availability(availability)
+                mask = empty_mask
+            elif len(rows) < self.min_group_size:
+                mask = max((mask & row_availability for row_availability in availability), key=int.bit_count, default=0)
+            overlap: int = mask.bit_count()
+            if overlap == 0:
+                variables.num_groups_no_overlap += 1
+            else:
+                variables.num_additional_overlap += overlap - 1
+
+    def __best_shared_availability(self, availability: list[int]) -> int:
+        '''
+        returns the most time slots that any group of the minimum group size (or of one) could share, as the time slots
+         shared by two of the given availability masks (or the largest one, if the minimum group size is below two)
+        '''
+        best: int = 0
+        for row_idx, row_availability in enumerate(availability):
+            if self.min_group_size < 2:
+                best = max(best, row_availability, key=int.bit_count)
+                continue
+            for other_availability in availability[row_idx + 1:]:
+                best = max(best, row_availability & other_availability, key=int.bit_count)
+        return best
+
+    def __place(self, row: int, idx: int):
+        '''
+        places the row into the group
+        '''
+        self.num_disliked_pairs += self.__disliked_pairs_with(row, idx)
+        self.group_rows[idx].append(row)
+        self.membership[idx] |= 1 << row
+        self.availability[idx] &= self.columns.availability[row]
+        self.unassigned &= ~(1 << row)
+
+    def __remove(self, row: int, idx: int):
+        '''
+        removes the row (the last one placed) from the group
+        '''
+        self.group_rows[idx].pop()
+        self.membership[idx] &= ~(1 << row)
+        self.num_disliked_pairs -= self.__disliked_pairs_with(row, idx)
+        self.availability[idx] = -1
+        for other in self.group_rows[idx]:
+            self.availability[idx] &= self.columns.availability[other]
+        self.unassigned |= 1 << row
+
+    def __disliked_pairs_with(self, row: int, idx: int) -> int:
+        '''
+        returns the number of disliked pairings (in either direction) between the row and the members of the group
+        '''
+        return ((self.columns.disliked_bits[row] & self.membership[idx]).bit_count() +
+                (self.disliked_by[row] & self.membership[idx]).bit_count())
+
+    def __score(self, group_rows: list[list[int]]) -> float:
+        '''
+        returns the score of the grouping solution (given as the rows of each group)
+        '''
+        return scoring.score_solution_stats([self.columns.group_stats(rows) for rows in group_rows],
+                                            self.scoring_vars, self.use_alternative_scoring)
+
+    def __save_best_solution(self):
+        score: float = self.__score(self.group_rows)
+        if score <= self.best_solution_score:
+            return
+        self.best_rows = [list(rows) for rows in self.group_rows]
+        self.best_solution_score = score
+        if score >= self.root_bound:
+            # no solution can score better, so the search can stop
+            self.stopped = True
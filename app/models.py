@@ -5,6 +5,7 @@ import datetime as dt
 from multiprocessing import synchronize
 from typing import TypedDict, Optional, ClassVar
 from app.grouping import printer
+from app.file import csv_spool
 
 
 @dataclass
@@ -61,7 +62,7 @@ class Configuration(TypedDict):
     prioritize_preferred_over_availability: bool
 
 
-@dataclass
+@dataclass(slots=True)
 class SurveyRecord:
     """Data class that describes a single record in the survey dataset"""
     student_id: str
@@ -73,8 +74,8 @@ class SurveyRecord:
     preferred_students: list[str] = field(default_factory=list)
     disliked_students: list[str] = field(default_factory=list)
     availability: dict[str, list[str]] = field(default_factory=dict)
-    okay_with_rank = 0
-    avail_rank = 0
+    okay_with_rank: int = field(default=0, compare=False, repr=False)
+    avail_rank: int = field(default=0, compare=False, repr=False)
     has_matching_availability: bool = True
     provided_availability: bool = True
     provided_survey_data: bool = True
@@ -82,22 +83,67 @@ class SurveyRecord:
     pref_pairing_possible: bool = True
     group_id: str = ""
     lock_in_group: bool = False
+    # bitmask over (availability field x weekday), built once by validate.user_availability_mask()
+    availability_mask: Optional[int] = field(default=None, compare=False, repr=False)
+    # dense integer index of the student, built by load.index_survey_records() (or on first use by validate)
+    student_idx: Optional[int] = field(default=None, compare=False, repr=False)
+    # generation of the student indices the student was indexed in (see validate.check_index_generation)
+    index_generation: Optional[int] = field(default=None, compare=False, repr=False)
+    # rows of the like/dislike adjacency matrices: bit j is set if the student prefers/dislikes
+    # the student with index j
+    preferred_bits: Optional[int] = field(default=None, compare=False, repr=False)
+    disliked_bits: Optional[int] = field(default=None, compare=False, repr=False)
 
     def __lt__(self, other):
         return self.okay_with_rank + self.avail_rank < other.okay_with_rank + other.avail_rank
 
 
+@dataclass
+class DuplicateSubmission:
+    """Data class that describes a duplicate survey submission that was resolved when loading the survey"""
+    student_id: str
+    # submission date of the record that was kept (the latest) and of the one that was discarded
+    kept_submission_date: dt.datetime
+    discarded_submission_date: dt.datetime
+
+
+@dataclass
+class RosterReconciliation:
+    """Data class that describes the result of reconciling the survey records with the class roster"""
+    # survey records of students on the roster (in survey order)
+    kept: list[SurveyRecord] = field(default_factory=list)
+    # new records for students on the roster that did not provide survey data (in roster order)
+    added: list[SurveyRecord] = field(default_factory=list)
+    # survey records of students that are not on the roster
+    removed: list[SurveyRecord] = field(default_factory=list)
+
+
 @dataclass
 class SurveyData:
     """
     Data class for survey data loaded when reading in the raw survey file. 
     This holds both the raw csv rows from the file and the list of survey records 
+    It can be used as a context manager, which closes the raw rows on exit.
     """
     records: list[SurveyRecord]
-    raw_rows: list[list[str]]
+    raw_rows: list[list[str]] | csv_spool.SpooledRows | csv_spool.CsvFileRows
+    duplicates: list[DuplicateSubmission] = field(default_factory=list)
 
+    def close(self):
+        '''
+        closes the spooled raw rows (if any), once they are no longer needed
+        '''
+        if isinstance(self.raw_rows, csv_spool.SpooledRows):
+            self.raw_rows.close()
 
-@dataclass
+    def __enter__(self) -> 'SurveyData':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+@dataclass(slots=True)
 class GroupRecord:
     '''
     Class that holds group infomation for a single group
@@ -129,6 +175,21 @@ class GroupSetData:
     num_additional_pref_pairs: int = 0
 
 
+@dataclass(slots=True)
+class GroupStats:
+    '''
+    Class that holds the scoring inputs of a single group, as maintained by group_state.GroupState
+    '''
+    num_members: int = 0
+    membership: int = 0  # bitset of the members' student indices
+    availability_mask: int = 0
+    num_disliked_pairs: int = 0
+    num_preferred_pairs: int = 0
+    # students that could have a preferred pair but do not
+    num_students_no_pref_pairs: int = 0
+    num_students_pref_pair_not_possible: int = 0
+
+
 @dataclass
 class Scenario:
     '''
@@ -166,6 +227,16 @@ class NoSurveyGroupMethodConsts:
     GROUP_TOGETHER: ClassVar[int] = 2
 
 
+@dataclass
+class RefinementMethodConsts:
+    '''
+    Data class for storing constants representing the valid methods that can be used
+     to refine (improve) the second grouping algorithm's solution into the third solution.
+    '''
+    SIMULATED_ANNEALING: ClassVar[int] = 0
+    TABU_SEARCH: ClassVar[int] = 1
+
+
 @dataclass
 class GroupAvailabilityMap:
     '''
@@ -195,7 +266,10 @@ class AvailabilityMap:
 class ManagedGroupingVars:
     '''
     data structure that holds the necessary inter-process managed
-    variables related to the grouping process
+    variables related to the grouping process, and the deadline (a time.time()
+    value) and the seed of the grouping, if there are
     '''
     grouping_cancel_event: synchronize.Event
     grouping_console_printer: printer.GroupingConsolePrinter
+    grouping_deadline: Optional[float] = None
+    grouping_seed: Optional[int] = None
@@ -0,0 +1,62 @@
+from app import models
+from app.data import columnar
+from app.group import group_state, scoring, validate
+
+
+def __build_groups() -> list[models.GroupRecord]:
+    group_1 = models.GroupRecord("1", [
+        models.SurveyRecord(student_id="column1", preferred_students=["column2", "unknown"], disliked_students=["column4"],
+                            availability={"1": ['monday', 'tuesday'], "2": ['friday']}),
+        models.SurveyRecord(student_id="column2", preferred_students=["column1"],
+                            availability={"1": ['monday'], "2": ['friday']}),
+        models.SurveyRecord(student_id="column3", preferred_students=["column5"], disliked_students=["column1"],
+                            availability={"1": ['tuesday'], "2": []}, pref_pairing_possible=False),
+    ])
+    group_2 = models.GroupRecord("2", [
+        models.SurveyRecord(student_id="column4", preferred_students=["column6"],
+                            availability={"1": ['tuesday'], "2": ['friday']}),
+        models.SurveyRecord(student_id="column5", disliked_students=["column6"],
+                            availability={"1": ['tuesday'], "2": []}),
+        models.SurveyRecord(student_id="column6", preferred_students=["column4"],
+                            availability={"1": ['tuesday'], "2": ['friday']}),
+    ])
+    return [group_1, group_2]
+
+
+def test_survey_columns():
+    groups = __build_groups()
+    columns = columnar.SurveyColumns([member for group in groups for member in group.members])
+
+    assert len(columns) == 6
+    assert columns.row_by_id["column4"] == 3
+    # preferred students that are not in the survey are left out
+    assert list(columns.preferred(0)) == [1]
+    assert list(columns.disliked(2)) == [0]
+    assert list(columns.preferred_offsets) == [0, 1, 2, 3, 4, 4, 5]
+    assert list(columns.pref_pairing_possible) == [1, 1, 0, 1, 1, 1]
+
+
+def test_survey_columns_match_records():
+    groups = __build_groups()
+    columns = columnar.SurveyColumns([member for group in groups for member in group.members])
+    group_rows = [columns.rows(group.members) for group in groups]
+
+    for group, rows in zip(groups, group_rows):
+        expected = group_state.compute_group_stats(group.members)
+        stats = columns.group_stats(rows)
+        assert (stats.num_members, stats.num_disliked_pairs, stats.num_preferred_pairs,
+                stats.num_students_no_pref_pairs, stats.num_students_pref_pair_not_possible) == \
+            (expected.num_members, expected.num_disliked_pairs, expected.num_preferred_pairs,
+             expected.num_students_no_pref_pairs, expected.num_students_pref_pair_not_possible)
+        assert stats.availability_mask.bit_count() == expected.availability_mask.bit_count()
+
+    assert columns.total_disliked_pairings(group_rows) == validate.total_disliked_pairings(groups)
+    assert columns.total_liked_pairings(group_rows) == validate.total_liked_pairings(groups)
+    assert columns.total_students_no_preferred_pair(group_rows) == validate.total_students_no_preferred_pair(groups)
+    assert columns.total_groups_no_availability(group_rows) == validate.total_groups_no_availability(groups)
+
+    for use_alternative_scoring in [False, True]:
+        set_vars = models.GroupSetData("group_solution", 3, 2, 6, 2)
+        expected_score = scoring.score_group_state(group_state.GroupState(groups), set_vars, use_alternative_scoring)
+        assert scoring.score_solution_stats([columns.group_stats(rows) for rows in group_rows],
+                                            set_vars, use_alternative_scoring) == expected_score
@@ -3,6 +3,9 @@ Tests reading in a configuration file
 '''
 # Note: Only verification of the group size parameter is specifically covered here at this time.
 
+import json
+from io import StringIO
+import pytest
 from app import config
 from app.models import Configuration
 
@@ -100,3 +103,24 @@ def test_read_report_config_3():
     assert list.get("show_disliked_students") == True
     assert list.get("show_availability_overlap") == True
     assert list.get("show_scores") == True
+
+
+def test_config_invalid_refinement_method():
+    '''
+    Config with a refinement method that doesn't exist.
+    '''
+    text_buffer = StringIO()
+    text_buffer.write(json.dumps({"target_group_size": 5, "refinement_method": 2}))
+    with pytest.raises(ValueError):
+        config.read_json_from_io(text_buffer)
+
+
+def test_config_invalid_time_limit():
+    '''
+    Config with a time limit that isn't a positive number.
+    '''
+    for time_limit in [0, -5, "60", True]:
+        text_buffer = StringIO()
+        text_buffer.write(json.dumps({"target_group_size": 5, "time_limit": time_limit}))
+        with pytest.raises(ValueError):
+            config.read_json_from_io(text_buffer)
@@ -2,6 +2,7 @@
 Tests general core grouping functionality
 '''
 
+import time
 from app import models
 from app import core
 
@@ -277,4 +278,23 @@ def test_get_min_max_num_groups_3():
     max = output[1]
 
     assert min == 2
-    assert max == 2
\ No newline at end of file
+    assert max == 2
+
+
+def test_get_min_max_group_size():
+    '''
+    The group sizes allowed around the target group size.
+    '''
+    assert core.get_min_max_group_size(5, False, False) == [5, 5]
+    assert core.get_min_max_group_size(5, True, False) == [5, 6]
+    assert core.get_min_max_group_size(5, False, True) == [4, 5]
+    assert core.get_min_max_group_size(5, True, True) == [4, 6]
+
+
+def test_past_deadline():
+    '''
+    A deadline that has passed, one that hasn't, and no deadline.
+    '''
+    assert core.past_deadline(time.time() - 1)
+    assert not core.past_deadline(time.time() + 60)
+    assert not core.past_deadline(None)
@@ -231,3 +231,88 @@ def test_group_adheres_to_target_size_1():
         assert len(solution)-len(groups_with_5_members) == 1
 
     os.remove(f'./tests/test_files/survey_results/{survey_file}_report.xlsx')
+
+
+def test_group_time_limit():
+    '''
+    Test of grouping 12 students with a time limit too short for all the grouping passes. Every student
+    should still be grouped.
+    '''
+    response = runner.invoke(group.group, [
+        './tests/test_files/survey_results/test_group_1.csv', '--configfile', './tests/test_files/configs/test_group_1_config.json',
+        '--time-limit', '0.5'])
+    assert response.exit_code == 0
+
+    expected_students = ['jsmith1', 'jdoe2',
+                         'mmuster3', 'jschmo4', 'bwillia5', 'mbrown6', 'charles7', 'carl8', 'elee9', 'cred10', 'bobbylee11', 'jrogan12']
+    verify_groups('./tests/test_files/survey_results/test_group_1_report.xlsx', 3, 3, expected_students)
+
+    os.remove(
+        './tests/test_files/survey_results/test_group_1_report.xlsx')
+
+
+def test_group_callback_without_time_limit():
+    '''
+    Test of calling the group command's callback directly (as the guide does) without a time limit or seed.
+    '''
+    group.group.callback('./tests/test_files/survey_results/test_group_1.csv',
+                         './tests/test_files/configs/test_group_1_config.json', None, None, None)
+
+    assert os.path.exists('./tests/test_files/survey_results/test_group_1_report.xlsx')
+    os.remove(
+        './tests/test_files/survey_results/test_group_1_report.xlsx')
+
+
+def test_group_invalid_time_limit():
+    '''
+    Test of grouping with a time limit that isn't positive.
+    '''
+    response = runner.invoke(group.group, [
+        './tests/test_files/survey_results/test_group_1.csv', '--configfile', './tests/test_files/configs/test_group_1_config.json',
+        '--time-limit', '0'])
+    assert response.exit_code != 0
+    assert not os.path.exists('./tests/test_files/survey_results/test_group_1_report.xlsx')
+
+
+def test_group_seed():
+    '''
+    Test of grouping the same students twice with the same seed. The solutions should be the same.
+    '''
+    solutions: list[list[list[list[str]]]] = []
+    for run in range(2):
+        report_filename = f'./tests/test_files/survey_results/test_group_seed_{run}_report.xlsx'
+        response = runner.invoke(group.group, [
+            './tests/test_files/survey_results/Example_Survey_Results_2.csv', '--configfile', './tests/test_files/configs/config_1.json',
+            '--reportfile', report_filename, '--seed', '3'])
+        assert response.exit_code == 0
+
+        config_data: models.Configuration = config.read_report_config(report_filename)
+        survey_data = load.read_report_survey_data(report_filename, config_data['field_mappings'])
+        solutions.append([[[member.student_id for member in group.members] for group in solution]
+                          for solution in load.read_report_groups(report_filename, survey_data.records)])
+        os.remove(report_filename)
+
+    assert solutions[0] == solutions[1]
+
+
+def test_algorithm_rng():
+    '''
+    The same seed should give each algorithm the same generator every time, but a different one than
+    the other algorithms.
+    '''
+    assert group.algorithm_rng(3, "grouper_1").random() == group.algorithm_rng(3, "grouper_1").random()
+    assert group.algorithm_rng(3, "grouper_1").random() != group.algorithm_rng(3, "grouper_2").random()
+    assert group.algorithm_rng(3, "grouper_1").random() != group.algorithm_rng(4, "grouper_1").random()
+
+
+def test_group_exact_search():
+    '''
+    Test of grouping a section small enough for the exact search, which should prove that the third solution is optimal.
+    '''
+    report_filename = './tests/test_files/survey_results/test_group_exact_search_report.xlsx'
+    response = runner.invoke(group.group, [
+        './tests/test_files/survey_results/Example_Survey_Results_16.csv', '--configfile', './tests/test_files/configs/config_16.json',
+        '--reportfile', report_filename])
+    assert response.exit_code == 0
+    assert 'solution 3 is optimal (proven by the exact search)' in response.output
+    os.remove(report_filename)
@@ -0,0 +1,98 @@
+from app import models
+from app.group import group_state, validate
+
+
+def __build_groups() -> list[models.GroupRecord]:
+    group_1 = models.GroupRecord("1", [
+        models.SurveyRecord(student_id="state1", preferred_students=["state2"], disliked_students=["state4"],
+                            availability={"1": ['monday', 'tuesday'], "2": ['friday']}),
+        models.SurveyRecord(student_id="state2", preferred_students=["state1"],
+                            availability={"1": ['monday'], "2": ['friday']}),
+        models.SurveyRecord(student_id="state3", preferred_students=["state5"], disliked_students=["state1"],
+                            availability={"1": ['tuesday'], "2": []}),
+    ])
+    group_2 = models.GroupRecord("2", [
+        models.SurveyRecord(student_id="state4", preferred_students=["state6"],
+                            availability={"1": ['tuesday'], "2": ['friday']}),
+        models.SurveyRecord(student_id="state5", disliked_students=["state6"],
+                            availability={"1": ['tuesday'], "2": []}),
+        models.SurveyRecord(student_id="state6", preferred_students=["state4"],
+                            availability={"1": ['tuesday'], "2": ['friday']}),
+    ])
+    return [group_1, group_2]
+
+
+def __assert_state_matches(state: group_state.GroupState, groups: list[models.GroupRecord]):
+    assert state.num_disliked_pairs == validate.total_disliked_pairings(groups)
+    assert state.num_preferred_pairs == validate.total_liked_pairings(groups)
+    assert state.num_groups_no_overlap == validate.total_groups_no_availability(groups)
+    assert state.num_students_no_pref_pairs == validate.total_students_no_preferred_pair(groups)
+    assert state.num_additional_overlap == sum(
+        max(validate.availability_overlap_count(group) - 1, 0) for group in groups)
+
+
+def test_group_state_totals():
+    groups = __build_groups()
+    state = group_state.GroupState(groups)
+
+    assert state.num_students == 6
+    assert state.num_disliked_pairs == 2
+    assert state.num_preferred_pairs == 4
+    assert state.num_groups_no_overlap == 1
+    __assert_state_matches(state, groups)
+
+
+def test_group_state_swap_and_revert():
+    groups = __build_groups()
+    state = group_state.GroupState(groups)
+
+    # swap state3 and state4
+    state.swap_students(groups[0], 2, groups[1], 0)
+    assert groups[0].members[2].student_id == "state4"
+    __assert_state_matches(state, groups)
+
+    state.swap_students(groups[0], 2, groups[1], 0)
+    assert groups[0].members[2].student_id == "state3"
+    assert state.num_disliked_pairs == 2
+    __assert_state_matches(state, groups)
+
+
+def test_group_state_add_remove():
+    groups = __build_groups()
+    state = group_state.GroupState(groups)
+
+    student = groups[1].members[1]
+    state.remove_student(groups[1], student)
+    state.add_student(groups[0], student)
+
+    assert len(groups[0].members) == 4
+    assert state.stats(groups[1]).num_members == 2
+    __assert_state_matches(state, groups)
+
+
+def test_group_view_stats_with():
+    groups = __build_groups()
+    for group in groups:
+        for idx, student in enumerate(group.members):
+            others = group.members[:idx] + group.members[idx + 1:]
+            for other_group in groups:
+                for member in other_group.members:
+                    if member in others:
+                        continue
+                    view = group_state.GroupView(others)
+                    assert view.stats_with(member) == group_state.compute_group_stats(others + [member])
+
+
+def test_group_view_stats_swapped():
+    groups = __build_groups()
+    groups[1].members.append(models.SurveyRecord(student_id="state7", preferred_students=["state5"],
+                                                 pref_pairing_possible=False, availability={"1": ['tuesday']}))
+    for group in groups:
+        view = group_state.GroupView(group.members)
+        for pos in range(len(group.members)):
+            for other_group in groups:
+                if other_group is group:
+                    continue
+                for student in other_group.members:
+                    members = group.members[:pos] + group.members[pos + 1:] + [student]
+                    assert view.stats_swapped(pos, student) == group_state.compute_group_stats(members)
@@ -0,0 +1,77 @@
+import time
+from app import config, core, models
+from app.data import load
+from app.group import validate
+from app.grouping import grouper_1, printer
+
+
+def __load() -> tuple[models.Configuration, list[models.SurveyRecord], int]:
+    config_data: models.Configuration = config.read_json("./tests/test_files/configs/config_1_full.json")
+    survey_data = load.read_survey(
+        config_data['field_mappings'], './tests/test_files/survey_results/Example_Survey_Results_1_full.csv')
+    num_groups = core.get_min_max_num_groups(
+        survey_data.records, config_data["target_group_size"], config_data["target_plus_one_allowed"],
+        config_data["target_minus_one_allowed"])[0]
+    return config_data, survey_data.records, num_groups
+
+
+def test_create_pass_seed():
+    '''
+    Passes made with the same seed should make the same random choices, and so find the same solution.
+    '''
+    config_data, records, num_groups = __load()
+
+    solutions: list[list[list[str]]] = []
+    for _ in range(2):
+        grouper = grouper_1.Grouper1(records, config_data, num_groups, printer.GroupingConsolePrinter())
+        grouper.create_pass(0, 42)
+        solutions.append([[member.student_id for member in group.members] for group in grouper.best_solution_found])
+
+    assert solutions[0] == solutions[1]
+    assert sum(len(group) for group in solutions[0]) == len(records)
+
+
+def test_create_pass_past_deadline():
+    '''
+    Only the first pass should be made once the deadline has passed.
+    '''
+    config_data, records, num_groups = __load()
+
+    grouper = grouper_1.Grouper1(records, config_data, num_groups, printer.GroupingConsolePrinter())
+    grouper.create_pass(1, 42, None, time.time())
+    assert grouper.best_solution_found == []
+
+    grouper.create_pass(0, 42, None, time.time())
+    assert len(validate.verify_all_users_grouped(records, grouper.best_solution_found)) == 0
+
+
+def test_finish_groups():
+    '''
+    Finishing the best of the passes' solutions should not make it worse, and should keep every student grouped.
+    '''
+    config_data, records, num_groups = __load()
+
+    best: grouper_1.Grouper1 = grouper_1.Grouper1(records, config_data, num_groups, printer.GroupingConsolePrinter())
+    for grouping_pass in range(3):
+        grouper = grouper_1.Grouper1(records, config_data, num_groups, printer.GroupingConsolePrinter())
+        grouper.create_pass(grouping_pass, grouping_pass)
+        if not best.best_solution_found or grouper_1.is_better_solution(
+                grouper.best_solution_score, grouper.best_solution_std_dev,
+                best.best_solution_score, best.best_solution_std_dev):
+            best = grouper
+
+    pass_score: float = best.best_solution_score
+    best.finish_groups()
+
+    assert best.best_solution_score >= pass_score
+    assert len(validate.verify_all_users_grouped(records, best.best_solution_found)) == 0
+
+
+def test_is_better_solution():
+    '''
+    A higher score is better, with the same score a lower standard deviation is better.
+    '''
+    assert grouper_1.is_better_solution(2.0, 5.0, 1.0, 1.0)
+    assert not grouper_1.is_better_solution(1.0, 0.0, 2.0, 1.0)
+    assert grouper_1.is_better_solution(1.0, 0.5, 1.0, 1.0)
+    assert not grouper_1.is_better_solution(1.0, 1.0, 1.0, 1.0)
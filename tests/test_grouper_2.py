@@ -316,3 +316,32 @@ def test_add_student_to_group_too_many_students(capfd):
     assert ('unable to group student with id: 11') in out
     assert len(group_1.members) == 5
     assert len(group_2.members) == 5
+
+
+def test_swap_members_and_rate_leaves_groups_unchanged():
+    '''
+    This test verifies that the swap scenarios are rated without changing the groups, and that each
+        scenario holds the members of both groups after the swap.
+    '''
+    students = __initialize_students(4)
+    students[0].disliked_students = ["2"]
+    for student in students:
+        student.availability = {"1": ["monday"]}
+
+    configuration["target_group_size"] = 2
+    group_1: models.GroupRecord = models.GroupRecord("1", students[0:2])
+    group_2: models.GroupRecord = models.GroupRecord("2", students[2:4])
+
+    grouper2 = grouper_2.Grouper2(
+        students, configuration, 2, printer.GroupingConsolePrinter())
+    grouper2.groups = [group_1, group_2]
+
+    scenarios = grouper2.swap_members_and_rate(students[0], group_1, group_2)
+
+    assert [member.student_id for member in group_1.members] == ["1", "2"]
+    assert [member.student_id for member in group_2.members] == ["3", "4"]
+    assert len(scenarios) == 2
+    assert [member.student_id for member in scenarios[0].group_1.members] == ["2", "3"]
+    assert [member.student_id for member in scenarios[0].group_2.members] == ["4", "1"]
+    assert not grouper_2.meets_hard_requirement(students[1], models.GroupRecord("3", [students[0]]), 2, False)
+    assert grouper_2.meets_hard_requirement(students[2], models.GroupRecord("3", [students[0]]), 2, False)
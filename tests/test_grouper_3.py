@@ -0,0 +1,82 @@
+import random
+import time
+from app import config
+from app import models
+from app.group import group_state, scoring
+from app.grouping import grouper_3, printer
+
+
+def __configuration() -> models.Configuration:
+    configuration: models.Configuration = config.read_json('./tests/test_files/configs/config_1.json')
+    configuration["target_group_size"] = 3
+    configuration["target_minus_one_allowed"] = True
+    configuration["target_plus_one_allowed"] = True
+    configuration["annealing_steps_per_student"] = 500
+    return configuration
+
+
+def __initialize_groups() -> list[models.GroupRecord]:
+    '''
+    Creates 3 groups of 3 in which each student prefers the students that are in the "next" group, so the
+     preferred pairings only come from regrouping the students.
+    '''
+    slot = "Please choose times that are good for your team to meet. Times are in the Phoenix, AZ time zone! [0:00 AM - 3:00 AM]"
+    students = [models.SurveyRecord(student_id=str(i), availability={slot: ['monday']}) for i in range(9)]
+    for i, student in enumerate(students):
+        student.preferred_students = [str((i + 3) % 9)]
+        student.disliked_students = [str((i + 1) % 9)] if i % 3 == 0 else []
+    return [models.GroupRecord(str(i + 1), students[i * 3:i * 3 + 3]) for i in range(3)]
+
+
+def test_improve_groups():
+    '''
+    The annealing should return a solution at least as good as the one it starts from, within the allowed
+     group sizes and with every student in exactly one group, without changing the groups passed in.
+    '''
+    configuration = __configuration()
+    groups = __initialize_groups()
+    original = [[member.student_id for member in group.members] for group in groups]
+
+    grouper3 = grouper_3.Grouper3(9, configuration, printer.GroupingConsolePrinter(), random.Random(4))
+    initial_score = scoring.score_group_state(group_state.GroupState(groups), grouper3.scoring_vars, False)
+    solution = grouper3.improve_groups(groups)
+
+    assert [[member.student_id for member in group.members] for group in groups] == original
+    assert grouper3.num_steps <= 9 * 500
+    assert grouper3.best_solution_score >= initial_score
+    assert grouper3.best_solution_score == scoring.score_group_state(
+        group_state.GroupState(solution), grouper3.scoring_vars, False)
+    assert all(2 <= len(group.members) <= 4 for group in solution)
+    assert sorted(member.student_id for group in solution for member in group.members) == \
+        sorted(str(i) for i in range(9))
+
+
+def test_improve_groups_locked_students():
+    '''
+    Students that are locked into their group should stay there.
+    '''
+    configuration = __configuration()
+    groups = __initialize_groups()
+    for group in groups:
+        group.members[0].lock_in_group = True
+
+    grouper3 = grouper_3.Grouper3(9, configuration, printer.GroupingConsolePrinter(), random.Random(7))
+    solution = grouper3.improve_groups(groups)
+
+    for group, solution_group in zip(groups, solution):
+        assert group.members[0] in solution_group.members
+
+
+def test_improve_groups_past_deadline():
+    '''
+    With a deadline that has already passed, the solution should be returned unchanged.
+    '''
+    configuration = __configuration()
+    groups = __initialize_groups()
+
+    grouper3 = grouper_3.Grouper3(9, configuration, printer.GroupingConsolePrinter(), random.Random(4))
+    solution = grouper3.improve_groups(groups, None, time.time())
+
+    assert grouper3.num_steps == 0
+    assert [[member.student_id for member in group.members] for group in solution] == \
+        [[member.student_id for member in group.members] for group in groups]
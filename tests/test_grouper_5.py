@@ -0,0 +1,138 @@
+import itertools
+import random
+import time
+from app import config, core
+from app import models
+from app.data import columnar
+from app.group import scoring
+from app.grouping import grouper_5, printer
+
+SLOTS = ["Please choose times that are good for your team to meet. Times are in the Phoenix, AZ time zone! [0:00 AM - 3:00 AM]",
+         "Please choose times that are good for your team to meet. Times are in the Phoenix, AZ time zone! [3:00 AM - 6:00 AM]"]
+
+
+def __configuration(use_alternative_scoring: bool = False) -> models.Configuration:
+    configuration: models.Configuration = config.read_json('./tests/test_files/configs/config_1.json')
+    configuration["target_group_size"] = 3
+    configuration["target_minus_one_allowed"] = True
+    configuration["target_plus_one_allowed"] = True
+    configuration["prioritize_preferred_over_availability"] = use_alternative_scoring
+    return configuration
+
+
+def __initialize_groups() -> list[models.GroupRecord]:
+    '''
+    Creates 3 groups of 3 in which each student prefers the students that are in the "next" group, so the
+     preferred pairings only come from regrouping the students.
+    '''
+    students = [models.SurveyRecord(student_id=str(i), availability={SLOTS[0]: ['monday']}) for i in range(9)]
+    for i, student in enumerate(students):
+        student.preferred_students = [str((i + 3) % 9)]
+        student.disliked_students = [str((i + 1) % 9)] if i % 3 == 0 else []
+    return [models.GroupRecord(str(i + 1), students[i * 3:i * 3 + 3]) for i in range(3)]
+
+
+def __random_groups(rng: random.Random) -> list[models.GroupRecord]:
+    '''
+    Puts 8 students with random preferences, dislikes and availability into 3 groups.
+    '''
+    students = [models.SurveyRecord(student_id=str(i), availability={
+        slot: [day for day in ['monday', 'tuesday', 'wednesday'] if rng.random() < 0.5] for slot in SLOTS})
+        for i in range(8)]
+    for student in students:
+        others = [other.student_id for other in students if other is not student]
+        student.preferred_students = rng.sample(others, rng.randint(0, 2))
+        student.disliked_students = rng.sample(others, rng.randint(0, 1))
+    return [models.GroupRecord(str(i + 1), students[i::3]) for i in range(3)]
+
+
+def __best_score(groups: list[models.GroupRecord], configuration: models.Configuration) -> float:
+    '''
+    returns the best score of any grouping of the students into as many groups (within the allowed group sizes),
+     by trying every one
+    '''
+    members = [member for group in groups for member in group.members]
+    columns = columnar.SurveyColumns(members)
+    min_size, max_size = core.get_min_max_group_size(configuration["target_group_size"],
+                                                     configuration["target_plus_one_allowed"],
+                                                     configuration["target_minus_one_allowed"])
+    scoring_vars = scoring.solution_scoring_vars("solution_3", configuration, len(members))
+    best_score = None
+    for labels in itertools.product(range(len(groups)), repeat=len(members)):
+        group_rows = [[row for row, label in enumerate(labels) if label == idx] for idx in range(len(groups))]
+        if all(min_size <= len(rows) <= max_size for rows in group_rows):
+            score = scoring.score_solution_stats([columns.group_stats(rows) for rows in group_rows], scoring_vars,
+                                                 configuration["prioritize_preferred_over_availability"])
+            best_score = score if best_score is None else max(best_score, score)
+    return best_score
+
+
+def test_improve_groups():
+    '''
+    The exact search should find (and prove) the best solution, in which each student is with their preferred student,
+     without changing the groups passed in.
+    '''
+    configuration = __configuration()
+    groups = __initialize_groups()
+    original = [[member.student_id for member in group.members] for group in groups]
+
+    grouper5 = grouper_5.Grouper5(9, configuration, printer.GroupingConsolePrinter())
+    solution = grouper5.improve_groups(groups)
+
+    assert [[member.student_id for member in group.members] for group in groups] == original
+    assert grouper5.proven_optimal
+    assert sorted(sorted(member.student_id for member in group.members) for group in solution) == \
+        [['0', '3', '6'], ['1', '4', '7'], ['2', '5', '8']]
+    assert [group.group_id for group in solution] == ['1', '2', '3']
+
+
+def test_improve_groups_best_score():
+    '''
+    The exact search should find the best score of every grouping of the students, with either scoring.
+    '''
+    rng = random.Random(5)
+    for use_alternative_scoring in [False, True]:
+        configuration = __configuration(use_alternative_scoring)
+        for _ in range(3):
+            groups = __random_groups(rng)
+
+            grouper5 = grouper_5.Grouper5(8, configuration, printer.GroupingConsolePrinter())
+            solution = grouper5.improve_groups(groups)
+
+            assert grouper5.proven_optimal
+            assert grouper5.best_solution_score == __best_score(groups, configuration)
+            assert sorted(member.student_id for group in solution for member in group.members) == \
+                sorted(str(i) for i in range(8))
+
+
+def test_improve_groups_locked_students():
+    '''
+    Students that are locked into their group should stay there.
+    '''
+    configuration = __configuration()
+    groups = __initialize_groups()
+    for group in groups:
+        group.members[0].lock_in_group = True
+
+    grouper5 = grouper_5.Grouper5(9, configuration, printer.GroupingConsolePrinter())
+    solution = grouper5.improve_groups(groups)
+
+    assert grouper5.proven_optimal
+    for group, solution_group in zip(groups, solution):
+        assert group.members[0] in solution_group.members
+
+
+def test_improve_groups_past_deadline():
+    '''
+    With a deadline that has already passed, the solution should be returned unchanged (and not proven optimal).
+    '''
+    configuration = __configuration()
+    groups = __initialize_groups()
+
+    grouper5 = grouper_5.Grouper5(9, configuration, printer.GroupingConsolePrinter())
+    solution = grouper5.improve_groups(groups, None, time.time())
+
+    assert not grouper5.proven_optimal
+    assert grouper5.num_nodes == 0
+    assert [[member.student_id for member in group.members] for group in solution] == \
+        [[member.student_id for member in group.members] for group in groups]
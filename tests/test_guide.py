@@ -2,6 +2,7 @@ import os
 import shutil
 from click.testing import CliRunner
 from unittest.mock import patch
+from openpyxl import load_workbook
 from app.commands import cli
 
 runner = CliRunner()
@@ -27,7 +28,8 @@ def test_group_command(mock_group):
     assert 'Enter the path to the config file' in result.output
     assert not 'Enter the path to the existing report file' in result.output
     assert not 'Enter the path to the file containing all student IDs' in result.output
-    assert mock_group.called_with('tests/test_files/dev_data/dataset-dev.csv', 'tests/test_files/dev_data/config-dev.json', None, None)
+    mock_group.callback.assert_called_once_with('tests/test_files/dev_data/dataset-dev.csv',
+                                                'tests/test_files/dev_data/config-dev.json', None, None)
 
 @patch('app.commands.report.update_report')
 def test_update_report_command(mock_update_report):
@@ -38,7 +40,7 @@ def test_update_report_command(mock_update_report):
     original_file_time: float = os.path.getmtime(report_file_path + '.xlsx')
     result = runner.invoke(cli.guide, input='update report\n' + report_file_path + '_copy.xlsx\n')
     assert 'Enter the path to the existing report file' in result.output
-    assert mock_update_report.called_with('dataset_report.xlsx')
+    mock_update_report.callback.assert_called_once_with(report_file_path + '_copy.xlsx')
 
     # check file was updated
     assert os.path.getmtime(report_file_path + '_copy.xlsx') > original_file_time
@@ -54,5 +56,32 @@ def test_create_report_command(mock_report):
     assert 'Enter the path to the raw survey file' in result.output
     assert 'Enter the path to the config file' in result.output
     assert not 'Enter the path to the existing report file' in result.output
-    assert mock_report.called_with('output.csv', 'dataset.csv', None, 'config.json')
+    mock_report.callback.assert_called_once_with('tests/test_files/dev_data/output.csv',
+                                                 'tests/test_files/dev_data/dataset-dev.csv', 'tests_report.xlsx',
+                                                 'tests/test_files/dev_data/config-dev.json')
+    os.remove('tests_report.xlsx')
+
+
+def test_group_command_runs_grouping():
+    '''
+    runs the group command through the guide (without mocking), which calls the command's callback with only
+     the prompted values
+    '''
+    result = runner.invoke(cli.guide, input='group\ntests/test_files/survey_results/test_group_1.csv\n'
+                                            'tests/test_files/configs/test_group_1_config.json\nN\nN\n')
+    assert result.exception is None
+    assert 'survey_data' in load_workbook('tests/test_files/survey_results/test_group_1_report.xlsx').sheetnames
+    os.remove('tests/test_files/survey_results/test_group_1_report.xlsx')
+
+
+def test_create_report_command_writes_report():
+    '''
+    runs the create report command through the guide (without mocking), which calls the command's callback
+     with only the prompted values
+    '''
+    result = runner.invoke(cli.guide, input='create report\ntests/test_files/dev_data/output.csv\n'
+                                            'tests/test_files/dev_data/dataset-dev.csv\n'
+                                            'tests/test_files/dev_data/config-dev.json\nN\n')
+    assert result.exception is None
+    assert 'survey_data' in load_workbook('tests_report.xlsx').sheetnames
     os.remove('tests_report.xlsx')
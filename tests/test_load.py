@@ -1,15 +1,20 @@
 '''
 Testing loader
 '''
+from concurrent.futures import ProcessPoolExecutor
 import copy
 import csv
 import datetime
+import multiprocessing
+import os
 from io import StringIO
 from operator import contains
 import pytest
+from openpyxl import load_workbook
 from app import models
 from app import config
-from app.data import load
+from app.data import load, survey_cache
+from app.file import xlsx
 
 # NOTE: These tests verify the functionality in read_dataset.py. Additionally,
 #   in the process of doing so, they also verify the functionality in read_config.py.
@@ -843,6 +848,11 @@ def test_read_dataset_dup_user():
     assert surveys_result.records[2].availability == surveys_expected[2].availability
     # checks that it doesn't match to a dup record with older timestamp
     assert not surveys_result.records[1].availability == surveys_expected[1].availability
+    # checks that each duplicate is recorded (3 duplicate rows from 3 students)
+    assert [duplicate.student_id for duplicate in surveys_result.duplicates] == ['jsmith1', 'mmuster3', 'jdoe2']
+    assert surveys_result.duplicates[2].kept_submission_date > surveys_result.duplicates[2].discarded_submission_date
+    assert load.duplicates_summary(surveys_result.duplicates).startswith(
+        'found 3 duplicate survey submission(s) from 3 student(s)')
 
 
 def test_total_availability_matches_finds_matches():
@@ -892,6 +902,37 @@ def test_total_availability_matches_empty_string():
     assert matches == 1
 
 
+def test_availability_histogram_total_matches():
+    students = [
+        models.SurveyRecord(student_id='asurite1', availability={
+            '1': ['monday', 'tuesday', ''],
+            '2': ['monday', 'tuesday']
+        }),
+        models.SurveyRecord('asurite2', availability={
+            '1': ['monday'],
+            '2': ['tuesday']
+        }),
+        models.SurveyRecord('asurite2', availability={
+            '1': ['tuesday', ''],
+            '2': ['tuesday']
+        }),
+        models.SurveyRecord('asurite3', availability={
+            '1': [],
+            '2': []
+        })
+    ]
+
+    histogram = load.AvailabilityHistogram(students)
+    for student in students:
+        assert histogram.total_matches(student) == load.total_availability_matches(student, students)
+    assert histogram.total_matches(students[0]) == 4
+    assert histogram.total_matches(students[3]) == 0
+
+    histogram.remove(students[3])
+    load.assign_wildcard_availability(students[3], ['1', '2'])
+    histogram.add(students[3])
+    assert histogram.total_matches(students[0]) == 8
+
 def test_wildcard_availability_sets_all_avail():
     avail_fields = ['1', '2', '3']
 
@@ -1036,6 +1077,44 @@ def test_parse_survey_record_maps_single_field():
     assert len(record.student_id) > 0
 
 
+def test_survey_parse_plan_parses_rows_positionally():
+    config: models.SurveyFieldMapping = {
+        'student_id_field_name': 'asurite',
+        'student_name_field_name': 'name',
+        'preferred_students_field_names': ['pref 1', 'pref 2'],
+        'disliked_students_field_names': ['disl 1'],
+        'availability_field_names': ['1', '2']
+    }
+
+    plan = load.SurveyParsePlan(config, ['1', 'pref 2', 'asurite', 'disl 1', 'pref 1', '2', 'name'], ';,')
+    record = plan.parse(['Monday; Tuesday,friday', ' ', 'plan1 - Plan One', '', 'Plan2', ''])
+
+    assert record.student_id == 'plan1'
+    assert record.preferred_students == ['plan2']
+    assert record.disliked_students == []
+    assert record.availability == {'1': ['monday', 'tuesday', 'friday'], '2': []}
+    # the name column is missing from the row
+    assert record.student_name == ''
+    with pytest.raises(ValueError):
+        plan.parse(['monday', '', ' ', '', '', ''])
+
+def test_parse_survey_record_interns_ids():
+    config: models.SurveyFieldMapping = {
+        'student_id_field_name': 'asurite',
+        'preferred_students_field_names': ['pref 1'],
+        'disliked_students_field_names': ['disl 1'],
+        'availability_field_names': ['1']
+    }
+
+    record_1 = load.parse_survey_record(config, {'asurite': 'intern1', 'pref 1': 'Intern2', 'disl 1': '', '1': 'monday'})
+    record_2 = load.parse_survey_record(config, {'asurite': 'intern2', 'pref 1': '', 'disl 1': 'intern1', '1': 'monday'})
+
+    assert record_1.preferred_students[0] is record_2.student_id
+    assert record_2.disliked_students[0] is record_1.student_id
+    assert record_1.availability['1'][0] is record_2.availability['1'][0]
+    assert not hasattr(record_1, '__dict__')
+
+
 def test_parse_survey_record_with_white_space():
     config: models.SurveyFieldMapping = {
         'student_id_field_name': 'asurite',
@@ -1111,6 +1190,23 @@ def test_load_group_data():
     assert len(groups[3].members) == 5
 
 
+def test_load_group_data_references_survey_records():
+    '''
+    Tests that the loaded groups reference the survey records rather than copies of them
+    '''
+    config_data: models.Configuration = config.read_json(
+        "./tests/test_files/dev_data/config-dev.json")
+    survey_data = load.read_survey(
+        config_data['field_mappings'], "./tests/test_files/dev_data/dataset-dev.csv")
+    survey_by_id = load.records_by_id(survey_data.records)
+    groups = load.read_groups(
+        "./tests/test_files/dev_data/output.csv", survey_data.records)
+
+    for group in groups:
+        for member in group.members:
+            assert member is survey_by_id[member.student_id]
+
+
 def test_load_missing_students_1():
     '''
     Tests the add missing student function with 2 missing students.
@@ -1467,9 +1563,34 @@ def test_load_survey_data_from_report():
     assert survey_data == expected_data
 
 
+def test_read_report_from_xlsx():
+    '''
+    tests that the config, survey data and groups can all be read from a report opened once, and match
+     what is read when the report is opened separately for each
+    '''
+    report_path = './tests/test_files/reports/Example_Report_1.xlsx'
+    expected_config = config.read_report_config(report_path)
+    expected_survey_data = load.read_report_survey_data(report_path, expected_config['field_mappings'])
+    expected_groups = load.read_report_groups(report_path, expected_survey_data.records)
+
+    with xlsx.XLSXReader(report_path) as report_reader:
+        config_data = config.read_report_config_from_xlsx(report_reader)
+        survey_data = load.read_report_survey_data_from_xlsx(report_reader, config_data['field_mappings'])
+        groups = load.read_report_groups_from_xlsx(report_reader, survey_data.records)
+
+    assert config_data == expected_config
+    assert survey_data.records == expected_survey_data.records
+    assert list(survey_data.raw_rows) == list(expected_survey_data.raw_rows)
+    assert len(groups) == len(expected_groups) > 0
+    for solution, expected_solution in zip(groups, expected_groups):
+        assert [group.group_id for group in solution] == [group.group_id for group in expected_solution]
+        assert [[member.student_id for member in group.members] for group in solution] == \
+            [[member.student_id for member in group.members] for group in expected_solution]
+
+
 def test_load_raw_survey_data():
 
-    report_workbook = load.load_workbook(
+    report_workbook = load_workbook(
         './tests/test_files/reports/Example_Report_1.xlsx')
 
     survey_data_sheet = report_workbook["survey_data"]
@@ -1542,6 +1663,26 @@ def test_remove_self_from_disliked():
     assert len(surveys_result.records[2].disliked_students) == 1
 
 
+def test_index_survey_records_excludes_self():
+    '''
+    Ensure that the students are indexed after removing themselves from their
+    preferred/disliked lists, so the bitsets match the lists
+    '''
+    config_data = config.read_json(
+        "./tests/test_files/configs/config_1_full.json")
+    surveys_result = load.read_survey(
+        config_data['field_mappings'], './tests/test_files/survey_results/Example_Survey_Results_1_full_self_pref_dislike.csv')
+
+    students_by_idx = load.index_survey_records(surveys_result.records)
+
+    for record in surveys_result.records:
+        assert students_by_idx[record.student_idx] is record
+        assert not record.preferred_bits >> record.student_idx & 1
+        assert not record.disliked_bits >> record.student_idx & 1
+        assert record.preferred_bits.bit_count() == len(record.preferred_students)
+        assert record.disliked_bits.bit_count() == len(record.disliked_students)
+
+
 def test_no_change_self_not_in_preferred():
     '''
     Ensure that there is no change to the preferred list
@@ -1740,4 +1881,221 @@ def test_match_survey_to_roster_empty_survey():
 
     assert len(results) == 5
 
-    
\ No newline at end of file
+    
+
+def test_reconcile_roster():
+    '''
+    tests that the survey is split into kept and removed records, and that students on the roster without
+     survey data are added once each (in roster order)
+    '''
+    roster = ['asurite3', 'asurite1', 'asurite7', 'asurite8', 'asurite7']
+    survey = [
+        models.SurveyRecord('asurite1', availability={'1': ['sunday']}),
+        models.SurveyRecord('asurite2', availability={'1': []}),
+        models.SurveyRecord('asurite3', availability={'1': ['monday']}),
+    ]
+
+    reconciliation = load.reconcile_roster(survey, roster, avail_field=['1'])
+
+    assert reconciliation.kept == [survey[0], survey[2]]
+    assert reconciliation.removed == [survey[1]]
+    assert [student.student_id for student in reconciliation.added] == ['asurite7', 'asurite8']
+    assert all(not student.provided_survey_data for student in reconciliation.added)
+    assert load.roster_summary(reconciliation) == (
+        '2 student(s) matched the roster, 2 student(s) on the roster were added without survey data, '
+        '1 student(s) not on the roster were removed')
+
+
+def test_read_survey_spools_raw_rows():
+    '''
+    tests that the raw rows collected while reading the survey (in a single pass) match the rows of the file,
+     and can be read back more than once
+    '''
+    config_data: models.Configuration = config.read_json(
+        "./tests/test_files/configs/config_1.json")
+    survey_path = './tests/test_files/survey_results/Example_Survey_Results_1.csv'
+
+    surveys_result = load.read_survey(config_data['field_mappings'], survey_path)
+    with open(survey_path, 'r', encoding='utf-8-sig') as file:
+        expected_rows = load.read_survey_raw(file)
+
+    assert len(surveys_result.raw_rows) == len(expected_rows)
+    assert list(surveys_result.raw_rows) == expected_rows
+    assert surveys_result.raw_rows == expected_rows
+
+
+def test_survey_data_closes_raw_rows():
+    '''
+    tests that the spooled raw rows are closed when the survey data is used as a context manager
+    '''
+    config_data: models.Configuration = config.read_json(
+        "./tests/test_files/configs/config_1.json")
+
+    with open('./tests/test_files/survey_results/Example_Survey_Results_1.csv', 'r', encoding='utf-8-sig') as file, \
+            load.read_survey_from_io(config_data['field_mappings'], file) as survey_data:
+        assert len(list(survey_data.raw_rows)) > 0
+
+    with pytest.raises(ValueError):
+        list(survey_data.raw_rows)
+
+
+def test_read_survey_raw_rows_from_file(tmp_path):
+    '''
+    tests that the raw rows of a survey file are read again from the file, and not once the file has changed
+    '''
+    config_data: models.Configuration = config.read_json(
+        "./tests/test_files/configs/config_1.json")
+    survey_path = tmp_path / 'survey.csv'
+    with open('./tests/test_files/survey_results/Example_Survey_Results_1.csv', 'r', encoding='utf-8-sig') as file:
+        survey_text = file.read()
+    survey_path.write_text(survey_text, encoding='utf-8')
+
+    survey_data = load.read_survey(config_data['field_mappings'], str(survey_path))
+    with open(survey_path, 'r', encoding='utf-8-sig') as file:
+        assert list(survey_data.raw_rows) == load.read_survey_raw(file)
+
+    survey_path.write_text(survey_text + survey_text.split('\n', 2)[1] + '\n', encoding='utf-8')
+    with pytest.raises(ValueError):
+        list(survey_data.raw_rows)
+
+
+def test_read_survey_cache(tmp_path, monkeypatch):
+    '''
+    tests that a survey loaded with a cache directory is read from the cache the next time (without parsing),
+     and is parsed again once the survey file changes
+    '''
+    config_data: models.Configuration = config.read_json(
+        "./tests/test_files/configs/config_1.json")
+    survey_path = tmp_path / 'survey.csv'
+    with open('./tests/test_files/survey_results/Example_Survey_Results_1.csv', 'r', encoding='utf-8-sig') as file:
+        survey_text = file.read()
+    survey_path.write_text(survey_text, encoding='utf-8')
+    cache_dir = str(tmp_path / 'cache')
+
+    expected_data = load.read_survey(config_data['field_mappings'], str(survey_path))
+    first_data = load.read_survey(config_data['field_mappings'], str(survey_path), cache_dir)
+    assert first_data == expected_data
+
+    def fail_to_parse(*_):
+        raise AssertionError('the survey should be read from the cache')
+    with monkeypatch.context() as patch:
+        patch.setattr(load, 'read_survey_records', fail_to_parse)
+        cached_data = load.read_survey(config_data['field_mappings'], str(survey_path), cache_dir)
+
+    assert cached_data.records == expected_data.records
+    assert list(cached_data.raw_rows) == list(expected_data.raw_rows)
+    assert cached_data.duplicates == expected_data.duplicates
+    assert [student.student_idx for student in cached_data.records] == \
+        [student.student_idx for student in expected_data.records]
+    assert [student.availability_mask for student in cached_data.records] == \
+        [student.availability_mask for student in expected_data.records]
+
+    # a damaged entry is a miss
+    for entry_path in (tmp_path / 'cache').iterdir():
+        entry_path.write_bytes(entry_path.read_bytes()[:-20])
+    assert survey_cache.read_cached_survey(cache_dir, survey_cache.cache_key(
+        str(survey_path), config_data['field_mappings'], config_data['availability_values_delimiter']),
+        str(survey_path)) is None
+
+    # a changed survey is parsed again
+    expected_length = len(expected_data.raw_rows)
+    survey_path.write_text(survey_text.rstrip('\n').rsplit('\n', 1)[0] + '\n', encoding='utf-8')
+    changed_data = load.read_survey(config_data['field_mappings'], str(survey_path), cache_dir)
+    assert len(changed_data.raw_rows) == expected_length - 1
+
+
+def test_read_survey_parallel(tmp_path):
+    '''
+    tests that parsing a survey in parallel chunks gives the same result as parsing it sequentially, for a file
+     with quoted fields containing newlines and quotes, blank lines and duplicate submissions
+    '''
+    config_data: models.Configuration = config.read_json(
+        "./tests/test_files/configs/config_1.json")
+    with open('./tests/test_files/survey_results/Example_Survey_Results_1.csv', 'r', encoding='utf-8-sig') as file:
+        rows = list(csv.reader(file))
+    id_col = rows[0].index(config_data['field_mappings']['student_id_field_name'])
+    timezone_col = rows[0].index(config_data['field_mappings']['timezone_field_name'])
+
+    survey_path = tmp_path / 'survey.csv'
+    with open(survey_path, 'w', encoding='utf-8-sig', newline='') as file:
+        writer = csv.writer(file, quoting=csv.QUOTE_ALL)
+        writer.writerow(rows[0])
+        for idx in range(60):
+            row = list(rows[1 + idx % (len(rows) - 1)])
+            row[id_col] = f'student{idx % 45}'
+            row[timezone_col] = f'UTC "{idx}",\r\nsecond line'
+            writer.writerow(row)
+            if idx % 20 == 0:
+                file.write('\r\n')
+
+    with open(survey_path, 'r', encoding='utf-8-sig') as file:
+        expected_data = load.read_survey_from_io(config_data['field_mappings'], file)
+    survey_data = load.read_survey_parallel(config_data['field_mappings'], str(survey_path), max_workers=2, num_chunks=7)
+
+    assert survey_data is not None
+    assert survey_data.records == expected_data.records
+    assert list(survey_data.raw_rows) == list(expected_data.raw_rows)
+    assert survey_data.duplicates == expected_data.duplicates
+    assert len(survey_data.records) == 45
+
+
+def test_read_survey_parallel_threshold(monkeypatch):
+    '''
+    tests that a survey file is parsed in parallel once its size reaches PARALLEL_PARSE_MIN_BYTES
+    '''
+    config_data: models.Configuration = config.read_json(
+        "./tests/test_files/configs/config_1.json")
+    survey_path = './tests/test_files/survey_results/Example_Survey_Results_1.csv'
+    parallel_calls: list[str] = []
+
+    def read_in_parallel(_, data_file_path):
+        parallel_calls.append(data_file_path)
+    monkeypatch.setattr(load, 'read_survey_parallel', read_in_parallel)
+
+    monkeypatch.setattr(load, 'PARALLEL_PARSE_MIN_BYTES', os.path.getsize(survey_path) + 1)
+    load.read_survey(config_data['field_mappings'], survey_path)
+    assert not parallel_calls
+
+    monkeypatch.setattr(load, 'PARALLEL_PARSE_MIN_BYTES', os.path.getsize(survey_path))
+    survey_data = load.read_survey(config_data['field_mappings'], survey_path)
+    assert parallel_calls == [survey_path]
+    assert len(survey_data.records) > 0  # parsed sequentially after the parallel parse gave up
+
+
+def test_parse_survey_chunk_masks_match_across_processes():
+    '''
+    tests that the availability masks built by a spawned worker match the ones built in the parent process
+    '''
+    config_data: models.Configuration = config.read_json(
+        "./tests/test_files/configs/config_1.json")
+    field_mapping = config_data['field_mappings']
+    with open('./tests/test_files/survey_results/Example_Survey_Results_1.csv', 'rb') as file:
+        data: bytes = file.read()
+    header_end: int = load.row_end(data, 0)
+    fieldnames = next(csv.reader(StringIO(data[:header_end].decode('utf-8-sig'))))
+
+    expected_records = load.parse_survey_chunk(
+        field_mapping, fieldnames, config_data['availability_values_delimiter'], data[header_end:])
+    with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('spawn')) as executor:
+        records = executor.submit(load.parse_survey_chunk, field_mapping, fieldnames,
+                                  config_data['availability_values_delimiter'], data[header_end:]).result()
+
+    assert [record.availability_mask for record in records] == \
+        [record.availability_mask for record in expected_records]
+
+
+def test_row_boundaries():
+    '''
+    tests that the chunks end on row boundaries (not on newlines within quoted fields)
+    '''
+    rows = [b'a,b\n', b'"1\n""2""\n3",x\n', b'4,y\n', b'"5\n",z\n']
+    data = b''.join(rows)
+    row_starts = {sum(len(row) for row in rows[:idx]) for idx in range(1, len(rows) + 1)}
+
+    boundaries = load.row_boundaries(data, len(rows[0]), 10)
+
+    assert boundaries[0] == len(rows[0])
+    assert boundaries[-1] == len(data)
+    assert set(boundaries) <= row_starts
+    assert len(boundaries) > 2
+    assert boundaries == sorted(set(boundaries))
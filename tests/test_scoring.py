@@ -1,4 +1,5 @@
-from app.group import scoring
+import pytest
+from app.group import scoring, group_state
 from app import models
 
 
@@ -191,3 +192,62 @@ def test_standard_dev_groups():
     set_vars = models.GroupSetData("group_solution", 2, 2, 7, 6)
     assert round(scoring.standard_dev_groups(
         [group_1, group_2], set_vars), 4) == 20.4512
+
+
+def __swap_test_groups() -> list[models.GroupRecord]:
+    return [models.GroupRecord("1", [
+        models.SurveyRecord(student_id="delta1", preferred_students=["delta4"], disliked_students=["delta2"],
+                            availability={"1": ['monday'], "2": ['friday']}),
+        models.SurveyRecord(student_id="delta2", preferred_students=["delta3"],
+                            availability={"1": ['monday'], "2": []}),
+    ]), models.GroupRecord("2", [
+        models.SurveyRecord(student_id="delta3", preferred_students=["delta2"],
+                            availability={"1": ['monday'], "2": ['friday']}),
+        models.SurveyRecord(student_id="delta4", preferred_students=["delta1"], disliked_students=["delta3"],
+                            availability={"1": ['tuesday'], "2": ['friday']}),
+    ])]
+
+
+def test_score_swap_delta():
+    for use_alternative_scoring in [False, True]:
+        groups = __swap_test_groups()
+        state = group_state.GroupState(groups)
+        set_vars = models.GroupSetData("group_solution", 2, 2, 4, 2)
+
+        new_score = scoring.score_swap_delta(state, set_vars, groups[0], 1, groups[1], 1, use_alternative_scoring)
+
+        # the groups are unchanged
+        assert groups[0].members[1].student_id == "delta2"
+        assert state.num_disliked_pairs == 2
+
+        state.swap_students(groups[0], 1, groups[1], 1)
+        assert new_score == scoring.score_group_state(state, set_vars, use_alternative_scoring)
+        assert state.num_disliked_pairs == 0
+
+
+def test_score_move_delta():
+    groups = __swap_test_groups()
+    state = group_state.GroupState(groups)
+    set_vars = models.GroupSetData("group_solution", 2, 2, 4, 2)
+
+    new_score = scoring.score_move_delta(state, set_vars, groups[1], 1, groups[0])
+    assert len(groups[1].members) == 2
+
+    state.add_student(groups[0], groups[1].members.pop(1))
+    state.refresh(groups[1])
+    assert new_score == scoring.score_group_state(state, set_vars)
+
+
+def test_standard_dev_group_state():
+    for use_alternative_scoring in [False, True]:
+        groups = __swap_test_groups()
+        state = group_state.GroupState(groups)
+        set_vars = models.GroupSetData("group_solution", 2, 2, 4, 2)
+        scoring.track_group_scores(state, set_vars, use_alternative_scoring)
+
+        assert scoring.standard_dev_group_state(state) == pytest.approx(
+            scoring.standard_dev_groups(groups, set_vars, use_alternative_scoring))
+
+        state.swap_students(groups[0], 1, groups[1], 1)
+        assert scoring.standard_dev_group_state(state) == pytest.approx(
+            scoring.standard_dev_groups(groups, set_vars, use_alternative_scoring))
@@ -1,3 +1,6 @@
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import pytest
 from app.group import validate
 from app.data import load
 from app import config, models, core
@@ -492,6 +495,45 @@ def test_do_duplicate_users_exist_in_groups_3():
     assert validate.duplicate_user_in_dataset(groups)
 
 
+def test_group_dislikes_user_in_spawned_process():
+    '''
+    tests that the dislike check agrees in a spawned worker, which indexes student ids differently
+    '''
+    validate.student_index("a student only seen by this process")
+    group = models.GroupRecord("1", [models.SurveyRecord(
+        student_id="spawn1",
+        disliked_students=['spawn3']
+    ), models.SurveyRecord(
+        student_id="spawn2",
+    )])
+    user = models.SurveyRecord(student_id="spawn3")
+    for record in group.members + [user]:
+        validate.index_student(record)
+
+    with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('spawn')) as executor:
+        group_dislikes = executor.submit(validate.group_dislikes_user, user, group).result()
+
+    assert list(group_dislikes.values()) == [True, False]
+
+
+def test_students_of_different_surveys_are_not_compared():
+    '''
+    tests that students indexed for different surveys (whose indices can refer to different students) raise an
+     error when they are used together, instead of being compared by their indices
+    '''
+    config_data = config.read_json("./tests/test_files/configs/config_1.json")
+    survey_path = './tests/test_files/survey_results/Example_Survey_Results_1.csv'
+    first_survey = load.read_survey(config_data['field_mappings'], survey_path)
+    second_survey = load.read_survey(config_data['field_mappings'], survey_path)
+
+    group = models.GroupRecord("1", first_survey.records[:2])
+    assert validate.group_dislikes_user(first_survey.records[2], group) is not None
+    with pytest.raises(ValueError):
+        validate.group_dislikes_user(second_survey.records[2], group)
+    with pytest.raises(ValueError):
+        validate.members_index_bits(first_survey.records[:2] + second_survey.records[2:3])
+
+
 def test_group_dislike_occurrences():
     group = models.GroupRecord("1", [models.SurveyRecord(
         student_id="asurite1",
@@ -518,7 +560,6 @@ def test_group_dislike_occurrences():
 
 
 def test_group_dislikes_user():
-    user = 'asurite2'
     group = models.GroupRecord("1", [models.SurveyRecord(
         student_id="asurite1",
         disliked_students=['asurite2']
@@ -536,6 +577,7 @@ def test_group_dislikes_user():
         student_id="asurite6",
     )])
 
+    user = group.members[1]
     group_dislikes = validate.group_dislikes_user(user, group)
 
     assert group_dislikes['asurite1'] == True
@@ -639,7 +681,6 @@ def test_meets_like_requirements():
 
 
 def test_group_likes_user():
-    user = 'asurite2'
     group = models.GroupRecord("1", [models.SurveyRecord(
         student_id="asurite1",
         preferred_students=['asurite2']
@@ -657,6 +698,7 @@ def test_group_likes_user():
         student_id="asurite6",
     )])
 
+    user = group.members[1]
     group_likes = validate.group_likes_user(user, group)
 
     assert group_likes['asurite1'] == True
@@ -1231,3 +1273,55 @@ def test_groups_meet_size_constraint_2():
 
     assert validate.groups_meet_size_constraint(
         groups_2, 3, True, False) == True
+
+
+def test_availability_mask():
+    mask_1 = validate.availability_mask({"1": ['Monday', 'friday'], "2": ['not_a_day']})
+    mask_2 = validate.availability_mask({"1": ['friday'], "2": ['sunday']})
+
+    assert mask_1.bit_count() == 2
+    assert (mask_1 & mask_2).bit_count() == 1
+    assert validate.availability_mask({"1": []}) == 0
+
+
+def test_availability_mask_follows_field_order():
+    field_offsets = validate.availability_field_offsets(["a", "b"])
+
+    assert validate.availability_mask({"a": ['monday']}, field_offsets) == 1
+    assert validate.availability_mask({"b": ['monday']}, field_offsets) == 1 << len(validate.WEEK_DAYS)
+    # without offsets, the fields are laid out in the order of the availability's own fields
+    assert validate.availability_mask({"b": ['monday'], "a": []}) == 1
+
+
+def test_availability_overlap_count_uses_cached_mask():
+    group = models.GroupRecord("1", [models.SurveyRecord(
+        student_id="asurite1",
+        availability={"1": ['monday', 'tuesday'], "2": ['friday']},
+    ), models.SurveyRecord(
+        student_id="asurite2",
+        availability={"1": ['monday', 'tuesday'], "2": []},
+    )])
+
+    assert validate.availability_overlap_count(group) == 2
+    assert group.members[1].availability_mask is not None
+
+    group.members.append(models.SurveyRecord(
+        student_id="asurite3", availability={"1": [], "2": ['friday']}))
+    assert validate.availability_overlap_count(group) == 0
+    assert validate.stud_prev_overlap_idx(group) == 1
+
+
+def test_solution_pair_counts():
+    group_1 = models.GroupRecord("1", [
+        models.SurveyRecord(student_id="pairs1", preferred_students=["pairs2"], disliked_students=["pairs3"]),
+        models.SurveyRecord(student_id="pairs2", preferred_students=["pairs1"]),
+        models.SurveyRecord(student_id="pairs3", disliked_students=["pairs1", "pairs2"]),
+    ])
+    group_2 = models.GroupRecord("2", [
+        models.SurveyRecord(student_id="pairs4", preferred_students=["pairs1"], disliked_students=["pairs5"]),
+        models.SurveyRecord(student_id="pairs5"),
+    ])
+
+    assert validate.solution_pair_counts([group_1, group_2]) == [(3, 2), (1, 0)]
+    assert validate.total_disliked_pairings([group_1, group_2]) == 4
+    assert validate.total_liked_pairings([group_1, group_2]) == 2